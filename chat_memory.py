@@ -0,0 +1,80 @@
+import math
+
+def estimate_tokens(text):
+    """
+    Count tokens with tiktoken if it's installed, otherwise estimate ~4 characters per token.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return math.ceil(len(text) / 4)
+    return len(tiktoken.get_encoding("o200k_base").encode(text))
+
+class ConversationMemory:
+    """
+    Chat history that stays a bounded size.
+
+    Keeps the system prompt plus the most recent turns. Once there are more than
+    `max_turns` turns, or the prompt goes over `token_budget` tokens, the oldest
+    turns are folded into a running summary by `summarise(previous_summary, turns)`.
+    The summary is kept between turns, so it's only regenerated when turns are folded.
+    If summarising fails, the turns are kept as they are and folding is tried
+    again after the next turn.
+    """
+
+    def __init__(self, system_message, summarise, max_turns=6, token_budget=4000, count_tokens=estimate_tokens):
+        self.system_message = system_message
+        self.summarise = summarise
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.count_tokens = count_tokens
+        self.summary = ""
+        self.turns = []          # [user message, assistant message] pairs
+        self.prompt_tokens = []  # prompt size sent on each turn
+        self.summary_error = None  # why the last fold failed, if it did
+
+    def add_user(self, text):
+        self.turns.append([{"role": "user", "content": text}])
+
+    def drop_unanswered(self):
+        "Forget the last user message if it has no reply yet."
+        if self.turns and len(self.turns[-1]) == 1:
+            self.turns.pop()
+
+    def add_assistant(self, text):
+        self.turns[-1].append({"role": "assistant", "content": text})
+        self._fold()
+
+    def messages(self):
+        "Messages to send for the next request, recording their size."
+        messages = self._build(self.turns)
+        self.prompt_tokens.append(self._tokens(messages))
+        return messages
+
+    def _build(self, turns):
+        messages = [self.system_message]
+        if self.summary:
+            messages.append({"role": "developer", "content": f"Summary of the conversation so far: {self.summary}"})
+        for turn in turns:
+            messages.extend(turn)
+        return messages
+
+    def _tokens(self, messages):
+        return sum(self.count_tokens(message["content"]) for message in messages)
+
+    def _fold(self):
+        keep = len(self.turns)
+        while keep > 1 and (keep > self.max_turns or self._tokens(self._build(self.turns[-keep:])) > self.token_budget):
+            keep -= 1
+        if keep == len(self.turns):
+            return
+        # fold down to half the turn limit so summarising doesn't happen every turn
+        keep = min(keep, max(1, self.max_turns // 2))
+        folded = self.turns[:-keep]
+        try:
+            self.summary = self.summarise(self.summary, [message for turn in folded for message in turn])
+        except Exception as e:
+            self.summary_error = e
+            return
+        self.summary_error = None
+        self.turns = self.turns[-keep:]
@@ -0,0 +1,79 @@
+"""
+Time delay statistics over months of recorded Train Tracker predictions.
+
+    uv run python benchmarks/bench_recorder.py [--days 90 --stations 20 --interval 60]
+
+Writes a synthetic arrivals log to a temporary directory, as if `record`
+had sampled --stations stations every --interval seconds from 05:00 to
+01:00 each day, with the next few trains on each route at every sample.
+Then loads it and computes delay_stats for every station, hour and route.
+"""
+import argparse
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from cta_pkms.recorder import RECORD_DTYPE, ROUTES, day_path, delay_stats, load_records
+
+HEADWAY = 8 * 60
+TRAINS_AHEAD = 3
+
+
+def write_day(directory, day, stations, interval, rng):
+    start = int((datetime.combine(day, datetime.min.time()) - datetime(1970, 1, 1)).total_seconds()) + 5 * 3600
+    samples = np.arange(start, start + 20 * 3600, interval)
+    parts = []
+    for station in range(stations):
+        route = 1 + station % (len(ROUTES) - 1)
+        # the trains due at the station, each predicted from up to TRAINS_AHEAD headways out
+        due = np.arange(start, start + 20 * 3600 + HEADWAY * TRAINS_AHEAD, HEADWAY)
+        slip = rng.gamma(1.5, 60, len(due))
+        which = np.searchsorted(due, samples)[:, None] + np.arange(TRAINS_AHEAD)
+        which = np.minimum(which, len(due) - 1)
+        seen_at = np.repeat(samples, TRAINS_AHEAD)
+        train = which.ravel()
+        # predictions drift towards the real arrival as the train gets closer
+        progress = 1 - np.clip((due[train] - seen_at) / (HEADWAY * TRAINS_AHEAD), 0, 1)
+        records = np.zeros(len(train), dtype=RECORD_DTYPE)
+        records["sampled_at"] = seen_at
+        records["arrival"] = due[train] + slip[train] * progress
+        records["station"] = 40000 + station * 10
+        records["train"] = 100 + train % 900
+        records["route"] = route
+        records["flags"] = (slip[train] > 300) & (progress > 0.5)
+        parts.append(records)
+    np.concatenate(parts).tofile(day_path(directory, day))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--stations", type=int, default=20)
+    parser.add_argument("--interval", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=299)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        started = time.perf_counter()
+        first_day = date(2025, 1, 1)
+        for offset in range(args.days):
+            write_day(directory, first_day + timedelta(days=offset), args.stations, args.interval, rng)
+        size = sum(path.stat().st_size for path in directory.iterdir())
+        print(f"wrote {args.days} days: {size / 2 ** 20:.1f} MiB in {time.perf_counter() - started:.2f}s")
+
+        started = time.perf_counter()
+        records = load_records(directory)
+        print(f"load_records: {len(records)} records in {time.perf_counter() - started:.2f}s")
+
+        started = time.perf_counter()
+        rows = delay_stats(records)
+        print(f"delay_stats: {len(rows)} station/hour/route groups, "
+              f"{sum(row['approaches'] for row in rows)} trains in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Time station-to-station routing queries over random station pairs.
+
+    uv run python benchmarks/bench_routing.py [--pairs 500] [--gtfs-dir cta-gtfs]
+    uv run python benchmarks/bench_routing.py --synthetic
+
+--synthetic generates a CTA-sized network in a temporary directory, for
+machines without the GTFS files checked out.
+"""
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from cta_pkms.routing import Router, build_timetable, format_seconds, load_timetable
+
+
+def write_synthetic_gtfs(gtfs_dir, lines=8, stations_per_line=30, headway=600):
+    """
+    Write a GTFS feed of `lines` lines that all cross at a shared hub, with
+    trips in both directions every `headway` seconds from 04:00 to 25:00.
+    """
+    def dump(name, rows):
+        with (gtfs_dir / name).open("w") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+
+    stops, trips, stop_times = [], [], []
+    hub = "49999"
+    stops.append({"stop_id": hub, "stop_name": "Hub", "parent_station": None})
+    for line in range(lines):
+        stations = []
+        for n in range(stations_per_line):
+            station = hub if n == stations_per_line // 2 else f"4{line:02d}{n:02d}"
+            if station != hub:
+                stops.append({"stop_id": station, "stop_name": f"L{line} S{n}", "parent_station": None})
+            platform = f"3{line:02d}{n:02d}"
+            stops.append({"stop_id": platform, "stop_name": f"L{line} S{n}", "parent_station": station})
+            stations.append(platform)
+        for direction, sequence in enumerate([stations, stations[::-1]]):
+            for start in range(4 * 3600, 25 * 3600, headway):
+                trip_id = f"{line}-{direction}-{start}"
+                trips.append({"route_id": f"R{line}", "service_id": "ALL", "trip_id": trip_id})
+                for seq, platform in enumerate(sequence, 1):
+                    t = start + seq * 120
+                    hhmmss = f"{format_seconds(t)}:00" if t < 86400 else f"{t // 3600}:{t % 3600 // 60:02d}:00"
+                    stop_times.append({"trip_id": trip_id, "stop_id": platform, "stop_sequence": str(seq),
+                                       "arrival_time": hhmmss, "departure_time": hhmmss})
+    dump("stops.jsonl", stops)
+    dump("trips.jsonl", trips)
+    dump("stop_times.jsonl", stop_times)
+    dump("transfers.jsonl", [])
+    dump("calendar.jsonl", [{
+        "service_id": "ALL", "monday": "1", "tuesday": "1", "wednesday": "1", "thursday": "1",
+        "friday": "1", "saturday": "1", "sunday": "1", "start_date": "20000101", "end_date": "20991231",
+    }])
+    dump("calendar_dates.jsonl", [])
+
+
+def run(gtfs_dir, pairs, seed):
+    started = time.perf_counter()
+    timetable = build_timetable(gtfs_dir)
+    print(f"build_timetable: {time.perf_counter() - started:.2f}s "
+          f"({len(timetable.patterns)} patterns, {len(timetable.station_patterns)} stations)")
+    load_timetable(gtfs_dir)
+    started = time.perf_counter()
+    timetable = load_timetable(gtfs_dir)
+    print(f"load_timetable (compiled): {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    router = Router(timetable)
+    stations = sorted(timetable.station_patterns)
+    rng = random.Random(seed)
+    timings = []
+    found = 0
+    for _ in range(pairs):
+        origin, destination = rng.sample(stations, 2)
+        depart_at = datetime(2025, 11, 19, rng.randrange(5, 23), rng.randrange(60))
+        started = time.perf_counter()
+        journey = router.earliest_arrival(origin, destination, depart_at)
+        timings.append((time.perf_counter() - started) * 1000)
+        found += journey is not None
+    timings.sort()
+    print(f"{pairs} queries, {found} routed: "
+          f"mean {statistics.mean(timings):.2f}ms, median {statistics.median(timings):.2f}ms, "
+          f"p95 {timings[int(len(timings) * 0.95) - 1]:.2f}ms, max {timings[-1]:.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--gtfs-dir", type=Path, default=Path("cta-gtfs"))
+    parser.add_argument("--pairs", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=299)
+    parser.add_argument("--synthetic", action="store_true", help="Benchmark a generated network")
+    args = parser.parse_args()
+    if args.synthetic:
+        with tempfile.TemporaryDirectory() as tmp:
+            write_synthetic_gtfs(Path(tmp))
+            run(Path(tmp), args.pairs, args.seed)
+    else:
+        run(args.gtfs_dir, args.pairs, args.seed)
+
+
+if __name__ == "__main__":
+    main()
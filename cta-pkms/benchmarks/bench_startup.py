@@ -0,0 +1,113 @@
+"""
+Time the cold start of CLI commands in fresh interpreters.
+
+    uv run python benchmarks/bench_startup.py [--runs 5] [--importtime] [--daemon]
+
+Each command runs in a temporary directory (empty tasks and commutes) in a
+new process, so the numbers include interpreter start-up and every import.
+Commands that would hit the network are timed with --help, which still
+loads everything the CLI loads before running a command. --importtime also
+lists the slowest imports of each command, from python -X importtime.
+--daemon runs `cta-pkms serve` in the directory first, so the commands
+forward to it.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+HEAVY_MODULES = ("openai", "textual", "requests", "asyncio", "numpy")
+COMMANDS = [
+    ["--help"],
+    ["list-tasks"],
+    ["add-task", "Benchmark", "startup"],
+    ["list-commutes"],
+    ["search-tasks", "bench"],
+    ["export-tasks"],
+    ["next-arrivals", "--help"],
+    ["plan-commute", "--help"],
+]
+
+# Runs one command, then reports which heavy modules it had imported.
+RUNNER = """
+import sys
+from cta_pkms import app
+try:
+    app(sys.argv[1:], standalone_mode=False)
+finally:
+    print("loaded:" + ",".join(m for m in {heavy!r} if m in sys.modules), file=sys.stderr)
+"""
+
+
+def run_command(args, cwd, importtime=False):
+    env = dict(os.environ, PYTHONPATH=str(SRC_DIR), CTA_PKMS_CACHE_DIR=str(Path(cwd) / ".cache"))
+    flags = ["-X", "importtime"] if importtime else []
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, *flags, "-c", RUNNER.format(heavy=HEAVY_MODULES), *args],
+        cwd=cwd, env=env, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - started
+    loaded = ""
+    imports = []
+    for line in result.stderr.splitlines():
+        if line.startswith("loaded:"):
+            loaded = line[len("loaded:"):]
+        elif line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                imports.append((int(cumulative), name.strip()))
+    return elapsed, loaded, imports
+
+
+def start_daemon(cwd):
+    env = dict(os.environ, PYTHONPATH=str(SRC_DIR), CTA_PKMS_CACHE_DIR=str(Path(cwd) / ".cache"))
+    process = subprocess.Popen([sys.executable, "-c", "from cta_pkms import app; app(['serve'])"],
+                               cwd=cwd, env=env, stdout=subprocess.PIPE, text=True)
+    process.stdout.readline()  # "Serving on ..." once it is listening
+    return process
+
+
+def run_command_python(cwd):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], cwd=cwd, check=True)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true", help="Show the slowest top-level imports")
+    parser.add_argument("--daemon", action="store_true", help="Forward the commands to `cta-pkms serve`")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cwd:
+        daemon = start_daemon(cwd) if args.daemon else None
+        run_command(["--help"], cwd)  # warm the filesystem cache / bytecode
+        baseline = min(run_command_python(cwd) for _ in range(args.runs))
+        print(f"{'python -c pass':<32} {baseline * 1000:7.1f}ms")
+        for command in COMMANDS:
+            timings = []
+            for _ in range(args.runs):
+                elapsed, loaded, _ = run_command(command, cwd)
+                timings.append(elapsed)
+            label = " ".join(command)
+            print(f"{label:<32} {statistics.median(timings) * 1000:7.1f}ms"
+                  f"  (+{(min(timings) - baseline) * 1000:.0f}ms over bare python)"
+                  + (f"  loads {loaded}" if loaded else ""))
+            if args.importtime:
+                _, _, imports = run_command(command, cwd, importtime=True)
+                for micros, name in sorted(imports, reverse=True)[:5]:
+                    print(f"    {micros / 1000:7.1f}ms  {name}")
+        if daemon is not None:
+            daemon.terminate()
+            daemon.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Time building the station-to-station travel matrix, and ETA lookups in it.
+
+    uv run python benchmarks/bench_travel_matrix.py [--lookups 100000] [--gtfs-dir cta-gtfs]
+    uv run python benchmarks/bench_travel_matrix.py --synthetic [--lines 8 --stations-per-line 30]
+
+--synthetic generates a network with bench_routing's generator, in a
+temporary directory. The build is timed from the compiled timetable, and
+from the raw GTFS files as a whole.
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from bench_routing import write_synthetic_gtfs
+from cta_pkms.routing import load_timetable
+from cta_pkms.travel_matrix import _loaded, build_travel_matrix, compute_travel_times, load_travel_matrix
+
+
+def run(gtfs_dir, lookups, seed):
+    started = time.perf_counter()
+    timetable = load_timetable(gtfs_dir)
+    print(f"load_timetable: {time.perf_counter() - started:.2f}s ({len(timetable.patterns)} patterns)")
+
+    started = time.perf_counter()
+    station_ids, _ = compute_travel_times(timetable)
+    print(f"compute_travel_times: {time.perf_counter() - started:.2f}s ({len(station_ids)} stations)")
+
+    started = time.perf_counter()
+    matrix = build_travel_matrix(gtfs_dir)
+    print(f"build_travel_matrix (compute + save): {time.perf_counter() - started:.2f}s, "
+          f"{matrix.times.nbytes / 1024:.0f} KiB")
+
+    _loaded.clear()
+    started = time.perf_counter()
+    matrix = load_travel_matrix(gtfs_dir)
+    print(f"load_travel_matrix (memory-mapped): {(time.perf_counter() - started) * 1000:.2f}ms")
+
+    rng = random.Random(seed)
+    pairs = [(rng.choice(station_ids), rng.choice(station_ids)) for _ in range(lookups)]
+    started = time.perf_counter()
+    for origin, destination in pairs:
+        matrix.minutes(origin, destination)
+    elapsed = time.perf_counter() - started
+    print(f"{lookups} ETA lookups: {elapsed / lookups * 1e6:.2f}us each")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--gtfs-dir", type=Path, default=Path("cta-gtfs"))
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=299)
+    parser.add_argument("--synthetic", action="store_true", help="Benchmark a generated network")
+    parser.add_argument("--lines", type=int, default=8)
+    parser.add_argument("--stations-per-line", type=int, default=30)
+    args = parser.parse_args()
+    if args.synthetic:
+        with tempfile.TemporaryDirectory() as tmp:
+            write_synthetic_gtfs(Path(tmp), lines=args.lines, stations_per_line=args.stations_per_line)
+            started = time.perf_counter()
+            run(Path(tmp), args.lookups, args.seed)
+            print(f"total from raw GTFS: {time.perf_counter() - started:.2f}s")
+    else:
+        run(args.gtfs_dir, args.lookups, args.seed)
+
+
+if __name__ == "__main__":
+    main()
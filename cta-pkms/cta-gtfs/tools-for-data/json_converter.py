@@ -1,20 +1,138 @@
+"""
+Convert a GTFS .txt table to JSONL, or to a columnar directory of NumPy
+arrays with --columnar.
+
+    python tools-for-data/json_converter.py stops.txt
+    python tools-for-data/json_converter.py stop_times.txt --columnar columnar/
+
+Columnar layout (read back with cta_pkms.columnar.load_table):
+
+    columnar/stop_times/_table.json        row count and per-column dtype/encoding
+    columnar/stop_times/<column>.npy       one array per column
+    columnar/stop_times/<column>.dict.json values for dictionary-encoded columns
+
+Times ("25:30:00") become int32 seconds after midnight, known numeric GTFS
+fields become int32/float64, and every other column (IDs, names) is
+dictionary-encoded as int32 codes. Missing values are -1 (NaN for floats).
+"""
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
 
-input_file = 'stops.txt'
-output_file = 'stops.jsonl'
 chunk_size = 100000  # Process 100k rows at a time
 
-print(f"Converting {input_file} to {output_file}...")
+FLOAT_COLUMNS = {"stop_lat", "stop_lon", "shape_pt_lat", "shape_pt_lon", "shape_dist_traveled"}
+INT_COLUMNS = {
+    "stop_sequence", "location_type", "wheelchair_boarding", "direction_id", "pickup_type",
+    "drop_off_type", "timepoint", "transfer_type", "min_transfer_time", "exception_type",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+    "start_date", "end_date", "date", "route_type", "shape_pt_sequence",
+    "wheelchair_accessible", "bikes_allowed",
+}
+
+
+def column_encoding(name):
+    # the named columns first: min_transfer_time is seconds, not HH:MM:SS
+    if name in FLOAT_COLUMNS:
+        return "plain", np.dtype("<f8")
+    if name in INT_COLUMNS:
+        return "plain", np.dtype("<i4")
+    if name.endswith("_time"):
+        return "time", np.dtype("<i4")
+    return "dict", np.dtype("<i4")
+
+
+def time_to_seconds(series):
+    parts = series.str.strip().str.split(":", expand=True).reindex(columns=range(3))
+    hours, minutes, seconds = (pd.to_numeric(parts[i], errors="coerce") for i in range(3))
+    return (hours * 3600 + minutes * 60 + seconds).fillna(-1)
+
+
+def convert_jsonl(input_file, output_file):
+    print(f"Converting {input_file} to {output_file}...")
+
+    # Open the output file in write mode
+    with open(output_file, 'w', encoding='utf-8') as f:
+        # Read the file in chunks
+        for i, chunk in enumerate(pd.read_csv(input_file, chunksize=chunk_size, dtype=str)):
+            # Note: dtype=str keeps times like "25:30:00" or leading zero IDs intact
 
-# Open the output file in write mode
-with open(output_file, 'w', encoding='utf-8') as f:
-    # Read the file in chunks
+            # Write chunk to file as JSON Lines (no brackets, one object per line)
+            chunk.to_json(f, orient='records', lines=True)
+
+            print(f"Processed chunk {i+1} ({chunk_size * (i+1)} rows estimated)...")
+
+    print("Conversion complete.")
+
+
+def convert_columnar(input_file, output_dir):
+    table_dir = Path(output_dir) / Path(input_file).stem
+    table_dir.mkdir(parents=True, exist_ok=True)
+    print(f"Converting {input_file} to columnar arrays in {table_dir}/...")
+
+    columns = None
+    raw_files = {}
+    dictionaries = {}
+    rows = 0
     for i, chunk in enumerate(pd.read_csv(input_file, chunksize=chunk_size, dtype=str)):
-        # Note: dtype=str keeps times like "25:30:00" or leading zero IDs intact
-        
-        # Write chunk to file as JSON Lines (no brackets, one object per line)
-        chunk.to_json(f, orient='records', lines=True)
-        
-        print(f"Processed chunk {i+1} ({chunk_size * (i+1)} rows estimated)...")
-
-print("Conversion complete.")
\ No newline at end of file
+        if columns is None:
+            columns = {name: column_encoding(name) for name in chunk.columns}
+            raw_files = {name: (table_dir / f"{name}.raw").open("wb") for name in columns}
+            dictionaries = {name: {} for name, (encoding, _) in columns.items() if encoding == "dict"}
+        for name, (encoding, dtype) in columns.items():
+            series = chunk[name]
+            if encoding == "time":
+                values = time_to_seconds(series)
+            elif encoding == "dict":
+                mapping = dictionaries[name]
+                for value in series.dropna().unique():
+                    mapping.setdefault(value, len(mapping))
+                values = series.map(mapping).fillna(-1)
+            elif dtype.kind == "f":
+                values = pd.to_numeric(series, errors="coerce")
+            else:
+                values = pd.to_numeric(series, errors="coerce").fillna(-1)
+            raw_files[name].write(values.to_numpy().astype(dtype).tobytes())
+        rows += len(chunk)
+        print(f"Processed chunk {i+1} ({rows} rows)...")
+
+    meta = {"rows": rows, "columns": {}}
+    for name, (encoding, dtype) in (columns or {}).items():
+        raw_path = table_dir / f"{name}.raw"
+        raw_files[name].close()
+        # Prepend an .npy header so the column can be memory-mapped with np.load.
+        with (table_dir / f"{name}.npy").open("wb") as out, raw_path.open("rb") as raw:
+            np.lib.format.write_array_header_1_0(
+                out, {"descr": dtype.str, "fortran_order": False, "shape": (rows,)}
+            )
+            while block := raw.read(1 << 24):
+                out.write(block)
+        raw_path.unlink()
+        if encoding == "dict":
+            with (table_dir / f"{name}.dict.json").open("w", encoding="utf-8") as f:
+                json.dump(list(dictionaries[name]), f)
+        meta["columns"][name] = {"dtype": dtype.str, "encoding": encoding}
+    with (table_dir / "_table.json").open("w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    print("Conversion complete.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a GTFS .txt table to JSONL or columnar arrays")
+    parser.add_argument("input_file", nargs="?", default="stops.txt")
+    parser.add_argument("--output", help="JSONL output file (default: <input>.jsonl)")
+    parser.add_argument("--columnar", metavar="DIR", help="Write typed NumPy columns under DIR instead")
+    args = parser.parse_args()
+
+    if args.columnar:
+        convert_columnar(args.input_file, args.columnar)
+    else:
+        convert_jsonl(args.input_file, args.output or str(Path(args.input_file).with_suffix(".jsonl")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Streaming join of a large GTFS JSONL file against small dimension tables.
+
+Dimension tables (trips, stops, ...) are loaded into compact lookups that
+keep only the fields the joins need. The fact file is then streamed line by
+line and enriched rows are written out in fixed-size batches, so memory use
+stays flat no matter how large the fact file is.
+
+A join spec is a JSON file like:
+
+    {
+      "input": "placeholder.jsonl",
+      "output": "placeholder_enriched.jsonl",
+      "require": ["trip_id", "stop_id"],
+      "lookups": {
+        "trips": {"file": "trips.jsonl", "key": "trip_id"},
+        "stops": {"file": "stops.jsonl", "key": "stop_id"}
+      },
+      "joins": [
+        {"lookup": "trips", "on": "trip_id", "fields": {"route_id": "route_id"}},
+        {"lookup": "stops", "on": "stop_id", "fields": {"parent_station": "parent_station"}},
+        {"lookup": "stops", "on": "parent_station", "fields": {"stop_name": "stop_name"}}
+      ],
+      "output_fields": ["route_id", "parent_station", "stop_name"],
+      "distinct": false
+    }
+
+Joins run in order and "on" may name a field produced by an earlier join.
+Run from the cta-gtfs directory:
+
+    python tools-for-data/stream_join.py spec.json
+    python tools-for-data/stream_join.py --preset enrich-placeholder
+"""
+import argparse
+import json
+import sys
+
+PRESETS = {
+    # Formerly enrich_placeholder.py
+    "enrich-placeholder": {
+        "input": "placeholder.jsonl",
+        "output": "placeholder_enriched.jsonl",
+        "require": ["trip_id", "stop_id"],
+        "lookups": {
+            "trips": {"file": "trips.jsonl", "key": "trip_id"},
+            "stops": {"file": "stops.jsonl", "key": "stop_id"},
+        },
+        "joins": [
+            {"lookup": "trips", "on": "trip_id", "fields": {"route_id": "route_id"}},
+            {"lookup": "stops", "on": "stop_id", "fields": {"parent_station": "parent_station"}},
+            {"lookup": "stops", "on": "parent_station", "fields": {"stop_name": "stop_name"}},
+        ],
+        "output_fields": ["route_id", "parent_station", "stop_name"],
+    },
+    # Formerly parent_station_lookup.py
+    "parent-station-lookup": {
+        "input": "route-stations.jsonl",
+        "output": "parent_stations.jsonl",
+        "require": ["stop_id"],
+        "lookups": {
+            "stops": {"file": "stops.jsonl", "key": "stop_id"},
+        },
+        "joins": [
+            {"lookup": "stops", "on": "stop_id",
+             "fields": {"parent_station": "parent_station", "stop_name": "stop_name"}},
+            {"lookup": "stops", "on": "parent_station", "fields": {"parent_station_name": "stop_name"}},
+        ],
+        "output_fields": ["stop_id", "parent_station", "parent_station_name", "stop_name"],
+    },
+}
+
+DEFAULT_BATCH_SIZE = 10000
+
+
+def load_lookup(path, key, fields):
+    """
+    Load a dimension table as {key: tuple of field values}, keeping only
+    `fields`. Repeated strings are interned so IDs are stored once.
+    """
+    lookup = {}
+    intern = sys.intern
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            if row.get(key) is None:
+                continue
+            lookup[intern(str(row[key]))] = tuple(
+                intern(value) if isinstance(value, str) else value
+                for value in (row.get(field) for field in fields)
+            )
+    return lookup
+
+
+def compile_spec(spec):
+    """
+    Load every lookup a spec uses and return a list of
+    (lookup dict, on field, [(output name, column position)]) per join.
+    """
+    needed = {}
+    for join in spec["joins"]:
+        columns = needed.setdefault(join["lookup"], [])
+        for source_field in join["fields"].values():
+            if source_field not in columns:
+                columns.append(source_field)
+
+    lookups = {}
+    for name, columns in needed.items():
+        table = spec["lookups"][name]
+        lookups[name] = (load_lookup(table["file"], table["key"], columns), columns)
+
+    steps = []
+    for join in spec["joins"]:
+        lookup, columns = lookups[join["lookup"]]
+        steps.append((lookup, join["on"], [
+            (out_name, columns.index(source_field)) for out_name, source_field in join["fields"].items()
+        ]))
+    return steps
+
+
+def stream_join(spec, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Run a join spec. Returns (rows read, rows written).
+    """
+    steps = compile_spec(spec)
+    require = spec.get("require", [])
+    output_fields = spec["output_fields"]
+    seen = set() if spec.get("distinct") else None
+
+    read = written = 0
+    buffer = []
+    with open(spec["input"]) as infile, open(spec["output"], "w") as outfile:
+        for line in infile:
+            line = line.strip()
+            if not line:
+                continue
+            read += 1
+            row = json.loads(line)
+            if any(row.get(field) is None for field in require):
+                print(f"Warning: Missing {' or '.join(require)} in line: {line}", file=sys.stderr)
+                continue
+            for lookup, on, fields in steps:
+                value = row.get(on)
+                values = lookup.get(str(value)) if value is not None else None
+                for out_name, position in fields:
+                    row[out_name] = values[position] if values is not None else None
+            out = json.dumps({field: row.get(field) for field in output_fields})
+            if seen is not None:
+                if out in seen:
+                    continue
+                seen.add(out)
+            buffer.append(out + "\n")
+            written += 1
+            if len(buffer) >= batch_size:
+                outfile.write("".join(buffer))
+                buffer.clear()
+        outfile.write("".join(buffer))
+    return read, written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Streaming join of a GTFS JSONL file against lookup tables")
+    parser.add_argument("spec", nargs="?", help="Path to a JSON join spec")
+    parser.add_argument("--preset", choices=sorted(PRESETS), help="Use a built-in join spec")
+    parser.add_argument("--input", help="Override the spec's input file")
+    parser.add_argument("--output", help="Override the spec's output file")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Rows buffered per write")
+    parser.add_argument("--distinct", action="store_true", help="Drop duplicate output rows")
+    args = parser.parse_args(argv)
+
+    if args.preset:
+        spec = dict(PRESETS[args.preset])
+    elif args.spec:
+        with open(args.spec) as f:
+            spec = json.load(f)
+    else:
+        parser.error("a spec file or --preset is required")
+    if args.input:
+        spec["input"] = args.input
+    if args.output:
+        spec["output"] = args.output
+    if args.distinct:
+        spec["distinct"] = True
+
+    read, written = stream_join(spec, batch_size=args.batch_size)
+    print(f"Joined {read} rows from {spec['input']}, wrote {written} to {spec['output']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,24 @@
 import os
-import requests
+import re
+import time
 import typer
 import json
 from pathlib import Path
 import sys
-from textual.app import App, ComposeResult
-from textual.widgets import Header, Footer, ListView, ListItem, Label, Button
-from openai import OpenAI
+import threading
+
+from . import cache, daemon
+from .cta_api import CTAAPIError, fetch_arrivals_many, get_client
+from .planner import (
+    PLANNER_MODEL, build_planner_prompt, cached_plan, planner_cache_key, reduce_planner_inputs,
+    stream_completion,
+)
+from .routing import Router, describe_journey, load_timetable
+from .spatial import ALTERNATIVE_MILES, load_spatial_index
+from .station_index import load_station_index
+from .storage import ensure_file, load_json, save_json
+from .task_io import FORMATS, Timer, guess_format, open_input, open_output, read_records, write_records
+from .task_store import JSONTaskStore, SQLiteTaskStore
 
 CTA_TRAIN_TRACKER_API_KEY = os.getenv("CTA_TRAIN_TRACKER_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -14,58 +26,56 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 def fetch_cta_alerts():
     """
     Fetch CTA service alerts (Customer Alerts API).
-    Returns a list of alerts (dicts).
+    Returns a list of alerts (dicts). Raises CTAAPIError if the request fails.
     """
-    url = f"http://lapi.transitchicago.com/api/1.0/alerts.aspx?outputType=JSON"
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        return data.get("CTAAlerts", {}).get("Alert", [])
-    except Exception as e:
-        print(f"Error fetching alerts: {e}")
-        return []
+    return daemon.forward("alerts", lambda: get_client().alerts())
+
+_openai_clients = {}
 
-def call_openai_route_planner(departure, arrival, arrivals, alerts, api_key=OPENAI_API_KEY):
+def get_openai_client(api_key=OPENAI_API_KEY):
+    """
+    Return a reusable OpenAI client for the given API key.
+    """
+    if api_key not in _openai_clients:
+        # imported here: the SDK takes longer to load than most commands take to run
+        from openai import OpenAI
+        _openai_clients[api_key] = OpenAI(api_key=api_key)
+    return _openai_clients[api_key]
+
+def call_openai_route_planner(departure, arrival, arrivals, alerts, api_key=OPENAI_API_KEY, on_token=None,
+                              alternatives=()):
     """
     Call OpenAI Chat Completions API to plan best route and estimate time.
-    Returns dict with route and ETA.
-    """
-
-    client = OpenAI()
-    import requests
-    prompt = [
-        {"role": "user", "content":
-        f"You are a CTA commute planner. Given the following commute:\n"
-        f"Departure: {departure['stop_name']} ({departure['stop_id']})\n"
-        f"Arrival: {arrival['stop_name']} ({arrival['stop_id']})\n"
-        f"Live arrivals: {json.dumps(arrivals)}\n"
-        f"Service alerts: {json.dumps(alerts)}\n"
-        "Find the quickest CTA 'L' route from departure to arrival, considering live arrivals and alerts. "
-        "Feel free to use a different route if it is faster, even if it means terminating at a different station. Just make sure the it's not over 1 mile away from the original arrival station. "
-        "Only return the recommended route and estimated time in minutes."
-        "Format your response in this manner: [Briefly mention whether service alerts will affect commute, and how, if so] You will travel from [departure station] to [arrival station] via [line]. Estimated total commute time: [time] minutes. Your train will arrive at [departure time]. [mention transfers if applicable]"
-        "Do not include brackets in your response."
-        }
-    ]
+    `alternatives` are stations the trip may end at instead of `arrival`.
+    Returns the recommendation text. Answers are cached for a minute per
+    normalised request, and identical concurrent requests share one call.
+    If `on_token` is given the answer is streamed to it as it is generated
+    (a cached answer is not passed to it).
+    """
+    prompt = build_planner_prompt(departure, arrival, arrivals, alerts, alternatives)
+    key = planner_cache_key(departure, arrival, arrivals, alerts, alternatives=alternatives)
 
-    try:
+    def ask():
+        client = get_openai_client(api_key)
+        if on_token is not None:
+            return stream_completion(client, PLANNER_MODEL, prompt, on_token)[0]
         completion = client.chat.completions.create(
-            model="gpt-4o",
+            model=PLANNER_MODEL,
             messages=prompt
-    )
+        )
+        return completion.choices[0].message.content
+
+    try:
+        return cached_plan(key, ask)
     except Exception as e:
-        print(f"Error calling OpenAI: {e}")
-        return "Could not get route recommendation."
-    
-    return completion.choices[0].message.content
+        return f"Could not get route recommendation ({e})."
 
 def select_commute():
     """
     CLI to select a saved commute.
     Returns (departure, arrival) station dicts.
     """
-    commutes = load_json(COMMUTES_FILE)
+    commutes = get_task_store().list_commutes()
     if not commutes:
         typer.echo("No commutes found.")
         return None, None
@@ -89,258 +99,82 @@ def run_single_station_selector():
     TUI to select a single station (by stop_name/stop_id).
     Returns the selected station dict.
     """
+    from .selector import run_single_station_selector
+    return run_single_station_selector()
 
-    STATIONS_FILE = Path("cta-gtfs/route-stations.jsonl")
-
-    def get_lines(stops):
-            lines = {}
-            for stop in stops:
-                line = stop.get('route_id') or stop.get('line') or stop.get('line_id')
-                if line:
-                    if line not in lines:
-                        lines[line] = []
-                    lines[line].append(stop)
-            return lines
-
-    def load_stations():
-        stations = []
-        if STATIONS_FILE.exists():
-            with STATIONS_FILE.open() as f:
-                for line in f:
-                    try:
-                        station = json.loads(line)
-                        stations.append(station)
-                    except Exception:
-                        continue
-        return stations
-
-    class StationSelector(App):
-        CSS_PATH = None
-
-        def __init__(self):
-            super().__init__()
-            self.stations = load_stations()
-            self.lines = get_lines(self.stations)
-            self.departure_line = None
-            self.departure = None
-            self.step = 'departure_line'
-
-        def compose(self) -> ComposeResult:
-            yield Header()
-            if self.step == 'departure_line':
-                yield Label("Select Departure Line:")
-                yield ListView(*[
-                    ListItem(Label(str(line))) for line in self.lines.keys()
-                ], id="departure_line_list")
-            elif self.step == 'departure_station':
-                yield Label(f"Select Departure Station (Line: {self.departure_line}):")
-                yield ListView(*[
-                    ListItem(Label(f"{station['stop_name']}")) for station in self.lines[self.departure_line]
-                ], id="departure_station_list")
-            elif self.step == 'confirm':
-                yield Label(f"Departure: {self.departure['stop_name']}")
-                yield Button("Confirm Selection", id="confirm_btn")
-            yield Footer()
-
-        def on_mount(self):
-                self.refresh_focus()
-            
-        def refresh_focus(self):
-            if self.step == 'departure_line':
-                self.query_one("#departure_line_list").focus()
-            elif self.step == 'departure_station':
-                self.query_one("#departure_station_list").focus()
-            elif self.step == 'confirm':
-                self.query_one("#confirm_btn").focus()
-
-        def on_list_view_selected(self, event):
-            list_id = event.list_view.id
-            idx = event.index
-            if self.step == 'departure_line' and list_id == "departure_line_list":
-                self.departure_line = list(self.lines.keys())[idx]
-                self.step = 'departure_station'
-                self.refresh_screen()
-            elif self.step == 'departure_station' and list_id == "departure_station_list":
-                self.departure = self.lines[self.departure_line][idx]
-                self.step = 'confirm'
-                self.refresh_screen()
-            
-
-        def on_button_pressed(self, event):
-            if event.button.id == "confirm_btn":
-                if self.departure:
-                    self.exit(self.departure)
-                else:
-                    self.step = 'departure_line'
-                    self.refresh_screen()
-
-        def refresh_screen(self):
-            for widget in self.compose():
-                self.mount(widget)
-            self.refresh_focus()
-    return StationSelector().run()
-
-def fetch_next_arrivals(stop_id, api_key=CTA_TRAIN_TRACKER_API_KEY):
+def fetch_next_arrivals(stop_id, api_key=CTA_TRAIN_TRACKER_API_KEY, fresh=False):
     """
     Fetch next 5 arrivals for a given stop_id from CTA Train Tracker API.
-    Returns a list of arrivals (dicts).
+    Returns a list of arrivals (dicts). Raises CTAAPIError if the request fails.
+    With `fresh`, a cached answer is not used.
     """
-    # Placeholder endpoint and params (see CTA docs for details)
-    url = f"http://lapi.transitchicago.com/api/1.0/ttarrivals.aspx?key={api_key}&mapid={stop_id}&max=5&outputType=JSON"
-    
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        # Parse arrivals from API response (structure may vary)
-        arrivals = []
-        for eta in data.get("ctatt", {}).get("eta", []):
-            arrivals.append({
-                "route": eta.get("rt"),
-                "destination": eta.get("destNm"),
-                "arrival_time": eta.get("arrT"),
-                "is_scheduled": eta.get("isSch"),
-                "is_delayed": eta.get("isDly"),
-                "train_id": eta.get("trainId"),
-            })
-        return arrivals
-    except Exception as e:
-        print(f"Error fetching arrivals: {e}")
-        return []
+    return daemon.forward(
+        "arrivals", lambda: get_client().arrivals(stop_id, max_results=5, api_key=api_key, fresh=fresh),
+        stop_id=stop_id, api_key=api_key, fresh=fresh)
 
-def run_station_selector():
+def find_station(stop_id):
+    "Look up a station by stop_id in the station index; None if there is none."
+    return daemon.forward("station", lambda: load_station_index().get(stop_id), stop_id=stop_id)
 
-    STATIONS_FILE = Path("cta-gtfs/route-stations.jsonl")
-
-    def get_lines(stops):
-            lines = {}
-            for stop in stops:
-                line = stop.get('route_id') or stop.get('line') or stop.get('line_id')
-                if line:
-                    if line not in lines:
-                        lines[line] = []
-                    lines[line].append(stop)
-            return lines
-
-    def load_stations():
-        stations = []
-        if STATIONS_FILE.exists():
-            with STATIONS_FILE.open() as f:
-                for line in f:
-                    try:
-                        station = json.loads(line)
-                        stations.append(station)
-                    except Exception:
-                        continue
-        return stations
-
-    class StationSelector(App):
-        CSS_PATH = None
-
-        def __init__(self):
-            super().__init__()
-            self.stations = load_stations()
-            self.lines = get_lines(self.stations)
-            self.departure_line = None
-            self.arrival_line = None
-            self.departure = None
-            self.arrival = None
-            self.step = 'departure_line'
-
-        def compose(self) -> ComposeResult:
-            yield Header()
-            if self.step == 'departure_line':
-                yield Label("Select Departure Line:")
-                yield ListView(*[
-                    ListItem(Label(str(line))) for line in self.lines.keys()
-                ], id="departure_line_list")
-            elif self.step == 'departure_station':
-                yield Label(f"Select Departure Station (Line: {self.departure_line}):")
-                yield ListView(*[
-                    ListItem(Label(f"{station['stop_name']}")) for station in self.lines[self.departure_line]
-                ], id="departure_station_list")
-            elif self.step == 'arrival_line':
-                yield Label("Select Arrival Line:")
-                yield ListView(*[
-                    ListItem(Label(str(line))) for line in self.lines.keys()
-                ], id="arrival_line_list")
-            elif self.step == 'arrival_station':
-                yield Label(f"Select Arrival Station (Line: {self.arrival_line}):")
-                yield ListView(*[
-                    ListItem(Label(f"{station['stop_name']}")) for station in self.lines[self.arrival_line]
-                ], id="arrival_station_list")
-            elif self.step == 'confirm':
-                yield Label(f"Departure: {self.departure['stop_name']}")
-                yield Label(f"Arrival: {self.arrival['stop_name']}")
-                yield Button("Confirm Selection", id="confirm_btn")
-            yield Footer()
-
-        def on_mount(self):
-            self.refresh_focus()
-
-        def refresh_focus(self):
-            if self.step == 'departure_line':
-                self.query_one("#departure_line_list").focus()
-            elif self.step == 'departure_station':
-                self.query_one("#departure_station_list").focus()
-            elif self.step == 'arrival_line':
-                self.query_one("#arrival_line_list").focus()
-            elif self.step == 'arrival_station':
-                self.query_one("#arrival_station_list").focus()
-            elif self.step == 'confirm':
-                self.query_one("#confirm_btn").focus()
-
-        def on_list_view_selected(self, event):
-            list_id = event.list_view.id
-            idx = event.index
-            if self.step == 'departure_line' and list_id == "departure_line_list":
-                self.departure_line = list(self.lines.keys())[idx]
-                self.step = 'departure_station'
-                self.refresh_screen()
-            elif self.step == 'departure_station' and list_id == "departure_station_list":
-                self.departure = self.lines[self.departure_line][idx]
-                self.step = 'arrival_line'
-                self.refresh_screen()
-            elif self.step == 'arrival_line' and list_id == "arrival_line_list":
-                self.arrival_line = list(self.lines.keys())[idx]
-                self.step = 'arrival_station'
-                self.refresh_screen()
-            elif self.step == 'arrival_station' and list_id == "arrival_station_list":
-                self.arrival = self.lines[self.arrival_line][idx]
-                self.step = 'confirm'
-                self.refresh_screen()
-
-        def on_button_pressed(self, event):
-            if event.button.id == "confirm_btn":
-                if self.departure and self.arrival:
-                    self.exit((self.departure, self.arrival))
-                else:
-                    self.step = 'departure_line'
-                    self.refresh_screen()
-
-        def refresh_screen(self):
-            for widget in self.compose():
-                self.mount(widget)
-            self.refresh_focus()
-    return StationSelector().run()
+COORDINATES = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$")
 
-app = typer.Typer()
+def resolve_location(location, count=1):
+    """
+    Stations for a free-text location, best first, as (station, miles) pairs.
+    "lat,lon" gives the nearest stations from the spatial index; anything
+    else is matched against station names (ignoring words that match no
+    station, like "near"), with miles None.
+    """
+    def local():
+        match = COORDINATES.match(location)
+        if match:
+            return load_spatial_index().nearest_stations(float(match[1]), float(match[2]), count)
+        index = load_station_index()
+        words = [word for word in location.split() if index.search(word, limit=1)]
+        return [(station, None) for station in index.search(" ".join(words), limit=count)] if words else []
 
-TASKS_FILE = Path("tasks.json")
-COMMUTES_FILE = Path("commutes.json")
+    return [tuple(pair) for pair in daemon.forward("locate", local, location=location, count=count)]
 
-def ensure_file(file_path):
-    if not file_path.exists():
-        file_path.write_text("[]")
+def run_station_selector():
+    """
+    TUI to select departure and arrival stations.
+    Returns (departure, arrival) station dicts.
+    """
+    from .selector import run_station_selector
+    return run_station_selector()
 
-def load_json(file_path):
-    ensure_file(file_path)
-    with file_path.open() as f:
-        return json.load(f)
+app = typer.Typer()
 
-def save_json(file_path, data):
-    with file_path.open("w") as f:
-        json.dump(data, f, indent=2)
+TASKS_FILE = Path("tasks.json")
+COMMUTES_FILE = Path("commutes.json")
+TASKS_DB = Path(os.getenv("CTA_PKMS_DB", "cta_pkms.sqlite3"))
+# "json" (tasks.json / commutes.json) or "sqlite" (TASKS_DB)
+STORAGE_BACKEND = os.getenv("CTA_PKMS_STORAGE", "json")
+# Where `record` logs sampled arrivals, one file per day.
+RECORD_DIR = Path(os.getenv("CTA_PKMS_RECORDINGS", "recordings"))
+
+def store_config():
+    "Which store this process is configured for, with paths resolved against its working directory."
+    return {"backend": STORAGE_BACKEND, "tasks_file": str(TASKS_FILE.resolve()),
+            "commutes_file": str(COMMUTES_FILE.resolve()), "db": str(TASKS_DB.resolve())}
+
+def open_task_store(config):
+    "The store a store_config() describes."
+    if config["backend"] == "sqlite":
+        return SQLiteTaskStore(config["db"])
+    return JSONTaskStore(config["tasks_file"], config["commutes_file"])
+
+def get_task_store(forward=True):
+    """
+    The configured task store. While `cta-pkms serve` is running (and
+    forward is set) its calls run in the daemon, against this process's
+    store rather than the daemon's; that store has no transaction(), so
+    bulk changes ask for a local one.
+    """
+    client = daemon.daemon_client() if forward else None
+    if client is not None:
+        return daemon.RemoteTaskStore(client, store_config())
+    return open_task_store(store_config())
 
 @app.command()
 def add_task(
@@ -351,7 +185,6 @@ def add_task(
     """
     Add a new task with name, description, and optional location.
     """
-    tasks = load_json(TASKS_FILE)
     task = {
         "name": name,
         "description": description,
@@ -359,8 +192,7 @@ def add_task(
     }
     if location:
         task["location"] = location
-    tasks.append(task)
-    save_json(TASKS_FILE, tasks)
+    get_task_store().add_task(task)
     typer.echo(f"Task added: {name}\nDescription: {description}" + (f"\nLocation: {location}" if location else "") + "\nStatus: pending")
 
 @app.command()
@@ -375,46 +207,36 @@ def amend_task(
     Amend a task's name, description, location, or status.
     Status can only be 'pending' or 'completed'.
     """
-    tasks = load_json(TASKS_FILE)
-    if 1 <= index <= len(tasks):
-        task = tasks[index - 1]
-        changed = False
-        if name is not None:
-            task["name"] = name
-            changed = True
-        if description is not None:
-            task["description"] = description
-            changed = True
-        if location is not None:
-            if location == "":
-                task.pop("location", None)
-            else:
-                task["location"] = location
-            changed = True
-        if status is not None:
-            if status in ["pending", "completed"]:
-                task["status"] = status
-                changed = True
-            else:
-                typer.echo("Status must be 'pending' or 'completed'.")
-                return
-        if changed:
-            save_json(TASKS_FILE, tasks)
-            typer.echo(f"Task {index} amended.")
-        else:
-            typer.echo("No changes provided.")
-    else:
+    if status is not None and status not in ["pending", "completed"]:
+        typer.echo("Status must be 'pending' or 'completed'.")
+        return
+    changes = {}
+    if name is not None:
+        changes["name"] = name
+    if description is not None:
+        changes["description"] = description
+    if location is not None:
+        # an empty location removes it
+        changes["location"] = location or None
+    if status is not None:
+        changes["status"] = status
+    # amend_task with no changes still says whether the task exists
+    if not get_task_store().amend_task(index, changes):
         typer.echo("Invalid task number.")
+    elif changes:
+        typer.echo(f"Task {index} amended.")
+    else:
+        typer.echo("No changes provided.")
 
 @app.command()
 def list_tasks():
     "List all tasks."
-    tasks = load_json(TASKS_FILE)
+    tasks = get_task_store().list_tasks()
     if not tasks:
         typer.echo("No tasks found.")
         return
-    pending = [task for task in tasks if task.get('status', 'pending') == 'pending']
-    completed = [task for task in tasks if task.get('status', 'pending') == 'completed']
+    pending = [task for task in tasks if task.get("status", "pending") == "pending"]
+    completed = [task for task in tasks if task.get("status", "pending") == "completed"]
 
     typer.echo("Pending Tasks:")
     if not pending:
@@ -446,22 +268,169 @@ def delete_task(
     """
     Delete a task by its number within the status group ('pending' or 'completed').
     """
-    tasks = load_json(TASKS_FILE)
     if status not in ["pending", "completed"]:
         typer.echo("Status must be 'pending' or 'completed'.")
         return
-    filtered = [i for i, task in enumerate(tasks) if task.get('status', 'pending') == status]
-    if not filtered:
-        typer.echo(f"No {status} tasks found.")
-        return
-    if 1 <= index <= len(filtered):
-        real_idx = filtered[index - 1]
-        removed = tasks.pop(real_idx)
-        save_json(TASKS_FILE, tasks)
+    store = get_task_store()
+    removed = store.delete_task(index, status)
+    if removed is not None:
         typer.echo(f"Deleted {status} task: {removed['name']}")
+    elif not store.count_tasks(status):
+        typer.echo(f"No {status} tasks found.")
     else:
         typer.echo(f"Invalid {status} task number.")
 
+@app.command()
+def search_tasks(
+    query: str = typer.Argument(..., help="Words to look for in task names and descriptions"),
+    limit: int = typer.Option(20, help="Maximum number of results")
+):
+    """
+    Find tasks whose name or description contain every word of the query.
+    """
+    tasks = get_task_store().search_tasks(query, limit=limit)
+    if not tasks:
+        typer.echo("No matching tasks.")
+        return
+    for i, task in enumerate(tasks, 1):
+        typer.echo(f"{i}. {task['name']}\n   Description: {task.get('description', '')}")
+        if 'location' in task:
+            typer.echo(f"   Location: {task['location']}")
+        typer.echo(f"   Status: {task.get('status', 'pending')}")
+
+@app.command()
+def migrate(
+    to: str = typer.Option("sqlite", help="Backend to copy into: 'sqlite' or 'json'")
+):
+    """
+    Copy tasks and commutes between tasks.json/commutes.json and the SQLite database.
+    Whatever is already in the target is replaced.
+    """
+    json_store = JSONTaskStore(TASKS_FILE, COMMUTES_FILE)
+    sqlite_store = SQLiteTaskStore(TASKS_DB)
+    try:
+        if to == "sqlite":
+            tasks, commutes = json_store.list_tasks(), json_store.list_commutes()
+            sqlite_store.import_json(tasks, commutes)
+            target = TASKS_DB
+        elif to == "json":
+            tasks, commutes = sqlite_store.list_tasks(), sqlite_store.list_commutes()
+            save_json(TASKS_FILE, tasks)
+            save_json(COMMUTES_FILE, commutes)
+            target = f"{TASKS_FILE} and {COMMUTES_FILE}"
+        else:
+            typer.echo("Backend must be 'sqlite' or 'json'.")
+            return
+    finally:
+        sqlite_store.close()
+    typer.echo(f"Copied {len(tasks)} tasks and {len(commutes)} commutes to {target}.")
+    if to == "sqlite" and STORAGE_BACKEND != "sqlite":
+        typer.echo("Set CTA_PKMS_STORAGE=sqlite to use it.")
+
+TASK_FIELDS = ["name", "description", "location", "status"]
+TASK_STATUSES = ["pending", "completed"]
+
+def task_from_record(record):
+    "Build a task from an imported or batched record, checking its fields."
+    if not record.get("name"):
+        raise ValueError("a task needs a name")
+    status = record.get("status", "pending")
+    if status not in TASK_STATUSES:
+        raise ValueError("status must be 'pending' or 'completed'")
+    task = {"name": record["name"], "description": record.get("description", ""), "status": status}
+    if record.get("location"):
+        task["location"] = record["location"]
+    return task
+
+def apply_task_record(store, record):
+    """
+    Apply one batch record to the store:
+      {"op": "add", "name": ..., "description": ..., "location": ..., "status": ...}
+      {"op": "amend", "index": N, <fields to change>}   (location "" removes it)
+      {"op": "delete", "index": N, "status": "pending"} (numbered within the status group)
+    """
+    op = record.get("op", "add")
+    if op == "add":
+        store.add_task(task_from_record(record))
+    elif op == "amend":
+        changes = {field: record[field] for field in TASK_FIELDS if field in record}
+        if "status" in changes and changes["status"] not in TASK_STATUSES:
+            raise ValueError("status must be 'pending' or 'completed'")
+        if "location" in changes:
+            changes["location"] = changes["location"] or None
+        if not store.amend_task(int(record.get("index", 0)), changes):
+            raise ValueError(f"no task number {record.get('index')}")
+    elif op == "delete":
+        status = record.get("status", "pending")
+        if store.delete_task(int(record.get("index", 0)), status) is None:
+            raise ValueError(f"no {status} task number {record.get('index')}")
+    else:
+        raise ValueError(f"unknown op {op!r}")
+
+def run_task_records(records, apply):
+    """
+    Apply records in one store transaction. Stops at the first bad record
+    and saves nothing; returns the number applied, or None on error.
+    """
+    store = get_task_store(forward=False)
+    timer = Timer()
+    count = 0
+    try:
+        with store.transaction():
+            for count, record in enumerate(records, start=1):
+                apply(store, record)
+    except (ValueError, TypeError, KeyError) as e:
+        typer.echo(f"Record {count}: {e}. No changes were saved.", err=True)
+        raise typer.Exit(1)
+    typer.echo(timer.report(count), err=True)
+    return count
+
+@app.command()
+def import_tasks(
+    path: str = typer.Argument(..., help="JSONL or CSV file of tasks, or - for stdin"),
+    format: str = typer.Option(None, help="'jsonl' or 'csv' (default: from the file extension)")
+):
+    """
+    Add tasks from a JSONL or CSV file (fields: name, description, location, status)
+    in a single save.
+    """
+    fmt = guess_format(path, format)
+    if fmt not in FORMATS:
+        typer.echo("Format must be 'jsonl' or 'csv'.")
+        return
+    with open_input(path) as f:
+        count = run_task_records(read_records(f, fmt), lambda store, record: store.add_task(task_from_record(record)))
+    typer.echo(f"Imported {count} tasks.")
+
+@app.command()
+def export_tasks(
+    path: str = typer.Argument("-", help="File to write, or - for stdout"),
+    format: str = typer.Option(None, help="'jsonl' or 'csv' (default: from the file extension)")
+):
+    """
+    Write every task as JSONL or CSV.
+    """
+    fmt = guess_format(path, format)
+    if fmt not in FORMATS:
+        typer.echo("Format must be 'jsonl' or 'csv'.")
+        return
+    timer = Timer()
+    tasks = get_task_store().list_tasks()
+    with open_output(path) as f:
+        count = write_records(tasks, f, TASK_FIELDS, fmt)
+    typer.echo(f"Exported {timer.report(count, 'tasks')}", err=True)
+
+@app.command()
+def batch(
+    path: str = typer.Option("-", "--file", help="JSONL file of changes (default: stdin)")
+):
+    """
+    Apply add/amend/delete records (one JSON object per line) in one transaction,
+    e.g. {"op": "amend", "index": 3, "status": "completed"}.
+    """
+    with open_input(path) as f:
+        run_task_records(read_records(f), apply_task_record)
+
 @app.command()
 def add_commute(
     name: str = typer.Argument(..., help="Commute name")
@@ -473,7 +442,6 @@ def add_commute(
     result = run_station_selector()
     if result and isinstance(result, tuple) and len(result) == 2:
         departure, arrival = result
-        commutes = load_json(COMMUTES_FILE)
         commute = {
             "name": name,
             "departure_station": departure["stop_name"],
@@ -481,8 +449,7 @@ def add_commute(
             "arrival_station": arrival["stop_name"],
             "arrival_stop_id": arrival["stop_id"]
         }
-        commutes.append(commute)
-        save_json(COMMUTES_FILE, commutes)
+        get_task_store().add_commute(commute)
         typer.echo(f"Commute added: {name}\nDeparture: {departure['stop_name']} ({departure['stop_id']})\nArrival: {arrival['stop_name']} ({arrival['stop_id']})")
     else:
         typer.echo("Commute creation cancelled or failed.")
@@ -490,7 +457,7 @@ def add_commute(
 @app.command()
 def list_commutes():
     "List all commutes."
-    commutes = load_json(COMMUTES_FILE)
+    commutes = get_task_store().list_commutes()
     if not commutes:
         typer.echo("No commutes found.")
         return
@@ -500,50 +467,451 @@ def list_commutes():
 @app.command()
 def delete_commute(index: int):
     "Delete a commute by its number."
-    commutes = load_json(COMMUTES_FILE)
-    if 1 <= index <= len(commutes):
-        removed = commutes.pop(index - 1)
-        save_json(COMMUTES_FILE, commutes)
+    removed = get_task_store().delete_commute(index)
+    if removed is not None:
         typer.echo(f"Deleted commute: {removed['name']}")
     else:
         typer.echo("Invalid commute number.")
 
 @app.command()
-def next_arrivals():
+def nearest_station(
+    location: str = typer.Argument(..., help="A station name (e.g. 'near Clark/Lake') or 'lat,lon'"),
+    count: int = typer.Option(3, help="How many stations to show")
+):
+    """
+    Show the stations closest to a location.
+    """
+    stations = resolve_location(location, count)
+    if not stations:
+        typer.echo(f"No station found for: {location}")
+        return
+    for i, (station, miles) in enumerate(stations, 1):
+        typer.echo(f"{i}. {station['stop_name']} ({station['stop_id']})" + (f" {miles:.2f} mi" if miles is not None else ""))
+
+@app.command()
+def next_arrivals(
+    stop_id: str = typer.Option(None, help="Station stop_id (skips the station selector)"),
+    task: int = typer.Option(None, help="Pending task number: use the station nearest its location"),
+    watch: bool = typer.Option(False, help="Keep the display up, refreshing until Ctrl-C")
+):
     """
     Select a station via TUI and display next 5 train arrivals using CTA API.
+    With --watch, keep polling (sooner when a train is close, backing off on
+    errors) and redraw only what changed.
     """
-    typer.echo("Launching station selector...")
-    station = run_single_station_selector()
+    if task is not None:
+        pending = get_task_store().list_tasks("pending")
+        if not 1 <= task <= len(pending) or not pending[task - 1].get("location"):
+            typer.echo(f"Pending task {task} not found or has no location.")
+            return
+        stations = resolve_location(pending[task - 1]["location"])
+        if not stations:
+            typer.echo(f"No station found for: {pending[task - 1]['location']}")
+            return
+        station = stations[0][0]
+    elif stop_id is not None:
+        station = find_station(stop_id)
+        if station is None:
+            typer.echo(f"Unknown stop_id: {stop_id}")
+            return
+    else:
+        typer.echo("Launching station selector...")
+        station = run_single_station_selector()
     if not station or "stop_id" not in station:
         typer.echo("No station selected or missing stop_id.")
         return
     stop_id = station["stop_id"]
+    if watch:
+        watch_arrivals(station)
+        return
     typer.echo(f"Fetching next arrivals for {station['stop_name']} (stop_id: {stop_id})...")
-    arrivals = fetch_next_arrivals(stop_id)
+    try:
+        arrivals = fetch_next_arrivals(stop_id)
+    except CTAAPIError as e:
+        typer.echo(f"Error fetching arrivals: {e}")
+        return
     if not arrivals:
-        typer.echo("No arrivals found or API error.")
+        typer.echo("No arrivals found.")
         return
-    typer.echo(f"Next 3 arrivals at {station['stop_name']}:")
+    typer.echo(f"Next {len(arrivals)} arrivals at {station['stop_name']}:")
     for i, arr in enumerate(arrivals, 1):
-        typer.echo(f"{i}. Route: {arr['route']} | Destination: {arr['destination']} | Arrival Time: {arr['arrival_time']}" +
-                   (" | Delayed" if arr.get('is_delayed') == '1' else ""))
-        
+        typer.echo(f"{i}. {format_arrival(arr)}")
+
+def watch_arrivals(station, max_polls=None):
+    "Run the --watch display for a station; prints request and CPU counts when stopped."
+    from .watch import Screen, Watcher
+    cache.BACKGROUND_REFRESH = True
+    watcher = Watcher(lambda: fetch_next_arrivals(station["stop_id"], fresh=True), station["stop_name"],
+                      format_arrival, Screen(sys.stdout, ansi=sys.stdout.isatty()))
+    try:
+        watcher.run(max_polls)
+    except KeyboardInterrupt:
+        pass
+    typer.echo(watcher.summary(), err=True)
+    return watcher
+
+def format_arrival(arr):
+    return (f"Route: {arr['route']} | Destination: {arr['destination']} | Arrival Time: {arr['arrival_time']}" +
+            (" | Delayed" if arr.get('is_delayed') == '1' else ""))
+
+def fetch_board(stop_ids, concurrency=8):
+    """
+    Fetch arrivals for every stop_id, and the alerts, concurrently.
+    Returns ({stop_id: arrivals or CTAAPIError}, alerts or CTAAPIError).
+    """
+    def local():
+        import asyncio
+        return asyncio.run(fetch_arrivals_many(stop_ids, concurrency=concurrency))
+
+    def decode(result):
+        return daemon.decode_error(result) if isinstance(result, dict) and result.get("ok") is False else result
+
+    board = daemon.forward("board", local, stop_ids=list(stop_ids), concurrency=concurrency)
+    if isinstance(board, tuple):
+        return board  # fetched here
+    return {stop_id: decode(result) for stop_id, result in board["arrivals"].items()}, decode(board["alerts"])
+
+@app.command()
+def commute_board(
+    concurrency: int = typer.Option(8, help="Maximum number of requests in flight")
+):
+    """
+    Show next arrivals at every station of every saved commute.
+    All stations and the alerts feed are fetched concurrently.
+    """
+    commutes = get_task_store().list_commutes()
+    if not commutes:
+        typer.echo("No commutes found.")
+        return
+    stop_ids = []
+    for commute in commutes:
+        stop_ids += [commute["departure_stop_id"], commute["arrival_stop_id"]]
+    started = time.perf_counter()
+    arrivals, alerts = fetch_board(stop_ids, concurrency)
+    elapsed = time.perf_counter() - started
+
+    for commute in commutes:
+        typer.echo(f"{commute['name']}")
+        for label, key in (("Departure", "departure"), ("Arrival", "arrival")):
+            typer.echo(f"  {label}: {commute[f'{key}_station']}")
+            result = arrivals[str(commute[f"{key}_stop_id"])]
+            if isinstance(result, CTAAPIError):
+                typer.echo(f"    Error fetching arrivals: {result}")
+            elif not result:
+                typer.echo("    No arrivals found.")
+            else:
+                for arr in result:
+                    typer.echo(f"    {format_arrival(arr)}")
+    if isinstance(alerts, CTAAPIError):
+        typer.echo(f"Error fetching alerts: {alerts}")
+    else:
+        typer.echo(f"Active service alerts: {len(alerts)}")
+    typer.echo(f"Fetched {len(arrivals)} stations in {elapsed:.2f}s")
+
+@app.command()
+def commute_eta():
+    """
+    Show the fastest scheduled trip time of every saved commute, from the
+    precomputed travel matrix (no network calls). Where `record` has logged
+    arrivals at the departure station, the 90th percentile delay seen there
+    at this hour is shown as a margin to allow.
+    """
+    commutes = get_task_store().list_commutes()
+    if not commutes:
+        typer.echo("No commutes found.")
+        return
+    minutes = scheduled_minutes([(c["departure_stop_id"], c["arrival_stop_id"]) for c in commutes])
+    if all(eta is None for eta in minutes):
+        typer.echo("No scheduled times; run build-travel-matrix to compute them.")
+    margins = reliability_margins([c["departure_stop_id"] for c in commutes])
+    for i, (commute, eta, margin) in enumerate(zip(commutes, minutes, margins), 1):
+        typer.echo(f"{i}. {commute['name']}: {commute.get('departure_station', '')} -> {commute.get('arrival_station', '')}"
+                   f" | {f'{eta} min' if eta is not None else 'no scheduled route'}"
+                   + (f" (+{margin} min for delays)" if margin is not None else ""))
+
+def reliability_margins(stop_ids, days=30, percentile=90):
+    """
+    Minutes to allow for delays at each station at this hour of the day:
+    the `percentile` slip recorded there over the last `days` days. None
+    where nothing has been recorded.
+    """
+    if not RECORD_DIR.is_dir():
+        return [None] * len(stop_ids)
+    try:
+        from .recorder import delay_margin, load_recent_records
+    except ImportError:
+        # NumPy isn't installed
+        return [None] * len(stop_ids)
+    records = load_recent_records(RECORD_DIR, days)
+    hour = time.localtime().tm_hour
+    margins = [delay_margin(records, stop_id, hour, percentile) for stop_id in stop_ids]
+    return [None if margin is None else round(margin / 60) for margin in margins]
+
 @app.command()
-def plan_commute():
+def record(
+    stop_id: list[str] = typer.Option(None, help="Station stop_id to sample; repeat for more (default: all commute stations)"),
+    interval: float = typer.Option(60, help="Seconds between samples"),
+    samples: int = typer.Option(None, help="Stop after this many samples of each station")
+):
+    """
+    Sample Train Tracker predictions at stations until Ctrl-C, appending
+    them to the arrivals log in $CTA_PKMS_RECORDINGS (one file per day) for
+    delay-stats and the margins in commute-eta.
+    """
+    from .recorder import record_sample
+    stop_ids = list(stop_id or [])
+    if not stop_ids:
+        for commute in get_task_store().list_commutes():
+            stop_ids += [commute["departure_stop_id"], commute["arrival_stop_id"]]
+        stop_ids = list(dict.fromkeys(str(s) for s in stop_ids))
+    if not stop_ids:
+        typer.echo("No stations to record: pass --stop-id or add a commute.")
+        return
+    typer.echo(f"Recording {len(stop_ids)} stations every {interval:g}s to {RECORD_DIR}; Ctrl-C to stop.")
+    rounds = written = 0
+    try:
+        while samples is None or rounds < samples:
+            started = time.monotonic()
+            for stop in stop_ids:
+                try:
+                    arrivals = fetch_next_arrivals(stop, fresh=True)
+                except CTAAPIError as e:
+                    typer.echo(f"Error fetching arrivals for {stop}: {e}", err=True)
+                    continue
+                written += record_sample(RECORD_DIR, stop, arrivals)
+            rounds += 1
+            if samples is None or rounds < samples:
+                time.sleep(max(0.0, interval - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        pass
+    typer.echo(f"Recorded {written} arrivals in {rounds} samples.")
+
+@app.command()
+def delay_stats(
+    days: int = typer.Option(30, help="How many days of recordings to use"),
+    stop_id: str = typer.Option(None, help="Only this station")
+):
+    """
+    Show how much later trains arrived than first predicted, from the
+    arrivals log: percentiles of that slip, in minutes, and the share of
+    trains flagged as delayed, per station, hour of day and route.
+    """
+    from .recorder import delay_stats, load_recent_records
+    started = time.perf_counter()
+    records = load_recent_records(RECORD_DIR, days)
+    rows = delay_stats(records, stop_id=stop_id)
+    elapsed = time.perf_counter() - started
+    if not rows:
+        typer.echo(f"No recorded arrivals in the last {days} days.")
+        return
+    index = load_station_index()
+    typer.echo(f"{'Station':<30} {'Hour':>4} {'Route':<5} {'Trains':>6} {'Delayed':>7} {'p50':>5} {'p90':>5} {'p95':>5}")
+    for row in rows:
+        station = index.get(row["station"])
+        name = station["stop_name"] if station else row["station"]
+        typer.echo(f"{name[:30]:<30} {row['hour']:>4} {row['route']:<5} {row['approaches']:>6} {row['delayed']:>7.0%}"
+                   f" {row['p50'] / 60:>5.1f} {row['p90'] / 60:>5.1f} {row['p95'] / 60:>5.1f}")
+    typer.echo(f"{len(records)} samples, {sum(row['approaches'] for row in rows)} trains, in {elapsed:.2f}s")
+
+@app.command()
+def build_travel_matrix():
+    """
+    Precompute minimum scheduled travel times between all stations from the
+    GTFS timetable, for commute-eta and plan-commute. Run it again after
+    updating the GTFS files.
+    """
+    from .travel_matrix import build_travel_matrix
+    started = time.perf_counter()
+    try:
+        matrix = build_travel_matrix()
+    except FileNotFoundError as e:
+        typer.echo(f"GTFS timetable not found: {e.filename}")
+        raise typer.Exit(1)
+    typer.echo(f"Travel times between {len(matrix)} stations ({matrix.times.nbytes / 1024:.0f} KiB) "
+               f"built in {time.perf_counter() - started:.2f}s.")
+
+@app.command()
+def plan_commute(
+    offline: bool = typer.Option(False, help="Plan from the local GTFS timetable, without network calls"),
+    stream: bool = typer.Option(True, help="Print the AI answer as it is generated")
+):
     """
     Plan a commute using saved commutes, CTA APIs, and OpenAI.
+    With --offline, the route comes from the local timetable instead.
     """
     departure, arrival = select_commute()
     if not departure or not arrival:
         return
     typer.echo(f"Planning commute from {departure['stop_name']} to {arrival['stop_name']}...")
-    arrivals = fetch_next_arrivals(departure["stop_id"])
-    alerts = fetch_cta_alerts()
-    typer.echo("Calling AI for best route and ETA...")
-    result = call_openai_route_planner(departure, arrival, arrivals, alerts)
-    typer.echo("--- Commute Plan ---")
-    typer.echo(result)
+    if offline:
+        journey = Router(load_timetable()).earliest_arrival(departure["stop_id"], arrival["stop_id"])
+        typer.echo("--- Commute Plan ---")
+        typer.echo(describe_journey(journey) if journey else "No scheduled route found.")
+        return
+    started = time.perf_counter()
+    first_token = []
+    streamed = []
+
+    def show(event, data):
+        nonlocal started
+        if event == "warning":
+            typer.echo(f"Warning: {data}")
+        elif event == "scheduled" and data is not None:
+            typer.echo(f"Fastest scheduled trip: {data} min (not counting the wait for a train).")
+        elif event == "reduced":
+            typer.echo(f"Prompt reduced from {data['tokens_before']} to {data['tokens_after']} tokens "
+                       f"({data['alerts_kept']} of {data['alerts_total']} alerts relevant).")
+            typer.echo("Calling AI for best route and ETA...")
+            typer.echo("--- Commute Plan ---")
+            started = time.perf_counter()
+        elif event == "token":
+            if not first_token:
+                first_token.append(time.perf_counter() - started)
+            streamed.append(data)
+            typer.echo(data, nl=False)
+
+    result = daemon.forward("plan", lambda: run_plan(departure, arrival, show, stream), on_event=show,
+                            departure=departure, arrival=arrival, stream=stream)
+    if first_token:
+        typer.echo("")
+        if result != "".join(streamed):
+            # the stream broke off part way: result is the error
+            typer.echo(result)
+            return
+        typer.echo(f"(first token after {first_token[0]:.2f}s, done after {time.perf_counter() - started:.2f}s)")
+    else:
+        typer.echo(result)
+
+def run_plan(departure, arrival, emit, stream=True):
+    """
+    Fetch live arrivals and alerts, reduce them and ask the planner.
+    Progress goes to emit(event, data): "warning" (text), "reduced" (the
+    reduction report) and, when streaming, "token" (text).
+    Returns the recommendation.
+    """
+    try:
+        arrivals = fetch_next_arrivals(departure["stop_id"])
+    except CTAAPIError as e:
+        emit("warning", f"live arrivals unavailable ({e})")
+        arrivals = []
+    try:
+        alerts = fetch_cta_alerts()
+    except CTAAPIError as e:
+        emit("warning", f"service alerts unavailable ({e})")
+        alerts = []
+    emit("scheduled", scheduled_minutes([(departure["stop_id"], arrival["stop_id"])])[0])
+    alternatives = alternative_arrivals(arrival["stop_id"])
+    arrivals, alerts, report = reduce_planner_inputs(departure, arrival, arrivals, alerts, load_station_index(),
+                                                     alternatives)
+    emit("reduced", report)
+    on_token = (lambda token: emit("token", token)) if stream else None
+    return call_openai_route_planner(departure, arrival, arrivals, alerts, on_token=on_token, alternatives=alternatives)
+
+def scheduled_minutes(pairs):
+    """
+    Minimum scheduled travel time, in minutes, for each (from, to) pair of
+    stop_ids, from the travel matrix saved by `build-travel-matrix`; None
+    where unknown, or for every pair when there is no up-to-date matrix.
+    """
+    def local():
+        try:
+            from .travel_matrix import load_travel_matrix
+        except ImportError:
+            # NumPy isn't installed
+            return [None] * len(pairs)
+        try:
+            # building it takes a while; that is build-travel-matrix's job
+            matrix = load_travel_matrix(build=False)
+        except OSError:
+            matrix = None
+        if matrix is None:
+            return [None] * len(pairs)
+        return [matrix.minutes(origin, destination) for origin, destination in pairs]
+
+    return daemon.forward("eta", local, pairs=[list(pair) for pair in pairs])
+
+def alternative_arrivals(stop_id, miles=ALTERNATIVE_MILES):
+    "Stations within `miles` of stop_id, for the planner: [{stop_id, stop_name, miles}]."
+    return [{"stop_id": station["stop_id"], "stop_name": station["stop_name"], "miles": distance}
+            for station, distance in load_spatial_index().stations_within(stop_id, miles)]
+
+_daemon_store_lock = threading.Lock()
+
+def daemon_handlers():
+    """
+    What `serve` answers: each request runs the same code the command would
+    run locally, against the daemon's warm index, clients and caches.
+    """
+    def arrivals(params, emit):
+        return fetch_next_arrivals(params["stop_id"], params.get("api_key") or CTA_TRAIN_TRACKER_API_KEY,
+                                   params.get("fresh", False))
+
+    def board(params, emit):
+        arrivals, alerts = fetch_board(params["stop_ids"], params.get("concurrency", 8))
+
+        def encode(result):
+            return daemon.encode_error(result) if isinstance(result, CTAAPIError) else result
+
+        return {"arrivals": {stop_id: encode(result) for stop_id, result in arrivals.items()},
+                "alerts": encode(alerts)}
+
+    def store(params, emit):
+        if params.get("call") not in daemon.STORE_METHODS:
+            raise daemon.DaemonError(f"unknown store call {params.get('call')!r}")
+        # one call at a time, so concurrent clients can't lose each other's changes
+        with _daemon_store_lock:
+            # the caller's files, which depend on its working directory and environment
+            store = open_task_store(params["config"]) if params.get("config") else get_task_store(forward=False)
+            try:
+                return getattr(store, params["call"])(*params.get("args", []), **params.get("kwargs", {}))
+            finally:
+                if hasattr(store, "close"):
+                    store.close()
+
+    return {
+        "ping": lambda params, emit: {"pid": os.getpid()},
+        "arrivals": arrivals,
+        "alerts": lambda params, emit: fetch_cta_alerts(),
+        "station": lambda params, emit: find_station(params["stop_id"]),
+        "locate": lambda params, emit: resolve_location(params["location"], params.get("count", 1)),
+        "eta": lambda params, emit: scheduled_minutes([tuple(pair) for pair in params["pairs"]]),
+        "board": board,
+        "plan": lambda params, emit: run_plan(params["departure"], params["arrival"], emit, params.get("stream", True)),
+        "store": store,
+    }
+
+@app.command()
+def serve(
+    socket: str = typer.Option(None, help="Socket path (default: $CTA_PKMS_SOCKET or .cache/daemon.sock)")
+):
+    """
+    Run in the foreground, keeping the station index, HTTP connections and
+    caches warm. While it runs, other commands (using the same socket path)
+    send their arrivals, alerts, planning and task requests to it.
+    """
+    import signal
+    try:
+        server = daemon.make_server(daemon_handlers(), socket)
+    except daemon.DaemonError as e:
+        typer.echo(str(e))
+        raise typer.Exit(1)
+    cache.BACKGROUND_REFRESH = True
+    load_station_index()
+    load_spatial_index()
+    get_client()
+    if OPENAI_API_KEY:
+        get_openai_client()
+    # stop cleanly (removing the socket) on kill as well as Ctrl-C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    typer.echo(f"Serving on {server.server_address} (pid {os.getpid()}); Ctrl-C to stop.")
+    try:
+        daemon.serve_forever(server)
+    except KeyboardInterrupt:
+        pass
 
 def main():
-    app()
+    try:
+        app()
+    except daemon.DaemonDisconnected as e:
+        typer.echo(f"Lost the daemon mid-request ({e}). It may have been done; check before running it again.", err=True)
+        sys.exit(1)
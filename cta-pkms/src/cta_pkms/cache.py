@@ -0,0 +1,240 @@
+"""
+Small caches for API responses.
+
+TTLCache is an in-memory LRU with a per-cache time-to-live, optionally
+backed by a SQLiteStore so entries survive across CLI invocations. In a
+long-running process (BACKGROUND_REFRESH), entries past their TTL but
+inside the stale window are served immediately while a background thread
+refreshes them (stale-while-revalidate). A one-shot command would exit
+before such a refresh finished, so there they are refetched in line and
+the stale value is only served if that fails. SingleFlight collapses
+concurrent identical calls into one.
+"""
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+CACHE_DIR = Path(os.getenv("CTA_PKMS_CACHE_DIR", ".cache"))
+DISK_CACHE_ENABLED = os.getenv("CTA_PKMS_DISK_CACHE", "1") != "0"
+CACHE_DB = "cache.sqlite3"
+# Set by commands that keep running (serve, next-arrivals --watch), so that
+# background refreshes get to finish.
+BACKGROUND_REFRESH = False
+
+
+class SQLiteStore:
+    """
+    JSON values in one SQLite table, evicted least-recently-used once the
+    table holds more than `max_entries` rows.
+    """
+
+    def __init__(self, path, table="cache", max_entries=10000):
+        self.path = Path(path)
+        self.table = table
+        self.max_entries = max_entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " stored_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute(f"CREATE INDEX IF NOT EXISTS {table}_lru ON {table}(last_access)")
+
+    def get(self, key):
+        "Return (value, stored_at) for a key, or None."
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, stored_at=None):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), stored_at or now, now),
+            )
+            if self.max_entries is not None:
+                self._db.execute(
+                    f"DELETE FROM {self.table} WHERE key IN ("
+                    f" SELECT key FROM {self.table} ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def delete_older_than(self, cutoff):
+        with self._lock:
+            self._db.execute(f"DELETE FROM {self.table} WHERE stored_at < ?", (cutoff,))
+
+    def clear(self):
+        with self._lock:
+            self._db.execute(f"DELETE FROM {self.table}")
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+
+def disk_store(table, max_entries=10000):
+    """
+    Return a SQLiteStore table in the shared cache database, or None when
+    the on-disk cache is disabled (CTA_PKMS_DISK_CACHE=0) or unavailable.
+    """
+    if not DISK_CACHE_ENABLED:
+        return None
+    try:
+        return SQLiteStore(CACHE_DIR / CACHE_DB, table=table, max_entries=max_entries)
+    except (OSError, sqlite3.Error):
+        return None
+
+
+class TTLCache:
+    """
+    In-memory LRU of at most `max_entries` values, each fresh for `ttl`
+    seconds and then served stale for up to `stale_ttl` more seconds while
+    it is refreshed (see BACKGROUND_REFRESH). `disk` is an optional
+    SQLiteStore. Callers get their own copy of a cached value.
+    """
+
+    def __init__(self, ttl, stale_ttl=0, max_entries=256, disk=None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.disk = disk
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        if self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self._remember(key, entry)
+        return entry
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put(self, key, value):
+        entry = (copy.deepcopy(value), time.time())
+        self._remember(key, entry)
+        if self.disk is not None:
+            self.disk.set(key, value, entry[1])
+
+    def _refresh(self, key, fetch):
+        try:
+            self.put(key, fetch())
+        except Exception:
+            # Keep serving the stale value; the next miss will surface the error.
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get_or_fetch(self, key, fetch):
+        """
+        Return the cached value for `key`, calling `fetch()` on a miss.
+        Exceptions from `fetch` propagate and nothing is cached.
+        """
+        entry = self._lookup(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.time() - stored_at
+            if age < self.ttl:
+                self.hits += 1
+                return copy.deepcopy(value)
+            if age < self.ttl + self.stale_ttl:
+                if not BACKGROUND_REFRESH:
+                    try:
+                        fresh = fetch()
+                    except Exception:
+                        self.stale_hits += 1
+                        return copy.deepcopy(value)
+                    self.misses += 1
+                    self.put(key, fresh)
+                    return fresh
+                self.stale_hits += 1
+                with self._lock:
+                    start = key not in self._refreshing
+                    self._refreshing.add(key)
+                if start:
+                    threading.Thread(target=self._refresh, args=(key, fetch), daemon=True).start()
+                return copy.deepcopy(value)
+        self.misses += 1
+        value = fetch()
+        self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+        }
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls that share a key into one: the first caller
+    runs the function and the others wait for and share its result (or
+    exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event()}
+        if not leader:
+            call["done"].wait()
+            if "error" in call:
+                raise call["error"]
+            return call["result"]
+        try:
+            call["result"] = func()
+            return call["result"]
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
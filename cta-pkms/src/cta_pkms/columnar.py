@@ -0,0 +1,84 @@
+"""
+Memory-mapped access to GTFS tables written by
+`tools-for-data/json_converter.py --columnar`.
+
+Requires NumPy, which is only imported when this module is used.
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+
+from .gtfs import GTFS_DIR
+
+COLUMNAR_DIR = GTFS_DIR / "columnar"
+
+
+class ColumnarTable:
+    """
+    One GTFS table as a set of memory-mapped NumPy columns.
+
+    Dictionary-encoded columns (IDs, names) are int32 codes; use `encode`
+    and `decode` to move between codes and the original strings. Time
+    columns are int32 seconds after midnight. Missing values are -1.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with (self.path / "_table.json").open() as f:
+            meta = json.load(f)
+        self.rows = meta["rows"]
+        self.schema = meta["columns"]
+        self._columns = {}
+        self._dictionaries = {}
+        self._codes = {}
+
+    def __len__(self):
+        return self.rows
+
+    def __contains__(self, name):
+        return name in self.schema
+
+    def __getitem__(self, name):
+        if name not in self._columns:
+            if name not in self.schema:
+                raise KeyError(name)
+            self._columns[name] = np.load(self.path / f"{name}.npy", mmap_mode="r")
+        return self._columns[name]
+
+    @property
+    def columns(self):
+        return list(self.schema)
+
+    def dictionary(self, name):
+        "Return the list of values for a dictionary-encoded column."
+        if name not in self._dictionaries:
+            if self.schema[name]["encoding"] != "dict":
+                raise ValueError(f"Column {name} is not dictionary-encoded")
+            with (self.path / f"{name}.dict.json").open() as f:
+                self._dictionaries[name] = json.load(f)
+        return self._dictionaries[name]
+
+    def encode(self, name, value):
+        "Return the code for `value` in a dictionary column, or -1 if absent."
+        if name not in self._codes:
+            self._codes[name] = {v: code for code, v in enumerate(self.dictionary(name))}
+        return self._codes[name].get(value, -1)
+
+    def decode(self, name, codes):
+        """
+        Map a code, or an array of codes, back to the original values.
+        Missing values (-1) decode to None.
+        """
+        values = self.dictionary(name)
+        if np.ndim(codes) == 0:
+            return values[codes] if codes >= 0 else None
+        return [values[code] if code >= 0 else None for code in np.asarray(codes).tolist()]
+
+
+def load_table(name, columnar_dir=None):
+    """
+    Open a columnar GTFS table, e.g. load_table("stop_times").
+    Columns are memory-mapped lazily on first access.
+    """
+    return ColumnarTable(Path(columnar_dir or COLUMNAR_DIR) / name)
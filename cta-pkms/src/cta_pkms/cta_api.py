@@ -0,0 +1,266 @@
+"""
+Shared client for the CTA Train Tracker and Customer Alerts APIs.
+
+One pooled requests.Session is reused for every call, so repeated lookups
+share keep-alive connections. Transient failures (connection errors,
+timeouts, 429 and 5xx responses) are retried with exponential backoff,
+within an overall latency budget. Failures raise CTAAPIError subclasses
+instead of being reported as an empty result.
+
+requests and asyncio are imported when a client is first used, so that
+importing this module (e.g. for the exception classes) stays cheap.
+"""
+import hashlib
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import TTLCache, disk_store
+
+CTA_API_BASE_URL = os.getenv("CTA_API_BASE_URL", "http://lapi.transitchicago.com/api/1.0")
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Seconds a cached response is fresh, then how much longer it may be served
+# stale while it is refreshed. Predictions move every few seconds; alerts
+# change on a scale of minutes.
+ARRIVALS_TTL = 20
+ARRIVALS_STALE_TTL = 20
+ALERTS_TTL = 300
+ALERTS_STALE_TTL = 900
+
+
+class CTAAPIError(Exception):
+    "A CTA API request failed."
+
+
+class CTATimeoutError(CTAAPIError):
+    "The request (including retries) ran out of time."
+
+
+class CTAHTTPError(CTAAPIError):
+    "The API answered with an HTTP error status."
+
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CTAResponseError(CTAAPIError):
+    "The API answered, but with an error code or an unreadable body."
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, dict):
+        return [value]
+    return list(value)
+
+
+def parse_arrival(eta):
+    return {
+        "route": eta.get("rt"),
+        "destination": eta.get("destNm"),
+        "arrival_time": eta.get("arrT"),
+        "is_scheduled": eta.get("isSch"),
+        "is_delayed": eta.get("isDly"),
+        "train_id": eta.get("trainId"),
+    }
+
+
+class CTAClient:
+    """
+    Pooled, retrying client for lapi.transitchicago.com.
+
+    `timeout` bounds a single attempt and `latency_budget` bounds the whole
+    call, including backoff sleeps. Up to `retries` retries are made.
+    `arrivals_cache` and `alerts_cache` are optional TTLCaches.
+    """
+
+    def __init__(self, base_url=None, api_key=None, timeout=5.0, retries=3, backoff=0.25,
+                 latency_budget=10.0, pool_size=10, arrivals_cache=None, alerts_cache=None):
+        import requests
+
+        self.base_url = (base_url or CTA_API_BASE_URL).rstrip("/")
+        self.arrivals_cache = arrivals_cache
+        self.alerts_cache = alerts_cache
+        self.api_key = api_key
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.latency_budget = latency_budget
+        self.session = requests.Session()
+        self.pool_size = 0
+        self.reserve_connections(pool_size)
+
+    def reserve_connections(self, count):
+        """
+        Make sure the session can keep `count` connections open at once,
+        so that many concurrent calls don't queue for a pooled connection.
+        """
+        if count <= self.pool_size:
+            return
+        from requests.adapters import HTTPAdapter
+
+        adapter = HTTPAdapter(pool_connections=count, pool_maxsize=count)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.pool_size = count
+
+    def close(self):
+        self.session.close()
+
+    def get_json(self, path, params, budget=None):
+        """
+        GET base_url/path and return the decoded JSON body, retrying
+        transient failures. `budget` replaces latency_budget for this call.
+        """
+        import requests
+
+        url = f"{self.base_url}/{path}"
+        budget = self.latency_budget if budget is None else budget
+        deadline = time.monotonic() + budget
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise CTATimeoutError(f"{path}: no response within {budget}s")
+            try:
+                response = self.session.get(url, params=params, timeout=min(self.timeout, remaining))
+                if response.status_code in RETRY_STATUSES:
+                    error = CTAHTTPError(response.status_code, f"{path}: HTTP {response.status_code}")
+                elif response.status_code >= 400:
+                    raise CTAHTTPError(response.status_code, f"{path}: HTTP {response.status_code}")
+                else:
+                    try:
+                        return response.json()
+                    except ValueError as e:
+                        raise CTAResponseError(f"{path}: invalid JSON response") from e
+            except requests.Timeout as e:
+                error = CTATimeoutError(f"{path}: timed out")
+                error.__cause__ = e
+            except requests.ConnectionError as e:
+                error = CTAAPIError(f"{path}: connection failed ({e})")
+                error.__cause__ = e
+
+            if attempt >= self.retries:
+                raise error
+            delay = self.backoff * (2 ** attempt) * (0.5 + random.random() / 2)
+            if time.monotonic() + delay >= deadline:
+                raise error
+            time.sleep(delay)
+            attempt += 1
+
+    def arrivals(self, mapid, max_results=5, api_key=None, fresh=False, budget=None):
+        """
+        Return upcoming arrivals for a station mapid. With `fresh`, skip
+        the cache (but still refill it).
+        """
+        if self.arrivals_cache is None:
+            return self._fetch_arrivals(mapid, max_results, api_key, budget)
+        # Answers depend on the key (an invalid one is an error), but the
+        # key itself shouldn't end up in the on-disk cache.
+        key_id = hashlib.sha256(str(api_key or self.api_key).encode()).hexdigest()[:12]
+        cache_key = f"{key_id}:{mapid}:{max_results}"
+        if fresh:
+            arrivals = self._fetch_arrivals(mapid, max_results, api_key, budget)
+            self.arrivals_cache.put(cache_key, arrivals)
+            return arrivals
+        return self.arrivals_cache.get_or_fetch(
+            cache_key, lambda: self._fetch_arrivals(mapid, max_results, api_key, budget)
+        )
+
+    def _fetch_arrivals(self, mapid, max_results, api_key, budget=None):
+        data = self.get_json("ttarrivals.aspx", {
+            "key": api_key or self.api_key,
+            "mapid": mapid,
+            "max": max_results,
+            "outputType": "JSON",
+        }, budget)
+        ctatt = data.get("ctatt") or {}
+        if str(ctatt.get("errCd", "0")) != "0":
+            raise CTAResponseError(f"Train Tracker error {ctatt.get('errCd')}: {ctatt.get('errNm')}")
+        return [parse_arrival(eta) for eta in _as_list(ctatt.get("eta"))]
+
+    def alerts(self, budget=None):
+        "Return the current Customer Alerts feed."
+        if self.alerts_cache is None:
+            return self._fetch_alerts(budget)
+        return self.alerts_cache.get_or_fetch("alerts", lambda: self._fetch_alerts(budget))
+
+    def _fetch_alerts(self, budget=None):
+        data = self.get_json("alerts.aspx", {"outputType": "JSON"}, budget)
+        feed = data.get("CTAAlerts") or {}
+        if str(feed.get("ErrorCode") or "0") != "0":
+            raise CTAResponseError(f"Alerts error {feed.get('ErrorCode')}: {feed.get('ErrorMessage')}")
+        return _as_list(feed.get("Alert"))
+
+
+async def fetch_arrivals_many(stop_ids, client=None, concurrency=8, timeout=10.0, alerts=True):
+    """
+    Fetch arrivals for many station mapids, and the alerts feed, concurrently.
+
+    At most `concurrency` requests are in flight at once and each one is
+    bounded by `timeout` seconds. Returns (arrivals, alerts) where arrivals
+    maps each stop_id to its list of arrivals, or to the CTAAPIError raised
+    for it (any other exception is wrapped in one), so one failing station
+    does not hide the others. alerts is the alert list, a CTAAPIError, or
+    None when `alerts` is False.
+    """
+    import asyncio
+
+    client = client or get_client()
+    client.reserve_connections(concurrency)
+    loop = asyncio.get_running_loop()
+    limit = asyncio.Semaphore(concurrency)
+    # The blocking client runs in its own pool, sized to the concurrency
+    # limit, so it shares the session's keep-alive connections.
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def run(func, *args):
+        # The timeout is the call's own latency budget, so the thread gives
+        # up by itself instead of being left running after we stop waiting.
+        try:
+            return func(*args, budget=timeout)
+        except CTAAPIError as e:
+            return e
+        except Exception as e:
+            error = CTAAPIError(f"unexpected error: {e!r}")
+            error.__cause__ = e
+            return error
+
+    async def call(func, *args):
+        async with limit:
+            return await loop.run_in_executor(executor, run, func, *args)
+
+    stop_ids = list(dict.fromkeys(str(stop_id) for stop_id in stop_ids))
+    tasks = [call(client.arrivals, stop_id) for stop_id in stop_ids]
+    if alerts:
+        tasks.append(call(client.alerts))
+    try:
+        results = await asyncio.gather(*tasks)
+    finally:
+        executor.shutdown(wait=False)
+    return dict(zip(stop_ids, results)), (results[-1] if alerts else None)
+
+
+_client = None
+
+
+def get_client():
+    "Return the process-wide CTAClient, creating it on first use."
+    global _client
+    if _client is None:
+        _client = CTAClient(
+            api_key=os.getenv("CTA_TRAIN_TRACKER_API_KEY"),
+            arrivals_cache=TTLCache(ARRIVALS_TTL, ARRIVALS_STALE_TTL, disk=disk_store("arrivals", 1000)),
+            alerts_cache=TTLCache(ALERTS_TTL, ALERTS_STALE_TTL, disk=disk_store("alerts", 10)),
+        )
+    return _client
+
+
+def set_client(client):
+    "Replace the process-wide CTAClient (e.g. to point at a stub server)."
+    global _client
+    _client = client
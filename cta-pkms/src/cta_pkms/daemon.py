@@ -0,0 +1,255 @@
+"""
+`cta-pkms serve`: a background process that keeps the station index, the
+CTA and OpenAI clients and their caches warm, and answers requests over a
+Unix domain socket.
+
+The protocol is JSON lines. A request is {"method": ..., "params": {...}}.
+The server may answer with any number of {"event": ..., "data": ...}
+lines (e.g. streamed tokens), and always ends with {"ok": true, "result": ...}
+or {"ok": false, "error": ..., "type": ...}. A connection can carry any
+number of requests, one after another.
+
+CLI commands call daemon_client() and forward to the daemon when one is
+listening on socket_path(); otherwise they do the work themselves.
+"""
+import json
+import os
+import socket
+import threading
+from pathlib import Path
+
+from . import cache
+from .cta_api import CTAAPIError, CTAHTTPError, CTAResponseError, CTATimeoutError
+
+SOCKET_NAME = "daemon.sock"
+CONNECT_TIMEOUT = 0.5
+CALL_TIMEOUT = 120
+ERROR_TYPES = {cls.__name__: cls for cls in (CTAAPIError, CTATimeoutError, CTAResponseError)}
+
+# Marks the daemon's request threads, so their own calls never forward to the daemon.
+_local = threading.local()
+
+
+class DaemonError(Exception):
+    "The daemon could not handle a request."
+
+
+class DaemonUnreachable(DaemonError):
+    "A request could not be sent, so the daemon never saw it."
+
+
+class DaemonDisconnected(DaemonError):
+    "The daemon went away, or stopped answering, after a request was sent."
+
+
+def socket_path():
+    "CTA_PKMS_SOCKET, or daemon.sock in the cache directory."
+    return Path(os.getenv("CTA_PKMS_SOCKET") or cache.CACHE_DIR / SOCKET_NAME)
+
+
+def encode_error(error):
+    encoded = {"ok": False, "error": str(error), "type": type(error).__name__}
+    if isinstance(error, CTAHTTPError):
+        encoded["status_code"] = error.status_code
+    return encoded
+
+
+def decode_error(message):
+    "Rebuild the exception described by an error response (or an error placeholder)."
+    if message.get("type") == "CTAHTTPError":
+        return CTAHTTPError(message.get("status_code"), message["error"])
+    return ERROR_TYPES.get(message.get("type"), DaemonError)(message["error"])
+
+
+class DaemonClient:
+    "One connection to the daemon. Calls are serialised, so it can be shared by threads."
+
+    def __init__(self, path=None):
+        self.path = Path(path or socket_path())
+        self._lock = threading.Lock()
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(CONNECT_TIMEOUT)
+        try:
+            self._sock.connect(str(self.path))
+        except OSError:
+            self._sock.close()
+            raise
+        self._sock.settimeout(CALL_TIMEOUT)
+        self._file = self._sock.makefile("rwb")
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+        try:
+            self._file.close()
+        except OSError:
+            pass  # flushing a request that can no longer be sent
+        self._sock.close()
+
+    def call(self, method, on_event=None, **params):
+        """
+        Send a request and return its result, passing any events to
+        on_event(event, data). Errors are raised as the original exception
+        type where it is known (CTAAPIError and subclasses), else DaemonError.
+        DaemonUnreachable means the request was not sent; DaemonDisconnected
+        that it was, and may have run, but no answer came back (the
+        connection is closed then, as a late answer could still arrive).
+        """
+        with self._lock:
+            try:
+                self._file.write(json.dumps({"method": method, "params": params}).encode() + b"\n")
+                self._file.flush()
+            except (OSError, ValueError) as e:
+                # ValueError: the connection was already closed
+                raise DaemonUnreachable(f"could not send to the daemon: {e}") from e
+            while True:
+                try:
+                    line = self._file.readline()
+                except OSError as e:
+                    # including socket.timeout after CALL_TIMEOUT
+                    self.close()
+                    raise DaemonDisconnected(f"no answer from the daemon: {e}") from e
+                if not line:
+                    self.close()
+                    raise DaemonDisconnected("the daemon closed the connection")
+                message = json.loads(line)
+                if "event" in message:
+                    if on_event is not None:
+                        on_event(message["event"], message.get("data"))
+                    continue
+                if message.get("ok"):
+                    return message.get("result")
+                raise decode_error(message)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def daemon_client():
+    """
+    Return a connection to the running daemon, or None when there isn't one
+    (or CTA_PKMS_DAEMON=0, or we are the daemon).
+    """
+    global _client
+    if getattr(_local, "serving", False) or os.getenv("CTA_PKMS_DAEMON", "1") == "0":
+        return None
+    path = socket_path()
+    with _client_lock:
+        if _client is not None and _client.path == path and not _client.closed:
+            return _client
+        if not path.exists():
+            return None
+        try:
+            _client = DaemonClient(path)
+        except OSError:
+            # a socket file left behind by a daemon that is gone
+            return None
+        return _client
+
+
+def reset_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+
+
+def forward(method, local, on_event=None, **params):
+    """
+    Run `method` in the daemon if one is running, else return local().
+    If the request can't be sent the work is done locally instead. Once it
+    has been sent the daemon may have done it (stored a task, paid for a
+    completion), so losing the daemon then raises DaemonDisconnected
+    rather than doing it twice.
+    """
+    client = daemon_client()
+    if client is not None:
+        try:
+            return client.call(method, on_event, **params)
+        except DaemonUnreachable:
+            reset_client()
+        except DaemonDisconnected:
+            reset_client()
+            raise
+    return local()
+
+
+STORE_METHODS = (
+    "add_task", "list_tasks", "count_tasks", "amend_task", "delete_task", "search_tasks",
+    "add_commute", "list_commutes", "delete_commute",
+)
+
+
+class RemoteTaskStore:
+    """
+    A task store whose calls run in the daemon, on the store described by
+    config (the backend and resolved file paths of the calling process).
+    It has no transaction(); use a local store for those.
+    """
+
+    def __init__(self, client, config=None):
+        self.client = client
+        self.config = config
+
+    def __getattr__(self, name):
+        if name not in STORE_METHODS:
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.client.call("store", call=name, args=list(args), kwargs=kwargs,
+                                                        config=self.config)
+
+
+def make_server(handlers, path=None):
+    """
+    Build (but don't start) a threaded Unix socket server. handlers maps
+    method names to handler(params, emit), where emit(event, data) sends
+    an event line before the result.
+    """
+    import socketserver
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            _local.serving = True
+            for line in self.rfile:
+                try:
+                    request = json.loads(line)
+                    handler = handlers.get(request.get("method"))
+                    if handler is None:
+                        raise DaemonError(f"unknown method {request.get('method')!r}")
+                    result = handler(request.get("params") or {}, self.emit)
+                    self.send({"ok": True, "result": result})
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                except Exception as e:
+                    self.send(encode_error(e))
+
+        def emit(self, event, data=None):
+            self.send({"event": event, "data": data})
+
+        def send(self, message):
+            self.wfile.write(json.dumps(message).encode() + b"\n")
+            self.wfile.flush()
+
+    class Server(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+    path = Path(path or socket_path())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        try:
+            DaemonClient(path).close()
+        except OSError:
+            path.unlink()
+        else:
+            raise DaemonError(f"a daemon is already listening on {path}")
+    return Server(str(path), Handler)
+
+
+def serve_forever(server):
+    "Serve until interrupted or shut down, then remove the socket file."
+    try:
+        server.serve_forever(poll_interval=0.2)
+    finally:
+        server.server_close()
+        Path(server.server_address).unlink(missing_ok=True)
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+
+GTFS_DIR = Path("cta-gtfs")
+COMPILED_DIR = GTFS_DIR / ".compiled"
+
+
+def iter_jsonl(path):
+    """
+    Yield one dict per non-empty line of a JSONL file.
+    Malformed lines are skipped.
+    """
+    with Path(path).open() as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def file_digest(path):
+    """
+    Return the sha256 hex digest of a file, read in 1 MiB blocks.
+    """
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _stat_key(path):
+    stat = Path(path).stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_compiled(name, sources, builder, version=1, cache_dir=None):
+    """
+    Load a compiled artifact from the on-disk cache, or build and store it.
+
+    `sources` is a list of input files and `builder` is called with no
+    arguments to produce the artifact. The cached copy is reused while every
+    source keeps the same mtime and size. If those change but the content
+    hash does not (e.g. after a fresh checkout), the cache is re-stamped
+    instead of rebuilt. If any source is missing nothing is cached.
+    """
+    sources = [Path(p) for p in sources]
+    if not all(p.exists() for p in sources):
+        return builder()
+
+    cache_dir = Path(cache_dir) if cache_dir is not None else COMPILED_DIR
+    cache_path = cache_dir / f"{name}.pickle"
+    stats = [_stat_key(p) for p in sources]
+
+    header = None
+    if cache_path.exists():
+        try:
+            with cache_path.open("rb") as f:
+                header = pickle.load(f)
+                if header.get("version") == version and header.get("stats") == stats:
+                    return pickle.load(f)
+                payload = pickle.load(f)
+        except Exception:
+            header = None
+
+    digests = [file_digest(p) for p in sources]
+    if header is None or header.get("version") != version or header.get("digests") != digests:
+        payload = builder()
+
+    _write_compiled(cache_path, {"version": version, "stats": stats, "digests": digests}, payload)
+    return payload
+
+
+def _write_compiled(cache_path, header, payload):
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(f".tmp{os.getpid()}")
+    try:
+        with tmp_path.open("wb") as f:
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # A read-only data directory just means we rebuild next time.
+        tmp_path.unlink(missing_ok=True)
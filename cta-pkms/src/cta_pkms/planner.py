@@ -0,0 +1,227 @@
+"""
+Prompt construction and response caching for the OpenAI route planner.
+
+reduce_planner_inputs trims the live data before it reaches the model: only
+alerts for the 'L' routes (and stations) of the commute are kept, and
+arrivals are compacted to route, destination, time and delay flag.
+Alternative arrival stations (those within a mile of the arrival station,
+from spatial.py) are listed so the model doesn't have to guess distances.
+
+Plans are cached by a normalised key (stations, arrivals to the minute and
+alert IDs), so the same commute asked twice within PLAN_CACHE_TTL seconds
+costs one completion. Identical requests made at the same time are
+collapsed into a single in-flight call.
+"""
+import hashlib
+import json
+import math
+import time
+
+from .cache import SingleFlight, TTLCache, disk_store
+
+PLANNER_MODEL = "gpt-4o"
+PLAN_CACHE_TTL = 60
+# Customer Alerts service IDs that differ from the GTFS/Train Tracker route_id.
+ALERT_ROUTE_ALIASES = {"Pexp": "P"}
+ALERT_FIELDS = ("AlertId", "Headline", "ShortDescription", "Impact", "EventStart", "EventEnd")
+
+_plan_cache = None
+plan_flights = SingleFlight()
+
+
+def build_planner_prompt(departure, arrival, arrivals, alerts, alternatives=()):
+    if alternatives:
+        nearby = f"Alternative arrival stations within 1 mile: {json.dumps(alternatives)}\n"
+        detour = "Feel free to use a different route if it is faster, even if it means terminating at one of the alternative arrival stations instead. "
+    else:
+        nearby = ""
+        detour = "Feel free to use a different route if it is faster, even if it means terminating at a different station. Just make sure the it's not over 1 mile away from the original arrival station. "
+    return [
+        {"role": "user", "content":
+        f"You are a CTA commute planner. Given the following commute:\n"
+        f"Departure: {departure['stop_name']} ({departure['stop_id']})\n"
+        f"Arrival: {arrival['stop_name']} ({arrival['stop_id']})\n"
+        f"Live arrivals: {json.dumps(arrivals)}\n"
+        f"Service alerts: {json.dumps(alerts)}\n"
+        + nearby +
+        "Find the quickest CTA 'L' route from departure to arrival, considering live arrivals and alerts. "
+        + detour +
+        "Only return the recommended route and estimated time in minutes."
+        "Format your response in this manner: [Briefly mention whether service alerts will affect commute, and how, if so] You will travel from [departure station] to [arrival station] via [line]. Estimated total commute time: [time] minutes. Your train will arrive at [departure time]. [mention transfers if applicable]"
+        "Do not include brackets in your response."
+        }
+    ]
+
+
+def _alert_id(alert):
+    if isinstance(alert, dict):
+        for field in ("AlertId", "alert_id", "id"):
+            if alert.get(field) is not None:
+                return str(alert[field])
+    return hashlib.sha256(json.dumps(alert, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _minute(arrival_time):
+    "Reduce a Train Tracker timestamp (2025-11-19T08:05:10) to HH:MM."
+    arrival_time = str(arrival_time or "")
+    return arrival_time[11:16] if "T" in arrival_time else arrival_time
+
+
+def _arrival_signature(arr):
+    # Accepts both full arrivals and the compact form from compact_arrival.
+    if "at" in arr:
+        return (str(arr.get("route")), str(arr.get("to")), str(arr["at"]), str(bool(arr.get("delayed"))))
+    return (
+        str(arr.get("route")),
+        str(arr.get("destination")),
+        _minute(arr.get("arrival_time")),
+        str(arr.get("is_delayed") == "1"),
+    )
+
+
+def planner_cache_key(departure, arrival, arrivals, alerts, model=PLANNER_MODEL, alternatives=()):
+    """
+    Content-addressed key for a planning request. Arrival times are rounded
+    down to the minute and alerts are reduced to their IDs, so requests that
+    would produce the same answer share a key.
+    """
+    normalised = {
+        "model": model,
+        "departure": str(departure["stop_id"]),
+        "arrival": str(arrival["stop_id"]),
+        "arrivals": sorted(_arrival_signature(arr) for arr in arrivals or []),
+        "alerts": sorted(_alert_id(alert) for alert in alerts or []),
+        "alternatives": sorted(str(station["stop_id"]) for station in alternatives),
+    }
+    return hashlib.sha256(json.dumps(normalised, sort_keys=True).encode()).hexdigest()
+
+
+def get_plan_cache():
+    "Return the route plan cache (in-memory LRU over a SQLite table)."
+    global _plan_cache
+    if _plan_cache is None:
+        _plan_cache = TTLCache(PLAN_CACHE_TTL, max_entries=128, disk=disk_store("route_plans", 500))
+    return _plan_cache
+
+
+def cached_plan(key, ask):
+    """
+    Return the cached plan for `key`, or call `ask()` once, however many
+    threads are asking for the same key at the same time.
+    """
+    return plan_flights.do(key, lambda: get_plan_cache().get_or_fetch(key, ask))
+
+
+def stream_completion(client, model, messages, on_token=None):
+    """
+    Request a chat completion with stream=True, passing each piece of text
+    to `on_token` as it arrives. Returns (text, seconds to first token).
+
+    Falls back to a regular completion when the client does not stream
+    (e.g. a mocked client): the whole answer is then one "token".
+    """
+    started = time.perf_counter()
+    try:
+        response = client.chat.completions.create(model=model, messages=messages, stream=True)
+    except TypeError:
+        response = client.chat.completions.create(model=model, messages=messages)
+
+    if isinstance(getattr(response, "choices", None), list):
+        text = response.choices[0].message.content
+        first_token = time.perf_counter() - started
+        if on_token and text:
+            on_token(text)
+        return text, first_token
+
+    parts = []
+    first_token = None
+    for chunk in response:
+        choices = getattr(chunk, "choices", None)
+        if not choices:
+            continue
+        delta = getattr(choices[0].delta, "content", None)
+        if not isinstance(delta, str) or not delta:
+            continue
+        if first_token is None:
+            first_token = time.perf_counter() - started
+        parts.append(delta)
+        if on_token:
+            on_token(delta)
+    return "".join(parts), first_token
+
+
+def estimate_tokens(text):
+    """
+    Count tokens with tiktoken when it is installed, otherwise estimate
+    roughly four characters per token.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return math.ceil(len(text) / 4)
+    return len(tiktoken.get_encoding("o200k_base").encode(text))
+
+
+def prompt_tokens(prompt):
+    return sum(estimate_tokens(message["content"]) for message in prompt)
+
+
+def _impacted_services(alert):
+    services = (alert.get("ImpactedService") or {}).get("Service") or []
+    return [services] if isinstance(services, dict) else services
+
+
+def alert_is_relevant(alert, routes, station_ids):
+    """
+    True if an alert affects one of `routes` (rail service IDs) or one of
+    `station_ids`. With no known routes, any rail alert is kept.
+    """
+    for service in _impacted_services(alert):
+        service_type = service.get("ServiceType")
+        service_id = str(service.get("ServiceId"))
+        if service_type == "R":
+            if not routes or ALERT_ROUTE_ALIASES.get(service_id, service_id) in routes:
+                return True
+        elif service_type == "T" and service_id in station_ids:
+            return True
+    return False
+
+
+def compact_alert(alert):
+    return {field: alert[field] for field in ALERT_FIELDS if alert.get(field)}
+
+
+def compact_arrival(arr):
+    compact = {
+        "route": arr.get("route"),
+        "to": arr.get("destination"),
+        "at": _minute(arr.get("arrival_time")),
+    }
+    if arr.get("is_delayed") == "1":
+        compact["delayed"] = True
+    return compact
+
+
+def reduce_planner_inputs(departure, arrival, arrivals, alerts, station_index, alternatives=()):
+    """
+    Keep only what the planner needs from the live data.
+    Returns (arrivals, alerts, report) where report holds the prompt size in
+    tokens before and after, and how many alerts were kept. Alerts for the
+    alternative arrival stations count as relevant too.
+    """
+    station_ids = {str(departure["stop_id"]), str(arrival["stop_id"])}
+    station_ids.update(str(station["stop_id"]) for station in alternatives)
+    routes = set()
+    for stop_id in station_ids:
+        routes.update(station_index.routes_for(stop_id))
+    routes.update(arr.get("route") for arr in arrivals if arr.get("route"))
+
+    kept_alerts = [compact_alert(alert) for alert in alerts if alert_is_relevant(alert, routes, station_ids)]
+    kept_arrivals = [compact_arrival(arr) for arr in arrivals]
+    report = {
+        "tokens_before": prompt_tokens(build_planner_prompt(departure, arrival, arrivals, alerts, alternatives)),
+        "tokens_after": prompt_tokens(build_planner_prompt(departure, arrival, kept_arrivals, kept_alerts, alternatives)),
+        "alerts_total": len(alerts),
+        "alerts_kept": len(kept_alerts),
+    }
+    return kept_arrivals, kept_alerts, report
@@ -0,0 +1,222 @@
+"""
+An append-only log of sampled Train Tracker predictions, and delay
+statistics computed from it.
+
+Each arrival in a sample becomes one fixed-size RECORD_DTYPE record (16
+bytes), appended to a file per day named YYYY-MM-DD.bin. Months of samples
+stay small and load straight into NumPy. Times are stored as seconds since
+1970-01-01 on Chicago's local clock, which is the clock Train Tracker
+reports in, so hours of the day need no time zone handling. A record left
+half-written by a crash is ignored when the file is read, and cut off
+before the next sample is appended so later records stay aligned.
+
+delay_stats groups the samples of one train approaching one station into
+an approach. Its slip is how much later the train was last predicted to
+arrive than when it was first seen. Slip percentiles and the share of
+approaches flagged isDly are computed per station, hour and route with
+array operations, without a Python loop over the records.
+
+Requires NumPy, which is only imported when this module is used.
+"""
+import os
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+RECORD_DTYPE = np.dtype([
+    ("sampled_at", "<u4"),
+    ("arrival", "<u4"),  # predicted arrival time
+    ("station", "<u4"),  # stop_id (mapid)
+    ("train", "<u2"),  # run number
+    ("route", "u1"),  # position in ROUTES
+    ("flags", "u1"),
+])
+# Train Tracker route codes; 0 is an unknown route.
+ROUTES = ("", "Red", "Blue", "Brn", "G", "Org", "P", "Pink", "Y")
+ROUTE_CODES = {route: code for code, route in enumerate(ROUTES)}
+DELAYED = 1
+SCHEDULED = 2
+# Samples of the same train further apart than this are separate approaches
+# (the run number comes round again on the next trip).
+APPROACH_GAP = 15 * 60
+PERCENTILES = (50, 90, 95)
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _seconds(moment):
+    return int((moment - _EPOCH).total_seconds())
+
+
+def _integer(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def encode_arrivals(stop_id, arrivals, sampled_at):
+    """
+    Records for `arrivals` (dicts from parse_arrival) seen at `stop_id` at
+    `sampled_at` (a local datetime). Arrivals without a readable arrival
+    time are left out.
+    """
+    rows = []
+    for arr in arrivals:
+        try:
+            arrival = _seconds(datetime.fromisoformat(str(arr.get("arrival_time"))))
+        except ValueError:
+            continue
+        flags = (DELAYED if arr.get("is_delayed") == "1" else 0) | (SCHEDULED if arr.get("is_scheduled") == "1" else 0)
+        rows.append((_seconds(sampled_at), arrival, _integer(stop_id), _integer(arr.get("train_id")) & 0xFFFF,
+                     ROUTE_CODES.get(arr.get("route"), 0), flags))
+    return np.array(rows, dtype=RECORD_DTYPE)
+
+
+def day_path(directory, day):
+    return Path(directory) / f"{day:%Y-%m-%d}.bin"
+
+
+def append_records(directory, records, day):
+    """
+    Append records to the file for `day`. A single write of a whole sample,
+    so concurrent recorders don't interleave records.
+    """
+    if not len(records):
+        return 0
+    path = day_path(directory, day)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("ab") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size % RECORD_DTYPE.itemsize:
+            # the tail of a record a crash cut short
+            f.truncate(size - size % RECORD_DTYPE.itemsize)
+        f.write(records.tobytes())
+    return len(records)
+
+
+def record_sample(directory, stop_id, arrivals, sampled_at=None):
+    "Log one sample of arrivals at stop_id; returns the number of records written."
+    sampled_at = sampled_at or datetime.now()
+    return append_records(directory, encode_arrivals(stop_id, arrivals, sampled_at), sampled_at.date())
+
+
+def load_records(directory, start=None, end=None):
+    """
+    All records from the day files between `start` and `end` (dates,
+    inclusive; either may be None for no limit), in one array.
+    """
+    parts = []
+    for path in sorted(Path(directory).glob("*.bin")):
+        try:
+            day = date.fromisoformat(path.stem)
+        except ValueError:
+            continue
+        if (start is not None and day < start) or (end is not None and day > end):
+            continue
+        count = path.stat().st_size // RECORD_DTYPE.itemsize
+        if count:
+            parts.append(np.fromfile(path, dtype=RECORD_DTYPE, count=count))
+    return np.concatenate(parts) if parts else np.empty(0, dtype=RECORD_DTYPE)
+
+
+def load_recent_records(directory, days, today=None):
+    "Records from the last `days` days, today included."
+    today = today or date.today()
+    return load_records(directory, today - timedelta(days=days - 1), today)
+
+
+def approaches(records):
+    """
+    Group records into approaches: the samples of one train (by station,
+    route and run number) with no more than APPROACH_GAP between them.
+    Returns a dict of equal-length arrays: station, route, hour (of the
+    last predicted arrival), samples, slip (seconds) and delayed (True if
+    any sample was flagged isDly). Records without a run number are skipped.
+    """
+    records = records[records["train"] != 0]
+    order = np.lexsort((records["sampled_at"], records["train"], records["route"], records["station"]))
+    records = records[order]
+    sampled_at = records["sampled_at"].astype(np.int64)
+    starts_new = np.ones(len(records), dtype=bool)
+    starts_new[1:] = ((records["station"][1:] != records["station"][:-1])
+                      | (records["route"][1:] != records["route"][:-1])
+                      | (records["train"][1:] != records["train"][:-1])
+                      | (np.diff(sampled_at) > APPROACH_GAP))
+    first = np.flatnonzero(starts_new)
+    last = np.append(first[1:], len(records))[:len(first)] - 1
+    arrival = records["arrival"].astype(np.int64)
+    delayed = records["flags"] & DELAYED
+    return {
+        "station": records["station"][first],
+        "route": records["route"][first],
+        "hour": (arrival[last] // 3600) % 24,
+        "samples": last - first + 1,
+        "slip": arrival[last] - arrival[first],
+        "delayed": np.maximum.reduceat(delayed, first) > 0 if len(first) else np.zeros(0, dtype=bool),
+    }
+
+
+def _group_percentiles(keys, values, percentiles):
+    """
+    For each distinct key: (key, count, [percentile of its values...]),
+    with the same linear interpolation as np.percentile.
+    """
+    order = np.lexsort((values, keys))
+    keys, values = keys[order], values[order]
+    first = np.flatnonzero(np.append(True, keys[1:] != keys[:-1])) if len(keys) else np.zeros(0, dtype=np.int64)
+    counts = np.diff(np.append(first, len(keys)))
+    columns = []
+    for q in percentiles:
+        position = first + (counts - 1) * (q / 100)
+        low = np.floor(position).astype(np.int64)
+        high = np.minimum(low + 1, first + counts - 1)
+        columns.append(values[low] + (values[high] - values[low]) * (position - low))
+    return keys[first], counts, columns
+
+
+def delay_stats(records, percentiles=PERCENTILES, stop_id=None):
+    """
+    Slip percentiles per (station, hour, route), over the approaches seen
+    in at least two samples. Returns rows, sorted by station, hour and
+    route, of dicts with station, hour, route, approaches, delayed (the
+    share flagged isDly) and p<q> for each percentile, in seconds.
+    """
+    found = approaches(records)
+    keep = found["samples"] >= 2
+    if stop_id is not None:
+        keep &= found["station"] == _integer(stop_id)
+    station = found["station"][keep].astype(np.int64)
+    hour = found["hour"][keep]
+    route = found["route"][keep].astype(np.int64)
+    keys = (station * 24 + hour) * len(ROUTES) + route
+    group_keys, counts, columns = _group_percentiles(keys, found["slip"][keep].astype(np.float64), percentiles)
+    # group_keys is sorted, so each approach finds its group by binary search
+    delayed = np.bincount(np.searchsorted(group_keys, keys), weights=found["delayed"][keep].astype(np.float64),
+                          minlength=len(group_keys))
+    rows = []
+    for i, key in enumerate(group_keys.tolist()):
+        row = {
+            "station": str(key // (24 * len(ROUTES))),
+            "hour": key // len(ROUTES) % 24,
+            "route": ROUTES[key % len(ROUTES)] or "?",
+            "approaches": int(counts[i]),
+            "delayed": float(delayed[i] / counts[i]),
+        }
+        for q, column in zip(percentiles, columns):
+            row[f"p{q}"] = float(column[i])
+        rows.append(row)
+    return rows
+
+
+def delay_margin(records, stop_id, hour, percentile=90):
+    """
+    The `percentile` slip, in seconds, of approaches to stop_id during
+    `hour` on any route: a margin to add to a scheduled trip time. None
+    without data for that station and hour.
+    """
+    found = approaches(records[records["station"] == _integer(stop_id)])
+    keep = (found["samples"] >= 2) & (found["hour"] == hour)
+    if not keep.any():
+        return None
+    return max(0.0, float(np.percentile(found["slip"][keep], percentile)))
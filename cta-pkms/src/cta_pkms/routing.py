@@ -0,0 +1,381 @@
+"""
+Local earliest-arrival routing over the GTFS timetable (RAPTOR).
+
+Platforms are collapsed onto their parent stations, so queries and results
+use the same station stop_ids as route-stations.jsonl and the Train Tracker
+mapid. Trips that share a route and stop sequence are grouped into patterns,
+and transfers.jsonl supplies walking footpaths between stations.
+"""
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+from .gtfs import GTFS_DIR, iter_jsonl, load_compiled
+
+TIMETABLE_VERSION = 1
+TIMETABLE_FILES = [
+    "stops.jsonl",
+    "trips.jsonl",
+    "stop_times.jsonl",
+    "transfers.jsonl",
+    "calendar.jsonl",
+    "calendar_dates.jsonl",
+]
+DAY = 24 * 60 * 60
+INF = float("inf")
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+
+def parse_gtfs_time(value):
+    "Convert a GTFS 'HH:MM:SS' time (which may exceed 24:00:00) to seconds."
+    hours, minutes, seconds = str(value).strip().split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+def format_seconds(seconds):
+    "Format seconds after midnight as HH:MM, wrapping past midnight."
+    seconds = int(seconds) % DAY
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}"
+
+
+class Pattern:
+    """
+    Trips of one route that visit the same stations in the same order.
+    Trips are sorted by departure and never overtake each other, so
+    departures[i] is sorted for every position i.
+    """
+    __slots__ = ("route_id", "stations", "trips", "arrivals", "departures")
+
+    def __init__(self, route_id, stations):
+        self.route_id = route_id
+        self.stations = stations
+        self.trips = []
+        self.arrivals = [[] for _ in stations]
+        self.departures = [[] for _ in stations]
+
+    def accepts(self, departures):
+        if not self.trips:
+            return True
+        return all(d >= last[-1] for d, last in zip(departures, self.departures))
+
+    def add_trip(self, trip_id, service_id, arrivals, departures):
+        self.trips.append((trip_id, service_id))
+        for i in range(len(self.stations)):
+            self.arrivals[i].append(arrivals[i])
+            self.departures[i].append(departures[i])
+
+
+class Timetable:
+    def __init__(self, station_names, patterns, footpaths, calendar, calendar_dates):
+        self.station_names = station_names
+        self.patterns = patterns
+        self.footpaths = footpaths
+        self.calendar = calendar
+        self.calendar_dates = calendar_dates
+        self.station_patterns = {}
+        for p_idx, pattern in enumerate(patterns):
+            for pos, station in enumerate(pattern.stations[:-1]):
+                self.station_patterns.setdefault(station, []).append((p_idx, pos))
+
+    def active_services(self, day):
+        "Return the set of service_ids running on a date."
+        key = day.strftime("%Y%m%d")
+        weekday = day.weekday()
+        active = {
+            service_id for service_id, (days, start, end) in self.calendar.items()
+            if days[weekday] and start <= key <= end
+        }
+        for service_id, exception_type in self.calendar_dates.get(key, ()):
+            if exception_type == 1:
+                active.add(service_id)
+            else:
+                active.discard(service_id)
+        return active
+
+
+def build_timetable(gtfs_dir=GTFS_DIR):
+    """
+    Parse the GTFS JSONL files into a Timetable.
+    """
+    station_of = {}
+    station_names = {}
+    for stop in iter_jsonl(gtfs_dir / "stops.jsonl"):
+        stop_id = str(stop["stop_id"])
+        parent = stop.get("parent_station")
+        station_of[stop_id] = str(parent) if parent else stop_id
+        if not parent:
+            station_names[stop_id] = stop.get("stop_name")
+
+    trip_info = {}
+    for trip in iter_jsonl(gtfs_dir / "trips.jsonl"):
+        trip_info[str(trip["trip_id"])] = (trip.get("route_id"), str(trip.get("service_id")))
+
+    stop_times = {}
+    for row in iter_jsonl(gtfs_dir / "stop_times.jsonl"):
+        trip_id = str(row["trip_id"])
+        if trip_id not in trip_info:
+            continue
+        stop_id = str(row["stop_id"])
+        stop_times.setdefault(trip_id, []).append((
+            int(row["stop_sequence"]),
+            station_of.get(stop_id, stop_id),
+            parse_gtfs_time(row.get("arrival_time") or row["departure_time"]),
+            parse_gtfs_time(row.get("departure_time") or row["arrival_time"]),
+        ))
+
+    by_key = {}
+    for trip_id, rows in stop_times.items():
+        rows.sort()
+        stations, arrivals, departures = [], [], []
+        for _, station, arrival, departure in rows:
+            if stations and stations[-1] == station:
+                departures[-1] = departure
+                continue
+            stations.append(station)
+            arrivals.append(arrival)
+            departures.append(departure)
+        if len(stations) < 2:
+            continue
+        route_id, service_id = trip_info[trip_id]
+        key = (route_id, tuple(stations))
+        by_key.setdefault(key, []).append((departures[0], trip_id, service_id, arrivals, departures))
+
+    patterns = []
+    for (route_id, stations), trips in by_key.items():
+        trips.sort()
+        group = []
+        for _, trip_id, service_id, arrivals, departures in trips:
+            pattern = next((p for p in group if p.accepts(departures)), None)
+            if pattern is None:
+                pattern = Pattern(route_id, stations)
+                group.append(pattern)
+            pattern.add_trip(trip_id, service_id, arrivals, departures)
+        patterns.extend(group)
+
+    footpaths = {}
+    transfers_file = gtfs_dir / "transfers.jsonl"
+    if transfers_file.exists():
+        for row in iter_jsonl(transfers_file):
+            from_station = station_of.get(str(row["from_stop_id"]), str(row["from_stop_id"]))
+            to_station = station_of.get(str(row["to_stop_id"]), str(row["to_stop_id"]))
+            if from_station == to_station or str(row.get("transfer_type")) == "3":
+                continue
+            walk = int(float(row.get("min_transfer_time") or 0))
+            paths = footpaths.setdefault(from_station, {})
+            paths[to_station] = min(walk, paths.get(to_station, walk))
+    footpaths = {station: sorted(paths.items()) for station, paths in footpaths.items()}
+
+    calendar = {}
+    for row in iter_jsonl(gtfs_dir / "calendar.jsonl"):
+        days = tuple(str(row.get(day)) == "1" for day in WEEKDAYS)
+        calendar[str(row["service_id"])] = (days, str(row["start_date"]), str(row["end_date"]))
+    calendar_dates = {}
+    dates_file = gtfs_dir / "calendar_dates.jsonl"
+    if dates_file.exists():
+        for row in iter_jsonl(dates_file):
+            calendar_dates.setdefault(str(row["date"]), []).append(
+                (str(row["service_id"]), int(row["exception_type"]))
+            )
+
+    return Timetable(station_names, patterns, footpaths, calendar, calendar_dates)
+
+
+def load_timetable(gtfs_dir=GTFS_DIR):
+    """
+    Return the Timetable for `gtfs_dir`, using the compiled on-disk copy
+    when the GTFS files have not changed.
+    """
+    sources = [gtfs_dir / name for name in TIMETABLE_FILES if (gtfs_dir / name).exists()]
+    return load_compiled(
+        "timetable",
+        sources,
+        lambda: build_timetable(gtfs_dir),
+        version=TIMETABLE_VERSION,
+        cache_dir=gtfs_dir / ".compiled",
+    )
+
+
+class Router:
+    """
+    Earliest-arrival RAPTOR queries over a Timetable.
+
+    `transfer_slack` is the minimum time, in seconds, between alighting one
+    train and boarding another at the same station.
+    """
+
+    def __init__(self, timetable, transfer_slack=120, max_transfers=4):
+        self.timetable = timetable
+        self.transfer_slack = transfer_slack
+        self.max_transfers = max_transfers
+        self._services = {}
+
+    def _services_for(self, day):
+        if day not in self._services:
+            self._services[day] = self.timetable.active_services(day)
+        return self._services[day]
+
+    def _earliest_trip(self, pattern, pos, ready, days):
+        """
+        Return (trip_index, offset) for the first trip leaving position `pos`
+        no earlier than `ready`, where offset shifts the trip's times onto
+        the query day (-DAY for trips of the previous service day).
+        """
+        best = None
+        departures = pattern.departures[pos]
+        for offset, services in days:
+            idx = bisect_left(departures, ready - offset)
+            while idx < len(departures):
+                if pattern.trips[idx][1] in services:
+                    if best is None or departures[idx] + offset < departures[best[0]] + best[1]:
+                        best = (idx, offset)
+                    break
+                idx += 1
+        return best
+
+    def earliest_arrival(self, origin, destination, depart_at=None):
+        """
+        Find the earliest arrival from `origin` to `destination` station
+        leaving no earlier than `depart_at` (a datetime, default now).
+        Returns a journey dict, or None if no route is found.
+        """
+        tt = self.timetable
+        origin, destination = str(origin), str(destination)
+        depart_at = depart_at or datetime.now()
+        today = depart_at.date()
+        start = depart_at.hour * 3600 + depart_at.minute * 60 + depart_at.second
+        days = [
+            (0, self._services_for(today)),
+            (-DAY, self._services_for(today - timedelta(days=1))),
+        ]
+
+        best = {origin: start}
+        labels = [{origin: start}]
+        parents = [{}]
+        marked = {origin}
+        for to_station, walk in tt.footpaths.get(origin, ()):
+            if start + walk < best.get(to_station, INF):
+                best[to_station] = labels[0][to_station] = start + walk
+                parents[0][to_station] = ("walk", origin, walk)
+                marked.add(to_station)
+
+        for k in range(1, self.max_transfers + 2):
+            prev = labels[k - 1]
+            current = {}
+            parent = {}
+            slack = self.transfer_slack if k > 1 else 0
+
+            queue = {}
+            for station in marked:
+                for p_idx, pos in tt.station_patterns.get(station, ()):
+                    if pos < queue.get(p_idx, INF):
+                        queue[p_idx] = pos
+            marked = set()
+
+            for p_idx, first_pos in queue.items():
+                pattern = tt.patterns[p_idx]
+                trip = None
+                for pos in range(first_pos, len(pattern.stations)):
+                    station = pattern.stations[pos]
+                    if trip is not None:
+                        idx, offset, board_pos = trip
+                        arrival = pattern.arrivals[pos][idx] + offset
+                        if arrival < min(best.get(station, INF), best.get(destination, INF)):
+                            best[station] = current[station] = arrival
+                            parent[station] = ("ride", p_idx, idx, offset, board_pos, pos)
+                            marked.add(station)
+                    ready = prev.get(station)
+                    if ready is None or pos == len(pattern.stations) - 1:
+                        continue
+                    if trip is not None:
+                        idx, offset, _ = trip
+                        if ready + slack > pattern.departures[pos][idx] + offset:
+                            continue
+                    found = self._earliest_trip(pattern, pos, ready + slack, days)
+                    if found is not None:
+                        trip = (found[0], found[1], pos)
+
+            for station in list(marked):
+                for to_station, walk in tt.footpaths.get(station, ()):
+                    arrival = current[station] + walk
+                    if arrival < min(best.get(to_station, INF), best.get(destination, INF)):
+                        best[to_station] = current[to_station] = arrival
+                        parent[to_station] = ("walk", station, walk)
+                        marked.add(to_station)
+
+            labels.append(current)
+            parents.append(parent)
+            if not marked:
+                break
+
+        if destination not in best or destination == origin:
+            return None
+        return self._journey(origin, destination, depart_at, start, labels, parents)
+
+    def _journey(self, origin, destination, depart_at, start, labels, parents):
+        tt = self.timetable
+        k = min(
+            (k for k, label in enumerate(labels) if destination in label),
+            key=lambda k: (labels[k][destination], k),
+        )
+        arrival = labels[k][destination]
+        legs = []
+        station = destination
+        while station != origin:
+            step = parents[k][station]
+            if step[0] == "walk":
+                _, from_station, walk = step
+                legs.append({
+                    "mode": "walk",
+                    "from_stop_id": from_station,
+                    "to_stop_id": station,
+                    "minutes": round(walk / 60),
+                })
+                station = from_station
+                continue
+            _, p_idx, idx, offset, board_pos, alight_pos = step
+            pattern = tt.patterns[p_idx]
+            from_station = pattern.stations[board_pos]
+            legs.append({
+                "mode": "train",
+                "route_id": pattern.route_id,
+                "trip_id": pattern.trips[idx][0],
+                "from_stop_id": from_station,
+                "to_stop_id": station,
+                "departure_time": format_seconds(pattern.departures[board_pos][idx] + offset),
+                "arrival_time": format_seconds(pattern.arrivals[alight_pos][idx] + offset),
+            })
+            station = from_station
+            k -= 1
+        legs.reverse()
+        for leg in legs:
+            leg["from_stop_name"] = tt.station_names.get(leg["from_stop_id"], leg["from_stop_id"])
+            leg["to_stop_name"] = tt.station_names.get(leg["to_stop_id"], leg["to_stop_id"])
+
+        return {
+            "departure_stop_id": origin,
+            "arrival_stop_id": destination,
+            "departure_time": next((leg["departure_time"] for leg in legs if leg["mode"] == "train"), format_seconds(start)),
+            "arrival_time": format_seconds(arrival),
+            "duration_minutes": round((arrival - start) / 60),
+            "transfers": max(0, sum(leg["mode"] == "train" for leg in legs) - 1),
+            "legs": legs,
+        }
+
+
+def describe_journey(journey):
+    """
+    Render a journey dict in the same shape as the AI planner's answer.
+    """
+    rides = [leg for leg in journey["legs"] if leg["mode"] == "train"]
+    if not rides:
+        first = journey["legs"][0]
+        return (f"Walk from {first['from_stop_name']} to {journey['legs'][-1]['to_stop_name']}. "
+                f"Estimated total commute time: {journey['duration_minutes']} minutes.")
+    first, last = rides[0], rides[-1]
+    lines = " and ".join(dict.fromkeys(leg["route_id"] for leg in rides))
+    text = (f"You will travel from {first['from_stop_name']} to {last['to_stop_name']} via {lines}. "
+            f"Estimated total commute time: {journey['duration_minutes']} minutes. "
+            f"Your train will arrive at {first['departure_time']}.")
+    for leg in rides[1:]:
+        text += (f" Transfer at {leg['from_stop_name']} to the {leg['route_id']} train "
+                 f"departing at {leg['departure_time']}.")
+    return text
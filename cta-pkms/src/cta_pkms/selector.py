@@ -0,0 +1,114 @@
+"""
+Textual station pickers. Kept apart from the CLI module so that textual is
+only imported by the commands that open a picker.
+"""
+from textual.app import App, ComposeResult
+from textual.widgets import Header, Footer, Input, OptionList, Label, Button
+
+from .station_index import load_station_index
+
+
+class StationSelector(App):
+    """
+    Pick one station per prompt by typing part of its name. Results are
+    ranked by StationIndex.search as you type and shown in an OptionList,
+    which only draws the rows on screen. Every step reuses the same widgets.
+    """
+    CSS_PATH = None
+    CSS = "#results { height: 1fr; }"
+    # Up/down in the search box move through the results.
+    BINDINGS = [("down", "cursor_down", "Next"), ("up", "cursor_up", "Previous"), ("escape", "back", "Back")]
+
+    def __init__(self, prompts):
+        super().__init__()
+        self.index = load_station_index()
+        self.prompts = prompts
+        self.chosen = []
+        self.results = []
+
+    def compose(self) -> ComposeResult:
+        yield Header()
+        yield Label(id="prompt")
+        yield Input(placeholder="Type part of a station name", id="search")
+        yield OptionList(id="results")
+        yield Label(id="summary")
+        yield Button("Confirm Selection", id="confirm_btn")
+        yield Footer()
+
+    def on_mount(self):
+        self.show_step()
+
+    def show_step(self):
+        picking = len(self.chosen) < len(self.prompts)
+        for widget_id in ("#search", "#results"):
+            self.query_one(widget_id).display = picking
+        for widget_id in ("#summary", "#confirm_btn"):
+            self.query_one(widget_id).display = not picking
+        if picking:
+            self.query_one("#prompt", Label).update(f"Select {self.prompts[len(self.chosen)]} Station:")
+            search = self.query_one("#search", Input)
+            search.value = ""
+            self.update_results("")
+            search.focus()
+        else:
+            self.query_one("#prompt", Label).update("Confirm:")
+            self.query_one("#summary", Label).update(
+                "\n".join(f"{prompt}: {station['stop_name']}" for prompt, station in zip(self.prompts, self.chosen)))
+            self.query_one("#confirm_btn").focus()
+
+    def describe(self, station):
+        routes = self.index.routes_for(station.get('stop_id'))
+        return f"{station['stop_name']}" + (f"  ({', '.join(routes)})" if routes else "")
+
+    def update_results(self, query):
+        self.results = self.index.search(query)
+        results = self.query_one("#results", OptionList)
+        results.clear_options()
+        results.add_options([self.describe(station) for station in self.results])
+        if self.results:
+            results.highlighted = 0
+
+    def on_input_changed(self, event):
+        self.update_results(event.value)
+
+    def on_input_submitted(self, event):
+        self.pick(self.query_one("#results", OptionList).highlighted)
+
+    def on_option_list_option_selected(self, event):
+        self.pick(event.option_index)
+
+    def pick(self, position):
+        if position is None or position >= len(self.results):
+            return
+        self.chosen.append(self.results[position])
+        self.show_step()
+
+    def action_cursor_down(self):
+        self.query_one("#results", OptionList).action_cursor_down()
+
+    def action_cursor_up(self):
+        self.query_one("#results", OptionList).action_cursor_up()
+
+    def action_back(self):
+        if self.chosen:
+            self.chosen.pop()
+            self.show_step()
+
+    def on_button_pressed(self, event):
+        if event.button.id == "confirm_btn":
+            self.exit(self.chosen[0] if len(self.prompts) == 1 else tuple(self.chosen))
+
+
+def run_single_station_selector():
+    """
+    TUI to select a single station (by stop_name/stop_id).
+    Returns the selected station dict.
+    """
+    return StationSelector(["Departure"]).run()
+
+def run_station_selector():
+    """
+    TUI to select departure and arrival stations.
+    Returns (departure, arrival) station dicts.
+    """
+    return StationSelector(["Departure", "Arrival"]).run()
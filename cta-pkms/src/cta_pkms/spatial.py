@@ -0,0 +1,178 @@
+"""
+Nearest-station queries over the stop_lat/stop_lon of stations in stops.jsonl.
+
+Stations are bucketed into a uniform grid of CELL_MILES squares, so a query
+only looks at the cells around a point instead of every stop, widening ring
+by ring no further than the cells that hold stations. A point outside the
+stations' bounding box is answered by a scan of every station (the rings
+would mostly cross empty cells), and one more than MAX_MILES_OUTSIDE from
+it (mistyped coordinates, say) has no nearest station. Coordinates
+are projected to miles on a flat plane around the stations' mean latitude,
+which is well within a percent over an area the size of Chicago. The
+stations within ALTERNATIVE_MILES of each station are worked out when the
+index is built, for the planner's alternative arrival stations.
+"""
+import math
+
+from .gtfs import GTFS_DIR, iter_jsonl, load_compiled
+
+STOPS_FILE = GTFS_DIR / "stops.jsonl"
+SPATIAL_VERSION = 2
+CELL_MILES = 0.5
+ALTERNATIVE_MILES = 1.0
+MAX_MILES_OUTSIDE = 25.0
+MILES_PER_DEGREE = 69.05
+
+
+class SpatialIndex:
+    def __init__(self, stations):
+        """
+        `stations` are dicts with stop_id, stop_name, stop_lat and stop_lon.
+        """
+        self.stations = stations
+        self.by_stop_id = {str(s["stop_id"]): i for i, s in enumerate(stations)}
+        mean_lat = sum(s["stop_lat"] for s in stations) / len(stations) if stations else 0.0
+        self._lon_scale = MILES_PER_DEGREE * math.cos(math.radians(mean_lat))
+        self._points = [self._project(s["stop_lat"], s["stop_lon"]) for s in stations]
+        self._cells = {}
+        for i, point in enumerate(self._points):
+            self._cells.setdefault(self._cell(point), []).append(i)
+        # (min x, min y, max x, max y) of the stations, in miles and in cells
+        self._bounds = self._cell_bounds = None
+        if stations:
+            xs, ys = [x for x, _ in self._points], [y for _, y in self._points]
+            self._bounds = (min(xs), min(ys), max(xs), max(ys))
+            self._cell_bounds = self._cell(self._bounds[:2]) + self._cell(self._bounds[2:])
+        self._alternatives = [self._within(point, ALTERNATIVE_MILES, exclude=i) for i, point in enumerate(self._points)]
+
+    def __len__(self):
+        return len(self.stations)
+
+    def _project(self, lat, lon):
+        return float(lon) * self._lon_scale, float(lat) * MILES_PER_DEGREE
+
+    def _cell(self, point):
+        return math.floor(point[0] / CELL_MILES), math.floor(point[1] / CELL_MILES)
+
+    def _ring(self, centre, radius):
+        "Positions of the stations in cells exactly `radius` cells from `centre`."
+        cx, cy = centre
+        if radius == 0:
+            yield from self._cells.get(centre, ())
+            return
+        # the ring's top and bottom rows, then its sides between them
+        for x in range(cx - radius, cx + radius + 1):
+            yield from self._cells.get((x, cy - radius), ())
+            yield from self._cells.get((x, cy + radius), ())
+        for y in range(cy - radius + 1, cy + radius):
+            yield from self._cells.get((cx - radius, y), ())
+            yield from self._cells.get((cx + radius, y), ())
+
+    def _last_ring(self, centre):
+        "The ring around `centre` beyond which there are no stations."
+        min_x, min_y, max_x, max_y = self._cell_bounds
+        cx, cy = centre
+        return max(cx - min_x, max_x - cx, cy - min_y, max_y - cy, 0)
+
+    def _outside(self, point):
+        "How many miles `point` is outside the stations' bounding box; 0 inside it."
+        min_x, min_y, max_x, max_y = self._bounds
+        return math.hypot(max(min_x - point[0], 0, point[0] - max_x), max(min_y - point[1], 0, point[1] - max_y))
+
+    def _distance(self, point, i):
+        return math.dist(point, self._points[i])
+
+    def _within(self, point, miles, exclude=None):
+        centre = self._cell(point)
+        found = []
+        for radius in range(min(math.ceil(miles / CELL_MILES), self._last_ring(centre)) + 1):
+            for i in self._ring(centre, radius):
+                distance = self._distance(point, i)
+                if i != exclude and distance <= miles:
+                    found.append((distance, i))
+        found.sort()
+        return [(i, distance) for distance, i in found]
+
+    def _result(self, matches):
+        return [(self.stations[i], round(distance, 3)) for i, distance in matches]
+
+    def nearest_stations(self, lat, lon, k=1):
+        """
+        The k stations closest to (lat, lon), nearest first, as
+        (station, miles) pairs.
+        """
+        if not self.stations or k <= 0:
+            return []
+        point = self._project(lat, lon)
+        outside = self._outside(point)
+        if outside > MAX_MILES_OUTSIDE:
+            return []
+        if outside > 0:
+            found = sorted((self._distance(point, i), i) for i in range(len(self.stations)))
+            return self._result((i, distance) for distance, i in found[:k])
+        centre = self._cell(point)
+        last = self._last_ring(centre)
+        found = []
+        # Widen ring by ring until k stations are found and no unvisited cell
+        # can hold anything closer than the k-th of them, or there are no
+        # cells with stations left.
+        for radius in range(last + 1):
+            found.extend((self._distance(point, i), i) for i in self._ring(centre, radius))
+            found.sort()
+            if len(found) >= k and found[k - 1][0] <= radius * CELL_MILES:
+                break
+        return self._result((i, distance) for distance, i in found[:k])
+
+    def stations_within(self, stop_id, miles=ALTERNATIVE_MILES):
+        """
+        Other stations within `miles` of the station `stop_id`, nearest
+        first, as (station, miles) pairs. Empty for an unknown station.
+        """
+        i = self.by_stop_id.get(str(stop_id))
+        if i is None:
+            return []
+        if miles <= ALTERNATIVE_MILES:
+            return self._result((j, d) for j, d in self._alternatives[i] if d <= miles)
+        return self._result(self._within(self._points[i], miles, exclude=i))
+
+
+def build_spatial_index(path=STOPS_FILE):
+    """
+    Index the stations in stops.jsonl: stops without a parent_station
+    (platforms share their station's location) that have coordinates.
+    """
+    stations = []
+    if path.exists():
+        for stop in iter_jsonl(path):
+            if stop.get("parent_station") or stop.get("stop_lat") is None or stop.get("stop_lon") is None:
+                continue
+            stations.append({
+                "stop_id": str(stop["stop_id"]),
+                "stop_name": stop.get("stop_name"),
+                "stop_lat": float(stop["stop_lat"]),
+                "stop_lon": float(stop["stop_lon"]),
+            })
+    return SpatialIndex(stations)
+
+
+_loaded = {}
+
+
+def load_spatial_index(path=None):
+    """
+    Return the SpatialIndex for `path`, compiled into the on-disk cache like
+    the station index, and memoised for the life of the process.
+    """
+    path = path or STOPS_FILE
+    stamp = path.stat().st_mtime_ns if path.exists() else None
+    cached = _loaded.get(path)
+    if cached is None or cached[0] != stamp:
+        index = load_compiled(
+            f"spatial-index-{path.stem}",
+            [path],
+            lambda: build_spatial_index(path),
+            version=SPATIAL_VERSION,
+            cache_dir=path.parent / ".compiled",
+        )
+        cached = _loaded[path] = (stamp, index)
+    return cached[1]
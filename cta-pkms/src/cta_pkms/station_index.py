@@ -0,0 +1,142 @@
+import re
+from collections import Counter
+
+from .gtfs import GTFS_DIR, iter_jsonl, load_compiled
+
+STATIONS_FILE = GTFS_DIR / "route-stations.jsonl"
+INDEX_VERSION = 2
+# Share of a query word's trigrams a name word needs to count as a (misspelt) match.
+FUZZY_THRESHOLD = 0.5
+
+
+def _line_of(station):
+    return station.get('route_id') or station.get('line') or station.get('line_id')
+
+
+def _words(text):
+    return re.findall(r"[a-z0-9]+", str(text).lower())
+
+
+def _trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class StationIndex:
+    """
+    Stations from route-stations.jsonl, grouped by line and keyed by stop_id.
+    """
+
+    def __init__(self, stations):
+        self.stations = stations
+        self.lines = {}
+        self.by_stop_id = {}
+        self.routes_by_stop_id = {}
+        self.unique_stations = []  # one record per stop_id, what search() returns
+        for station in stations:
+            stop_id = station.get('stop_id')
+            line = _line_of(station)
+            if line:
+                self.lines.setdefault(line, []).append(station)
+            if stop_id is None:
+                continue
+            stop_id = str(stop_id)
+            if stop_id not in self.by_stop_id:
+                self.by_stop_id[stop_id] = station
+                self.unique_stations.append(station)
+            routes = self.routes_by_stop_id.setdefault(stop_id, [])
+            if line and line not in routes:
+                routes.append(line)
+        self._build_search()
+
+    def _build_search(self):
+        """
+        Word-prefix and trigram maps over station names, built once (and
+        pickled with the index) so each keystroke only does dictionary lookups.
+        """
+        self._names = [" ".join(_words(s.get('stop_name', ''))) for s in self.unique_stations]
+        self._name_words = [set(name.split()) for name in self._names]
+        self._prefixes = {}
+        self._trigrams = {}
+        for i, words in enumerate(self._name_words):
+            for word in words:
+                for end in range(1, len(word) + 1):
+                    self._prefixes.setdefault(word[:end], set()).add(i)
+                for gram in _trigrams(word):
+                    self._trigrams.setdefault(gram, set()).add(i)
+
+    def _score(self, term):
+        "Score every station name against one query word: {position: score}."
+        scores = {}
+        for i in self._prefixes.get(term, ()):
+            scores[i] = 3.0 if term in self._name_words[i] else 2.0
+        grams = _trigrams(term)
+        shared = Counter(i for gram in grams for i in self._trigrams.get(gram, ()))
+        for i, count in shared.items():
+            if i in scores:
+                continue
+            if term in self._names[i]:
+                scores[i] = 1.5
+            elif count / len(grams) >= FUZZY_THRESHOLD:
+                scores[i] = count / len(grams)
+        return scores
+
+    def search(self, query, limit=None):
+        """
+        Stations whose name matches every word of `query`, best first: whole
+        words, then word prefixes, then substrings, then near misses (typos).
+        Ties go to the shorter name. An empty query lists every station by name.
+        """
+        terms = _words(query)
+        if not terms:
+            ranked = sorted(range(len(self.unique_stations)), key=lambda i: self._names[i])
+        else:
+            scores = self._score(terms[0])
+            for term in terms[1:]:
+                more = self._score(term)
+                scores = {i: score + more[i] for i, score in scores.items() if i in more}
+            ranked = sorted(scores, key=lambda i: (-scores[i], len(self._names[i]), self._names[i]))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [self.unique_stations[i] for i in ranked]
+
+    def get(self, stop_id):
+        "Return the station record for a stop_id, or None."
+        return self.by_stop_id.get(str(stop_id))
+
+    def routes_for(self, stop_id):
+        "Return the lines that serve a stop_id."
+        return self.routes_by_stop_id.get(str(stop_id), [])
+
+    def __len__(self):
+        return len(self.stations)
+
+
+def build_station_index(path=STATIONS_FILE):
+    if not path.exists():
+        return StationIndex([])
+    return StationIndex(list(iter_jsonl(path)))
+
+
+_loaded = {}
+
+
+def load_station_index(path=None):
+    """
+    Return the StationIndex for `path`, compiling route-stations.jsonl into
+    the on-disk cache the first time and whenever the file changes.
+    The result is also memoised for the life of the process.
+    """
+    path = path or STATIONS_FILE
+    stamp = path.stat().st_mtime_ns if path.exists() else None
+    cached = _loaded.get(path)
+    if cached is None or cached[0] != stamp:
+        index = load_compiled(
+            f"station-index-{path.stem}",
+            [path],
+            lambda: build_station_index(path),
+            version=INDEX_VERSION,
+            cache_dir=path.parent / ".compiled",
+        )
+        cached = _loaded[path] = (stamp, index)
+    return cached[1]
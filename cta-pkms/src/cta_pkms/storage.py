@@ -0,0 +1,355 @@
+"""
+Journaled storage for tasks.json and commutes.json.
+
+Each file stays a plain JSON list (the snapshot), and saves are written as
+operation records to a `<file>.log` next to it: one JSON line per change
+(append, set, insert, delete, or a full replace). Adding a task costs one
+short append instead of rewriting the whole file. Once the log holds
+COMPACT_THRESHOLD records it is folded back into the snapshot in the
+background.
+
+The first line of a log names the digest of the snapshot it applies to. A
+log whose snapshot has since been rewritten (by compaction, or by hand) is
+ignored, so a crash between writing the snapshot and starting a new log
+never replays changes twice. Snapshots are written to a temporary file,
+fsynced and renamed into place. Reading stops at the first record that is
+cut short or can't be applied; everything before it is intact.
+
+Saves and compactions hold an exclusive lock on `.<file>.lock`. If the file
+changed since this process loaded it (another process saved), the save
+re-reads it and replays this process's changes on top, finding the items it
+changed by value rather than position, so concurrent edits of different
+items are all kept and a log never holds a record that doesn't apply.
+"""
+import copy
+import difflib
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock
+    fcntl = None
+
+COMPACT_THRESHOLD = 200
+
+_states = {}  # resolved path -> {"data", "digest", "ops", "intact", "stamp"} as of the last load/save
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(path):
+    with _locks_guard:
+        return _locks.setdefault(path, threading.Lock())
+
+
+def log_path(file_path):
+    file_path = Path(file_path)
+    return file_path.with_name(file_path.name + ".log")
+
+
+@contextmanager
+def _file_lock(file_path):
+    "Hold an exclusive lock shared by every process saving `file_path`."
+    if fcntl is None:
+        yield
+        return
+    with file_path.with_name(f".{file_path.name}.lock").open("a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _stamp(file_path):
+    "What the snapshot and log look like on disk, to notice other writers cheaply."
+    stamp = []
+    for path in (file_path, log_path(file_path)):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            stamp.append(None)
+            continue
+        stamp.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+    return stamp
+
+
+def _digest(raw):
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _fsync_dir(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, raw):
+    "Replace `path` with `raw` bytes: write a temp file, fsync it and rename it into place."
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.tmp{os.getpid()}.{threading.get_ident()}")
+    try:
+        with tmp_path.open("wb") as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    _fsync_dir(path.parent)
+
+
+def apply_op(data, record):
+    op = record["op"]
+    if op == "append":
+        data.append(record["value"])
+    elif op == "set":
+        data[record["index"]] = record["value"]
+    elif op == "insert":
+        data.insert(record["index"], record["value"])
+    elif op == "delete":
+        del data[record["index"]]
+    elif op == "replace":
+        data[:] = record["value"]
+    else:
+        raise ValueError(f"unknown journal operation {op!r}")
+
+
+def diff_ops(old, new):
+    """
+    Operation records that turn list `old` into list `new`: appends, in-place
+    sets, a single insert or delete, or else one replace.
+    """
+    if old == new:
+        return []
+    start = 0
+    while start < min(len(old), len(new)) and old[start] == new[start]:
+        start += 1
+    end_old, end_new = len(old), len(new)
+    while end_old > start and end_new > start and old[end_old - 1] == new[end_new - 1]:
+        end_old -= 1
+        end_new -= 1
+    removed, added = end_old - start, end_new - start
+
+    if removed == 0 and end_old == len(old):
+        return [{"op": "append", "value": value} for value in new[start:]]
+    if removed == added:
+        return [{"op": "set", "index": i, "value": new[i]} for i in range(start, end_new)]
+    if removed == 1 and added == 0:
+        return [{"op": "delete", "index": start}]
+    if removed == 0 and added == 1:
+        return [{"op": "insert", "index": start, "value": new[start]}]
+    return [{"op": "replace", "value": new}]
+
+
+def _log_base(log):
+    "Digest of the snapshot a log applies to, or None."
+    try:
+        with log.open(encoding="utf-8") as f:
+            header = f.readline()
+    except FileNotFoundError:
+        return None
+    if not header.endswith("\n"):
+        return None
+    try:
+        return json.loads(header).get("base")
+    except ValueError:
+        return None
+
+
+def _read(file_path):
+    """
+    Return (data, snapshot digest, number of log records applied, whether
+    every complete record applied).
+    """
+    raw = file_path.read_bytes()
+    data = json.loads(raw)
+    digest = _digest(raw)
+    ops = 0
+    log = log_path(file_path)
+    if _log_base(log) != digest:
+        return data, digest, ops, True
+    try:
+        with log.open(encoding="utf-8") as f:
+            f.readline()
+            for line in f:
+                if not line.endswith("\n"):
+                    # cut short by a crash; save_json drops it before appending
+                    break
+                try:
+                    # apply_op raises before changing anything
+                    apply_op(data, json.loads(line))
+                except (ValueError, TypeError, LookupError):
+                    return data, digest, ops, False
+                ops += 1
+    except FileNotFoundError:
+        pass
+    return data, digest, ops, True
+
+
+def _drop_partial_line(log):
+    "Cut a record left unfinished by a crash off the end of a log, so the next one starts on its own line."
+    with log.open("rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # the header is short; records are one short line each, so look back in blocks
+        end = size
+        while end > 0:
+            start = max(0, end - 4096)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                f.truncate(start + newline + 1)
+                return
+            end = start
+        f.truncate(0)
+
+
+def _position(items, value):
+    for i, item in enumerate(items):
+        if item == value:
+            return i
+    return None
+
+
+def rebase(current, base, mine):
+    """
+    Apply the changes that turned `base` into `mine` to `current` (which
+    another writer has changed since `base`), finding the changed items in
+    `current` by value. Changes to items the other writer has removed or
+    changed are dropped.
+    """
+    result = copy.deepcopy(current)
+    key = lambda item: json.dumps(item, sort_keys=True)
+    matcher = difflib.SequenceMatcher(None, [key(item) for item in base], [key(item) for item in mine],
+                                      autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        old, new = base[i1:i2], copy.deepcopy(mine[j1:j2])
+        if len(old) == len(new):
+            # edits in place; an item the other writer changed or removed keeps their version
+            for before, after in zip(old, new):
+                i = _position(result, before)
+                if i is not None:
+                    result[i] = after
+            continue
+        # new items go in place of the first old one still there, else before the next unchanged one
+        at = None
+        for item in old:
+            i = _position(result, item)
+            if i is not None:
+                del result[i]
+                at = i if at is None else min(at, i)
+        if at is None:
+            at = _position(result, base[i2]) if i2 < len(base) else None
+        if at is None:
+            at = len(result)
+        result[at:at] = new
+    return result
+
+
+def ensure_file(file_path):
+    if not file_path.exists():
+        file_path.write_text("[]")
+
+
+def load_json(file_path):
+    ensure_file(file_path)
+    file_path = Path(file_path)
+    key = file_path.resolve()
+    with _lock_for(key):
+        stamp = _stamp(file_path)
+        data, digest, ops, intact = _read(file_path)
+        _states[key] = {"data": copy.deepcopy(data), "digest": digest, "ops": ops, "intact": intact,
+                        "stamp": stamp}
+    return data
+
+
+def _write_snapshot(file_path, data):
+    raw = json.dumps(data, indent=2).encode()
+    atomic_write(file_path, raw)
+    atomic_write(log_path(file_path), (json.dumps({"base": _digest(raw)}) + "\n").encode())
+    return _digest(raw)
+
+
+def save_json(file_path, data):
+    """
+    Save `data` to `file_path`. When the file was loaded in this process,
+    only the changes since then are appended to its log (replayed on top of
+    any other process's changes made meanwhile); otherwise the snapshot is
+    rewritten.
+    """
+    file_path = Path(file_path)
+    key = file_path.resolve()
+    with _lock_for(key), _file_lock(file_path):
+        state = _states.get(key)
+        if state is None or not file_path.exists():
+            digest = _write_snapshot(file_path, data)
+            _states[key] = {"data": copy.deepcopy(data), "digest": digest, "ops": 0, "intact": True,
+                            "stamp": _stamp(file_path)}
+            return
+
+        if _stamp(file_path) != state["stamp"]:
+            # someone else saved since we loaded
+            current, digest, ops, intact = _read(file_path)
+            data = rebase(current, state["data"], data)
+            state.update(data=current, digest=digest, ops=ops, intact=intact)
+        records = diff_ops(state["data"], data)
+        if not records:
+            state["stamp"] = _stamp(file_path)
+            return
+        if not state["intact"]:
+            # the log has a record that can't be applied; start over from a clean snapshot
+            digest = _write_snapshot(file_path, data)
+            state.update(data=copy.deepcopy(data), digest=digest, ops=0, intact=True, stamp=_stamp(file_path))
+            return
+        log = log_path(file_path)
+        lines = "".join(json.dumps(record) + "\n" for record in records)
+        if _log_base(log) != state["digest"]:
+            # start a fresh log for the snapshot as it is now
+            atomic_write(log, (json.dumps({"base": state["digest"]}) + "\n" + lines).encode())
+        else:
+            _drop_partial_line(log)
+            with log.open("a", encoding="utf-8") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+        state["data"] = copy.deepcopy(data)
+        state["ops"] += len(records)
+        state["stamp"] = _stamp(file_path)
+        compact = state["ops"] >= COMPACT_THRESHOLD
+    if compact:
+        # Not a daemon thread, so a CLI command waits for it before exiting.
+        threading.Thread(target=compact_log, args=(file_path,)).start()
+
+
+def compact_log(file_path):
+    "Fold the log into a new snapshot and start an empty log."
+    file_path = Path(file_path)
+    key = file_path.resolve()
+    with _lock_for(key), _file_lock(file_path):
+        data, _, ops, intact = _read(file_path)
+        if ops == 0 and intact:
+            return
+        digest = _write_snapshot(file_path, data)
+        state = _states.get(key)
+        if state is not None and state["data"] == data:
+            state.update(digest=digest, ops=0, intact=True, stamp=_stamp(file_path))
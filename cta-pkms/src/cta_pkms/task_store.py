@@ -0,0 +1,335 @@
+"""
+Task and commute storage behind one interface.
+
+JSONTaskStore keeps the journaled tasks.json / commutes.json files.
+SQLiteTaskStore keeps both in a SQLite database, with indexes on task status
+and location and an FTS5 table over task names and descriptions, so listing,
+filtering and searching don't have to read every task. Triggers keep a count
+of tasks per status in each block of BLOCK_SIZE ids, so finding task number
+N, or counting tasks, adds up block counts instead of stepping over N rows.
+
+Tasks are numbered from 1 in the order they were added, either overall
+(amend_task) or within their status group (delete_task), as in the CLI.
+"""
+import re
+import sqlite3
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+from .storage import load_json, save_json
+
+TASK_FIELDS = ("name", "description", "location", "status")
+COMMUTE_FIELDS = ("name", "departure_station", "departure_stop_id", "arrival_station", "arrival_stop_id")
+BLOCK_SIZE = 256  # a power of two: a task's block is id >> BLOCK_SHIFT
+BLOCK_SHIFT = BLOCK_SIZE.bit_length() - 1
+
+
+def _terms(query):
+    return re.findall(r"\w+", query.lower())
+
+
+class JSONTaskStore:
+    def __init__(self, tasks_file, commutes_file):
+        self.tasks_file = Path(tasks_file)
+        self.commutes_file = Path(commutes_file)
+        self._pending = None  # {path: data} while a transaction is open
+
+    def _load(self, path):
+        if self._pending is None:
+            return load_json(path)
+        if path not in self._pending:
+            self._pending[path] = load_json(path)
+        return self._pending[path]
+
+    def _save(self, path, data):
+        if self._pending is None:
+            save_json(path, data)
+        else:
+            self._pending[path] = data
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group changes: each file is loaded once, and saved once when the
+        block finishes. Nothing is saved if it raises.
+        """
+        self._pending = {}
+        try:
+            yield self
+            for path, data in self._pending.items():
+                save_json(path, data)
+        finally:
+            self._pending = None
+
+    def add_task(self, task):
+        tasks = self._load(self.tasks_file)
+        tasks.append(task)
+        self._save(self.tasks_file, tasks)
+
+    def list_tasks(self, status=None):
+        tasks = self._load(self.tasks_file)
+        if status is None:
+            return tasks
+        return [task for task in tasks if task.get("status", "pending") == status]
+
+    def count_tasks(self, status=None):
+        return len(self.list_tasks(status))
+
+    def amend_task(self, index, changes):
+        """
+        Apply `changes` to task number `index`; a None value removes the field.
+        Returns False if there is no such task.
+        """
+        tasks = self._load(self.tasks_file)
+        if not 1 <= index <= len(tasks):
+            return False
+        task = tasks[index - 1]
+        for field, value in changes.items():
+            if value is None:
+                task.pop(field, None)
+            else:
+                task[field] = value
+        self._save(self.tasks_file, tasks)
+        return True
+
+    def delete_task(self, index, status="pending"):
+        "Delete task number `index` within `status` and return it, or None."
+        tasks = self._load(self.tasks_file)
+        filtered = [i for i, task in enumerate(tasks) if task.get("status", "pending") == status]
+        if not 1 <= index <= len(filtered):
+            return None
+        removed = tasks.pop(filtered[index - 1])
+        self._save(self.tasks_file, tasks)
+        return removed
+
+    def search_tasks(self, query, limit=50):
+        "Tasks whose name or description contain every word of `query` (as a prefix)."
+        terms = _terms(query)
+        results = []
+        for task in self._load(self.tasks_file):
+            words = _terms(f"{task.get('name', '')} {task.get('description', '')}")
+            if all(any(word.startswith(term) for word in words) for term in terms):
+                results.append(task)
+                if len(results) >= limit:
+                    break
+        return results
+
+    def add_commute(self, commute):
+        commutes = self._load(self.commutes_file)
+        commutes.append(commute)
+        self._save(self.commutes_file, commutes)
+
+    def list_commutes(self):
+        return self._load(self.commutes_file)
+
+    def delete_commute(self, index):
+        commutes = self._load(self.commutes_file)
+        if not 1 <= index <= len(commutes):
+            return None
+        removed = commutes.pop(index - 1)
+        self._save(self.commutes_file, commutes)
+        return removed
+
+
+class SQLiteTaskStore:
+    def __init__(self, path):
+        self.path = Path(path)
+        self._in_transaction = False
+        self.db = sqlite3.connect(self.path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                description TEXT NOT NULL DEFAULT '',
+                location TEXT,
+                status TEXT NOT NULL DEFAULT 'pending'
+            );
+            CREATE INDEX IF NOT EXISTS tasks_status ON tasks(status);
+            CREATE INDEX IF NOT EXISTS tasks_location ON tasks(location);
+            CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+                name, description, content='tasks', content_rowid='id'
+            );
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+                INSERT INTO tasks_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+            END;
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+                INSERT INTO tasks_fts(tasks_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+            END;
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF name, description ON tasks BEGIN
+                INSERT INTO tasks_fts(tasks_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+                INSERT INTO tasks_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+            END;
+            CREATE TABLE IF NOT EXISTS task_blocks (
+                block INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (block, status)
+            ) WITHOUT ROWID;
+            CREATE TRIGGER IF NOT EXISTS task_blocks_insert AFTER INSERT ON tasks BEGIN
+                INSERT INTO task_blocks VALUES (new.id >> {shift}, new.status, 1)
+                    ON CONFLICT (block, status) DO UPDATE SET count = count + 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS task_blocks_delete AFTER DELETE ON tasks BEGIN
+                UPDATE task_blocks SET count = count - 1 WHERE block = old.id >> {shift} AND status = old.status;
+            END;
+            CREATE TRIGGER IF NOT EXISTS task_blocks_update AFTER UPDATE OF status ON tasks BEGIN
+                UPDATE task_blocks SET count = count - 1 WHERE block = old.id >> {shift} AND status = old.status;
+                INSERT INTO task_blocks VALUES (new.id >> {shift}, new.status, 1)
+                    ON CONFLICT (block, status) DO UPDATE SET count = count + 1;
+            END;
+            CREATE TABLE IF NOT EXISTS commutes (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                departure_station TEXT,
+                departure_stop_id TEXT,
+                arrival_station TEXT,
+                arrival_stop_id TEXT
+            );
+        """.replace("{shift}", str(BLOCK_SHIFT)))
+        with self.db:
+            # a database made before task_blocks existed
+            if (self.db.execute("SELECT NOT EXISTS (SELECT 1 FROM task_blocks)").fetchone()[0]
+                    and self.db.execute("SELECT EXISTS (SELECT 1 FROM tasks)").fetchone()[0]):
+                self.db.execute(f"INSERT INTO task_blocks SELECT id >> {BLOCK_SHIFT}, status, COUNT(*)"
+                                " FROM tasks GROUP BY 1, 2")
+
+    def close(self):
+        self.db.close()
+
+    @contextmanager
+    def transaction(self):
+        "Apply every change in the block in one SQLite transaction."
+        with self.db:
+            self._in_transaction = True
+            try:
+                yield self
+            finally:
+                self._in_transaction = False
+
+    def _write(self):
+        return nullcontext() if self._in_transaction else self.db
+
+    @staticmethod
+    def _task(row):
+        task = {"name": row["name"], "description": row["description"], "status": row["status"]}
+        if row["location"] is not None:
+            task["location"] = row["location"]
+        return task
+
+    def _insert_tasks(self, tasks):
+        self.db.executemany(
+            "INSERT INTO tasks (name, description, location, status) VALUES (?, ?, ?, ?)",
+            ((task["name"], task.get("description") or "", task.get("location"), task.get("status") or "pending")
+             for task in tasks),
+        )
+
+    def add_task(self, task):
+        with self._write():
+            self._insert_tasks([task])
+
+    def list_tasks(self, status=None):
+        if status is None:
+            rows = self.db.execute("SELECT * FROM tasks ORDER BY id")
+        else:
+            rows = self.db.execute("SELECT * FROM tasks WHERE status = ? ORDER BY id", (status,))
+        return [self._task(row) for row in rows]
+
+    def _block_counts(self, status=None):
+        if status is None:
+            return self.db.execute("SELECT block, SUM(count) FROM task_blocks GROUP BY block ORDER BY block")
+        return self.db.execute("SELECT block, count FROM task_blocks WHERE status = ? ORDER BY block", (status,))
+
+    def count_tasks(self, status=None):
+        return sum(count for _, count in self._block_counts(status))
+
+    def _task_id(self, index, status=None):
+        "The id of task number `index` (within `status`), or None."
+        if index < 1:
+            return None
+        skip = index - 1
+        for block, count in self._block_counts(status):
+            if skip < count:
+                break
+            skip -= count
+        else:
+            return None
+        # at most BLOCK_SIZE rows to step over
+        bounds = (block << BLOCK_SHIFT, (block + 1) << BLOCK_SHIFT)
+        if status is None:
+            row = self.db.execute("SELECT id FROM tasks WHERE id >= ? AND id < ? ORDER BY id LIMIT 1 OFFSET ?",
+                                  (*bounds, skip)).fetchone()
+        else:
+            row = self.db.execute(
+                "SELECT id FROM tasks WHERE id >= ? AND id < ? AND status = ? ORDER BY id LIMIT 1 OFFSET ?",
+                (*bounds, status, skip),
+            ).fetchone()
+        return row and row["id"]
+
+    def amend_task(self, index, changes):
+        task_id = self._task_id(index)
+        if task_id is None:
+            return False
+        changes = {field: value for field, value in changes.items() if field in TASK_FIELDS}
+        if "description" in changes:
+            changes["description"] = changes["description"] or ""
+        if changes:
+            assignments = ", ".join(f"{field} = ?" for field in changes)
+            with self._write():
+                self.db.execute(f"UPDATE tasks SET {assignments} WHERE id = ?", (*changes.values(), task_id))
+        return True
+
+    def delete_task(self, index, status="pending"):
+        task_id = self._task_id(index, status)
+        if task_id is None:
+            return None
+        with self._write():
+            row = self.db.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+            self.db.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+        return self._task(row)
+
+    def search_tasks(self, query, limit=50):
+        "Tasks whose name or description contain every word of `query` (as a prefix), best matches first."
+        terms = _terms(query)
+        if not terms:
+            return self.list_tasks()[:limit]
+        match = " ".join(f'"{term}"*' for term in terms)
+        rows = self.db.execute(
+            "SELECT tasks.* FROM tasks_fts JOIN tasks ON tasks.id = tasks_fts.rowid"
+            " WHERE tasks_fts MATCH ? ORDER BY rank LIMIT ?",
+            (match, limit),
+        )
+        return [self._task(row) for row in rows]
+
+    def _insert_commutes(self, commutes):
+        self.db.executemany(
+            f"INSERT INTO commutes ({', '.join(COMMUTE_FIELDS)}) VALUES (?, ?, ?, ?, ?)",
+            (tuple(commute.get(field) for field in COMMUTE_FIELDS) for commute in commutes),
+        )
+
+    def add_commute(self, commute):
+        with self._write():
+            self._insert_commutes([commute])
+
+    def list_commutes(self):
+        rows = self.db.execute("SELECT * FROM commutes ORDER BY id")
+        return [{field: row[field] for field in COMMUTE_FIELDS} for row in rows]
+
+    def delete_commute(self, index):
+        if index < 1:
+            return None
+        row = self.db.execute("SELECT * FROM commutes ORDER BY id LIMIT 1 OFFSET ?", (index - 1,)).fetchone()
+        if row is None:
+            return None
+        with self._write():
+            self.db.execute("DELETE FROM commutes WHERE id = ?", (row["id"],))
+        return {field: row[field] for field in COMMUTE_FIELDS}
+
+    def import_json(self, tasks, commutes):
+        "Replace every task and commute with the given lists, in one transaction."
+        with self._write():
+            self.db.execute("DELETE FROM tasks")
+            self.db.execute("DELETE FROM commutes")
+            self._insert_tasks(tasks)
+            self._insert_commutes(commutes)
@@ -0,0 +1,189 @@
+"""
+Minimum scheduled travel times between every pair of 'L' stations.
+
+compute_travel_times works them out from the compiled timetable: the
+fastest scheduled ride between any two stations of a pattern, walking
+transfers from transfers.jsonl, and TRANSFER_SLACK for every change of
+train, combined with Floyd-Warshall. The wait for the first train is not
+included, so these are lower bounds on a real trip.
+
+build_travel_matrix saves them next to the compiled timetable as a uint16
+.npy array of seconds (UNREACHABLE where there is no route) plus a JSON
+list of station IDs. load_travel_matrix memory-maps that array, so an ETA
+is a single lookup. The CLI only reads a saved matrix (build=False):
+computing one is left to `build-travel-matrix`.
+
+Requires NumPy, which is only imported when this module is used.
+"""
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from .gtfs import GTFS_DIR
+from .routing import TIMETABLE_FILES, load_timetable
+
+MATRIX_VERSION = 1
+MATRIX_NAME = "travel-times"
+# Same default as Router: time to change between trains at a station.
+TRANSFER_SLACK = 120
+UNREACHABLE = int(np.iinfo(np.uint16).max)
+
+
+def _floyd_warshall(dist):
+    "All-pairs shortest paths, in place."
+    for k in range(len(dist)):
+        np.minimum(dist, dist[:, k, None] + dist[None, k, :], out=dist)
+    return dist
+
+
+def _min_plus(a, b):
+    "The (min, +) product of two matrices: the best a-step followed by a b-step."
+    out = np.full((a.shape[0], b.shape[1]), np.inf)
+    for k in range(a.shape[1]):
+        np.minimum(out, a[:, k, None] + b[None, k, :], out=out)
+    return out
+
+
+def compute_travel_times(timetable, transfer_slack=TRANSFER_SLACK):
+    """
+    Return (station_ids, seconds) where seconds[i, j] is the shortest
+    scheduled time from station_ids[i] to station_ids[j], inf if there is
+    no way there.
+    """
+    stations = set()
+    for pattern in timetable.patterns:
+        stations.update(pattern.stations)
+    for origin, paths in timetable.footpaths.items():
+        stations.add(origin)
+        stations.update(target for target, _ in paths)
+    station_ids = sorted(stations)
+    position = {station: i for i, station in enumerate(station_ids)}
+    n = len(station_ids)
+
+    # Fastest single ride from each station of a pattern to each later one.
+    ride = np.full((n, n), np.inf)
+    for pattern in timetable.patterns:
+        rows = np.array([position[station] for station in pattern.stations])
+        arrivals = np.array(pattern.arrivals, dtype=np.float64)
+        departures = np.array(pattern.departures, dtype=np.float64)
+        for i in range(len(rows) - 1):
+            np.minimum.at(ride, (rows[i], rows[i + 1:]), (arrivals[i + 1:] - departures[i]).min(axis=1))
+
+    walk = np.full((n, n), np.inf)
+    for origin, paths in timetable.footpaths.items():
+        for target, seconds in paths:
+            walk[position[origin], position[target]] = min(walk[position[origin], position[target]], seconds)
+    np.fill_diagonal(walk, 0)
+    walk = _floyd_warshall(walk)
+
+    # Charge the slack on every ride and take it back once, for the first
+    # boarding. Journeys by train are: walk, ride, then anything.
+    boarding = ride + transfer_slack
+    legs = np.minimum(boarding, walk)
+    np.fill_diagonal(legs, 0)
+    by_train = _min_plus(_min_plus(walk, boarding), _floyd_warshall(legs)) - transfer_slack
+    return station_ids, np.minimum(walk, by_train)
+
+
+class TravelMatrix:
+    def __init__(self, times, station_ids):
+        """
+        `times` is a uint16 array of seconds (possibly memory-mapped),
+        indexed in the order of `station_ids`.
+        """
+        self.times = times
+        self.station_ids = station_ids
+        self.position = {str(station): i for i, station in enumerate(station_ids)}
+
+    def __len__(self):
+        return len(self.station_ids)
+
+    def seconds(self, from_stop_id, to_stop_id):
+        "Minimum scheduled seconds between two stations, or None if unknown or unreachable."
+        i = self.position.get(str(from_stop_id))
+        j = self.position.get(str(to_stop_id))
+        if i is None or j is None:
+            return None
+        value = int(self.times[i, j])
+        return None if value == UNREACHABLE else value
+
+    def minutes(self, from_stop_id, to_stop_id):
+        seconds = self.seconds(from_stop_id, to_stop_id)
+        return None if seconds is None else round(seconds / 60)
+
+
+def _paths(out_dir):
+    return out_dir / f"{MATRIX_NAME}.npy", out_dir / f"{MATRIX_NAME}.json"
+
+
+def _source_stats(gtfs_dir):
+    stats = []
+    for name in TIMETABLE_FILES:
+        path = gtfs_dir / name
+        if path.exists():
+            stat = path.stat()
+            stats.append([name, stat.st_mtime_ns, stat.st_size])
+    return stats
+
+
+def _replace(path, write):
+    tmp_path = path.with_suffix(f".tmp{os.getpid()}")
+    try:
+        with tmp_path.open("wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def build_travel_matrix(gtfs_dir=GTFS_DIR, out_dir=None):
+    """
+    Compute the matrix from the (compiled) timetable and save it.
+    Returns the TravelMatrix; it is still returned if the directory is
+    read-only, just not saved.
+    """
+    gtfs_dir = Path(gtfs_dir)
+    out_dir = Path(out_dir) if out_dir is not None else gtfs_dir / ".compiled"
+    station_ids, seconds = compute_travel_times(load_timetable(gtfs_dir))
+    times = np.where(np.isfinite(seconds), np.clip(seconds, 0, UNREACHABLE - 1), UNREACHABLE).astype(np.uint16)
+    meta = {"version": MATRIX_VERSION, "stats": _source_stats(gtfs_dir), "stations": station_ids}
+    array_path, meta_path = _paths(out_dir)
+    try:
+        out_dir.mkdir(parents=True, exist_ok=True)
+        _replace(array_path, lambda f: np.save(f, times))
+        _replace(meta_path, lambda f: f.write(json.dumps(meta).encode()))
+    except OSError:
+        pass
+    return TravelMatrix(times, station_ids)
+
+
+_loaded = {}
+
+
+def load_travel_matrix(gtfs_dir=GTFS_DIR, out_dir=None, build=True):
+    """
+    Return the TravelMatrix for `gtfs_dir`, memory-mapping the saved array,
+    and building it first if it is missing or the GTFS files have changed
+    (or, with build=False, returning None instead). Memoised for the life
+    of the process.
+    """
+    gtfs_dir = Path(gtfs_dir)
+    out_dir = Path(out_dir) if out_dir is not None else gtfs_dir / ".compiled"
+    stats = _source_stats(gtfs_dir)
+    cached = _loaded.get(out_dir)
+    if cached is not None and cached[0] == stats:
+        return cached[1]
+    array_path, meta_path = _paths(out_dir)
+    try:
+        meta = json.loads(meta_path.read_text())
+        if meta.get("version") != MATRIX_VERSION or meta.get("stats") != stats:
+            raise ValueError("stale")
+        matrix = TravelMatrix(np.load(array_path, mmap_mode="r"), meta["stations"])
+    except (OSError, ValueError):
+        if not build:
+            return None
+        matrix = build_travel_matrix(gtfs_dir, out_dir)
+    _loaded[out_dir] = (stats, matrix)
+    return matrix
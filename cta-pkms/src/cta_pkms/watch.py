@@ -0,0 +1,177 @@
+"""
+`next-arrivals --watch`: a long-running arrivals display.
+
+The process stays up, so the CTA client's connection is reused (or the
+daemon's, when it is running). Polls come sooner when a train is about to
+arrive and back off exponentially on errors. Between polls the screen is
+re-rendered every second for the "due in" column, but only the lines that
+changed are rewritten.
+"""
+import time
+from datetime import datetime, timedelta
+
+from .cta_api import CTAAPIError
+
+MIN_POLL = 15
+MAX_POLL = 60
+MAX_BACKOFF = 300
+TICK = 1.0
+
+
+def seconds_until(arrival_time, now):
+    "Seconds from `now` (a datetime) to an arrival_time like '2025-11-19T08:05:10'; None if unparseable."
+    try:
+        return (datetime.fromisoformat(str(arrival_time)) - now).total_seconds()
+    except ValueError:
+        return None
+
+
+def poll_interval(arrivals, now, errors=0):
+    """
+    Seconds to wait before the next poll: MIN_POLL doubled per consecutive
+    error (up to MAX_BACKOFF), otherwise half the time until the next train,
+    kept between MIN_POLL and MAX_POLL.
+    """
+    if errors:
+        return min(MIN_POLL * 2 ** errors, MAX_BACKOFF)
+    due = [s for s in (seconds_until(arr.get("arrival_time"), now) for arr in arrivals) if s is not None]
+    if not due:
+        return MAX_POLL
+    return max(MIN_POLL, min(MAX_POLL, min(due) / 2))
+
+
+def format_due(seconds):
+    if seconds is None:
+        return ""
+    if seconds < 60:
+        return "Due"
+    return f"{int(seconds // 60)} min"
+
+
+class Screen:
+    """
+    Keeps what is on the terminal and rewrites only the lines that differ.
+    Without a terminal, each changed frame is printed whole instead.
+    """
+
+    def __init__(self, out, ansi=True):
+        self.out = out
+        self.ansi = ansi
+        self.lines = None
+        self.bytes_written = 0
+        self.lines_written = 0
+
+    def write(self, text):
+        self.out.write(text)
+        self.bytes_written += len(text)
+
+    def draw(self, lines):
+        if lines == self.lines:
+            return
+        if not self.ansi:
+            self.write("\n".join(lines) + "\n\n")
+            self.lines_written += len(lines)
+        else:
+            if self.lines is None:
+                self.write("\x1b[2J")
+                previous = []
+            else:
+                previous = self.lines
+            for row, line in enumerate(lines):
+                if row >= len(previous) or previous[row] != line:
+                    self.write(f"\x1b[{row + 1};1H{line}\x1b[K")
+                    self.lines_written += 1
+            for row in range(len(lines), len(previous)):
+                self.write(f"\x1b[{row + 1};1H\x1b[K")
+            self.write(f"\x1b[{len(lines) + 1};1H")
+        self.out.flush()
+        self.lines = list(lines)
+
+
+class Watcher:
+    """
+    Polls `fetch()` for arrivals and draws them on a Screen, one row per
+    arrival as formatted by `describe(arrival)`. `clock` gives
+    the time for polling (monotonic seconds), `now` the wall clock the
+    arrival times are compared with, and `sleep` waits; all three can be
+    replaced in tests.
+    """
+
+    def __init__(self, fetch, station_name, describe, screen, clock=time.monotonic, now=datetime.now,
+                 sleep=time.sleep):
+        self.fetch = fetch
+        self.station_name = station_name
+        self.describe = describe
+        self.screen = screen
+        self.clock = clock
+        self.now = now
+        self.sleep = sleep
+        self.arrivals = []
+        self.error = None
+        self.errors = 0  # consecutive
+        self.requests = 0
+        self.failures = 0
+        self.updated = None
+        self.next_poll = None
+        self.retry_at = None
+        self.started = clock()
+        self.cpu_started = time.process_time()
+
+    def poll(self):
+        self.requests += 1
+        try:
+            self.arrivals = self.fetch()
+            self.error = None
+            self.errors = 0
+            self.updated = self.now()
+        except CTAAPIError as e:
+            self.error = e
+            self.errors += 1
+            self.failures += 1
+        interval = poll_interval(self.arrivals, self.now(), self.errors)
+        self.next_poll = self.clock() + interval
+        # a fixed time rather than a countdown, so the line doesn't change every tick
+        self.retry_at = self.now() + timedelta(seconds=interval)
+
+    def render(self):
+        now = self.now()
+        lines = [f"Next {len(self.arrivals)} arrivals at {self.station_name}:"]
+        for i, arr in enumerate(self.arrivals, 1):
+            due = format_due(seconds_until(arr.get("arrival_time"), now))
+            lines.append(f"{i}. {self.describe(arr)}" + (f" | {due}" if due else ""))
+        if not self.arrivals:
+            lines.append("No arrivals found.")
+        status = f"Updated {self.updated:%H:%M:%S}" if self.updated else "Not updated yet"
+        if self.error is not None:
+            status += f" | Error: {self.error} (retrying at {self.retry_at:%H:%M:%S})"
+        lines.append(status)
+        return lines
+
+    def run(self, max_polls=None):
+        "Poll and redraw until interrupted (or after max_polls polls)."
+        while True:
+            if self.next_poll is None or self.clock() >= self.next_poll:
+                if max_polls is not None and self.requests >= max_polls:
+                    return
+                self.poll()
+            self.screen.draw(self.render())
+            self.sleep(max(0.0, min(TICK, self.next_poll - self.clock())))
+
+    def stats(self):
+        elapsed = self.clock() - self.started
+        cpu = time.process_time() - self.cpu_started
+        return {
+            "seconds": elapsed,
+            "requests": self.requests,
+            "errors": self.failures,
+            "cpu_seconds": cpu,
+            "lines_written": self.screen.lines_written,
+            "bytes_written": self.screen.bytes_written,
+        }
+
+    def summary(self):
+        stats = self.stats()
+        share = stats["cpu_seconds"] / stats["seconds"] * 100 if stats["seconds"] > 0 else 0.0
+        return (f"Watched for {stats['seconds']:.0f}s: {stats['requests']} requests ({stats['errors']} failed), "
+                f"{stats['lines_written']} lines redrawn ({stats['bytes_written']} bytes), "
+                f"{stats['cpu_seconds']:.2f}s CPU ({share:.2f}%)")
@@ -0,0 +1,84 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+class StubCTAServer:
+    """
+    Local HTTP server standing in for lapi.transitchicago.com.
+    Queue responses per path with `respond`; the last one queued for a path
+    is repeated once the queue runs dry.
+    """
+
+    def __init__(self):
+        self.responses = {}
+        self.requests = []
+        self.connections = set()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                path = url.path.rsplit("/", 1)[-1]
+                stub.requests.append((path, {k: v[0] for k, v in parse_qs(url.query).items()}))
+                stub.connections.add(self.client_address)
+                queue = stub.responses.get(path) or [(404, {}, 0)]
+                status, body, delay = queue.pop(0) if len(queue) > 1 else queue[0]
+                if delay:
+                    time.sleep(delay)
+                payload = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up (timeout tests).
+                    self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api/1.0"
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05},
+                                       daemon=True)
+
+    def respond(self, path, body, status=200, delay=0):
+        self.responses.setdefault(path, []).append((status, body, delay))
+
+    def count(self, path):
+        return sum(1 for p, _ in self.requests if p == path)
+
+@pytest.fixture(autouse=True)
+def isolated_caches(tmp_path, monkeypatch):
+    import src.cta_pkms.__init__ as cta
+    import src.cta_pkms.cache as cache
+    import src.cta_pkms.planner as planner
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(cache, "BACKGROUND_REFRESH", False)
+    monkeypatch.setattr(planner, "_plan_cache", None)
+    monkeypatch.setattr(cta, "_openai_clients", {})
+    monkeypatch.setattr(cta, "RECORD_DIR", tmp_path / "recordings")
+
+@pytest.fixture
+def cta_stub():
+    stub = StubCTAServer()
+    stub.thread.start()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
+
+@pytest.fixture
+def cta_client(cta_stub, monkeypatch):
+    import src.cta_pkms.cta_api as cta_api
+    client = cta_api.CTAClient(base_url=cta_stub.url, api_key="test-key", backoff=0.01)
+    monkeypatch.setattr(cta_api, "_client", client)
+    yield client
+    client.close()
@@ -0,0 +1,135 @@
+import threading
+import time
+
+import pytest
+
+import src.cta_pkms.cache as cache
+import src.cta_pkms.cta_api as cta_api
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "time", clock.time)
+    return clock
+
+def counter():
+    calls = []
+    def fetch():
+        calls.append(1)
+        return len(calls)
+    return fetch, calls
+
+def test_ttl_hit_and_expiry(clock):
+    fetch, calls = counter()
+    c = cache.TTLCache(ttl=10)
+    assert c.get_or_fetch("k", fetch) == 1
+    clock.now += 5
+    assert c.get_or_fetch("k", fetch) == 1
+    clock.now += 6
+    assert c.get_or_fetch("k", fetch) == 2
+    assert c.stats() == {"hits": 1, "stale_hits": 0, "misses": 2, "entries": 1}
+
+def test_stale_while_revalidate(clock, monkeypatch):
+    monkeypatch.setattr(cache, "BACKGROUND_REFRESH", True)
+    refreshed = threading.Event()
+    values = iter(["old", "new"])
+    def fetch():
+        value = next(values)
+        if value == "new":
+            refreshed.set()
+        return value
+    c = cache.TTLCache(ttl=10, stale_ttl=10)
+    assert c.get_or_fetch("k", fetch) == "old"
+    clock.now += 15
+    assert c.get_or_fetch("k", fetch) == "old"
+    assert refreshed.wait(2)
+    for _ in range(100):
+        if c.get_or_fetch("k", fetch) == "new":
+            break
+        time.sleep(0.01)
+    assert c.get_or_fetch("k", fetch) == "new"
+    assert c.stale_hits == 1
+
+def test_stale_entries_are_refetched_in_line_by_one_shot_commands(clock):
+    values = iter(["old", "new"])
+    c = cache.TTLCache(ttl=10, stale_ttl=10)
+    assert c.get_or_fetch("k", lambda: next(values)) == "old"
+    clock.now += 15
+    assert c.get_or_fetch("k", lambda: next(values)) == "new"
+    clock.now += 15
+    def fail():
+        raise cta_api.CTAAPIError("down")
+    # the stale value is the fallback when the refetch fails
+    assert c.get_or_fetch("k", fail) == "new"
+    assert c.stats() == {"hits": 0, "stale_hits": 1, "misses": 2, "entries": 1}
+
+def test_callers_get_their_own_copy(clock):
+    c = cache.TTLCache(ttl=10)
+    first = c.get_or_fetch("k", lambda: [{"route": "Red"}])
+    first[0]["route"] = "Blue"
+    first.append({})
+    assert c.get_or_fetch("k", lambda: []) == [{"route": "Red"}]
+
+def test_lru_eviction(clock):
+    fetch, calls = counter()
+    c = cache.TTLCache(ttl=10, max_entries=2)
+    c.get_or_fetch("a", fetch)
+    c.get_or_fetch("b", fetch)
+    c.get_or_fetch("a", fetch)
+    c.get_or_fetch("c", fetch)
+    assert c.stats()["entries"] == 2
+    c.get_or_fetch("a", fetch)
+    c.get_or_fetch("b", fetch)
+    assert len(calls) == 4
+
+def test_errors_are_not_cached(clock):
+    c = cache.TTLCache(ttl=10)
+    def fail():
+        raise cta_api.CTAAPIError("down")
+    with pytest.raises(cta_api.CTAAPIError):
+        c.get_or_fetch("k", fail)
+    assert c.get_or_fetch("k", lambda: "ok") == "ok"
+
+def test_disk_cache_is_shared_between_instances(tmp_path, clock):
+    fetch, calls = counter()
+    first = cache.TTLCache(ttl=10, disk=cache.SQLiteStore(tmp_path / "c.sqlite3", table="t"))
+    first.get_or_fetch("k", fetch)
+    second = cache.TTLCache(ttl=10, disk=cache.SQLiteStore(tmp_path / "c.sqlite3", table="t"))
+    assert second.get_or_fetch("k", fetch) == 1
+    assert len(calls) == 1
+
+def test_sqlite_store_evicts_least_recently_used(tmp_path, clock):
+    store = cache.SQLiteStore(tmp_path / "c.sqlite3", max_entries=2)
+    store.set("a", 1)
+    clock.now += 1
+    store.set("b", 2)
+    clock.now += 1
+    store.get("a")
+    clock.now += 1
+    store.set("c", 3)
+    assert len(store) == 2
+    assert store.get("b") is None
+    assert store.get("a") == (1, 1000.0)
+
+def test_client_serves_arrivals_from_cache(cta_stub, clock):
+    cta_stub.respond("ttarrivals.aspx", {"ctatt": {"errCd": "0", "eta": []}})
+    cta_stub.respond("alerts.aspx", {"CTAAlerts": {"ErrorCode": "0", "Alert": []}})
+    client = cta_api.CTAClient(base_url=cta_stub.url, arrivals_cache=cache.TTLCache(ttl=20),
+                               alerts_cache=cache.TTLCache(ttl=300))
+    for _ in range(3):
+        client.arrivals("40380")
+        client.alerts()
+    client.arrivals("40390")
+    assert cta_stub.count("ttarrivals.aspx") == 2
+    assert cta_stub.count("alerts.aspx") == 1
+    assert client.arrivals_cache.stats()["hits"] == 2
+    # another API key doesn't share the cached answer
+    client.arrivals("40380", api_key="other-key")
+    assert cta_stub.count("ttarrivals.aspx") == 3
+    client.close()
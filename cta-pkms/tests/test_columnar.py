@@ -0,0 +1,85 @@
+import importlib.util
+import json
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+import src.cta_pkms.columnar as columnar
+
+def write_table(path):
+    path.mkdir(parents=True)
+    np.save(path / "trip_id.npy", np.array([0, 0, 1], dtype="<i4"))
+    np.save(path / "arrival_time.npy", np.array([28800, 91800, -1], dtype="<i4"))
+    (path / "trip_id.dict.json").write_text(json.dumps(["892701", "892702"]))
+    (path / "_table.json").write_text(json.dumps({"rows": 3, "columns": {
+        "trip_id": {"dtype": "<i4", "encoding": "dict"},
+        "arrival_time": {"dtype": "<i4", "encoding": "time"},
+    }}))
+
+def test_load_table_memory_maps_columns(tmp_path):
+    write_table(tmp_path / "stop_times")
+    table = columnar.load_table("stop_times", tmp_path)
+    assert len(table) == 3
+    assert table.columns == ["trip_id", "arrival_time"]
+    arrivals = table["arrival_time"]
+    assert isinstance(arrivals, np.memmap)
+    assert arrivals.tolist() == [28800, 91800, -1]
+
+def test_dictionary_encode_and_decode(tmp_path):
+    write_table(tmp_path / "stop_times")
+    table = columnar.load_table("stop_times", tmp_path)
+    code = table.encode("trip_id", "892701")
+    assert int((table["trip_id"] == code).sum()) == 2
+    assert table.encode("trip_id", "missing") == -1
+    assert table.decode("trip_id", table["trip_id"]) == ["892701", "892701", "892702"]
+    assert table.decode("trip_id", -1) is None
+    with pytest.raises(ValueError):
+        table.dictionary("arrival_time")
+
+def load_converter():
+    path = Path(__file__).parent.parent / "cta-gtfs" / "tools-for-data" / "json_converter.py"
+    spec = importlib.util.spec_from_file_location("json_converter", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def test_convert_columnar_round_trip(tmp_path, monkeypatch):
+    pytest.importorskip("pandas")
+    converter = load_converter()
+    # small chunks so the columns are written across several of them
+    monkeypatch.setattr(converter, "chunk_size", 2)
+    source = tmp_path / "stop_times.txt"
+    source.write_text(
+        "trip_id,arrival_time,stop_id,stop_sequence,shape_dist_traveled\n"
+        "892701,08:00:00,30001,1,0.5\n"
+        "892701,25:30:00,30002,2,\n"
+        "892702,,30001,,1.25\n"
+    )
+    converter.convert_columnar(source, tmp_path / "columnar")
+    table = columnar.load_table("stop_times", tmp_path / "columnar")
+    assert len(table) == 3
+    assert table.columns == ["trip_id", "arrival_time", "stop_id", "stop_sequence", "shape_dist_traveled"]
+    assert table["arrival_time"].tolist() == [28800, 91800, -1]
+    assert table["stop_sequence"].tolist() == [1, 2, -1]
+    assert table["shape_dist_traveled"][0] == 0.5 and np.isnan(table["shape_dist_traveled"][1])
+    assert table.decode("trip_id", table["trip_id"]) == ["892701", "892701", "892702"]
+    # IDs come back as the original strings
+    assert table.decode("stop_id", table["stop_id"]) == ["30001", "30002", "30001"]
+    assert not list((tmp_path / "columnar" / "stop_times").glob("*.raw"))
+
+def test_convert_columnar_keeps_transfer_seconds(tmp_path):
+    pytest.importorskip("pandas")
+    converter = load_converter()
+    source = tmp_path / "transfers.txt"
+    source.write_text(
+        "from_stop_id,to_stop_id,transfer_type,min_transfer_time\n"
+        "30001,30002,2,180\n"
+        "30002,30001,2,300\n"
+    )
+    converter.convert_columnar(source, tmp_path / "columnar")
+    meta = json.loads((tmp_path / "columnar" / "transfers" / "_table.json").read_text())
+    assert meta["columns"]["min_transfer_time"]["encoding"] == "plain"
+    table = columnar.load_table("transfers", tmp_path / "columnar")
+    assert table["min_transfer_time"].tolist() == [180, 300]
+    assert table["transfer_type"].tolist() == [2, 2]
@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+import pytest
+
+import src.cta_pkms.cta_api as cta_api
+
+ETA = {"rt": "Blue", "destNm": "O'Hare", "arrT": "2025-11-19T08:05:00", "isSch": "0", "isDly": "1", "trainId": "101"}
+
+def test_arrivals_reuse_one_connection(cta_stub, cta_client):
+    cta_stub.respond("ttarrivals.aspx", {"ctatt": {"errCd": "0", "eta": [ETA]}})
+    for _ in range(3):
+        arrivals = cta_client.arrivals("40380")
+    assert arrivals == [{"route": "Blue", "destination": "O'Hare", "arrival_time": "2025-11-19T08:05:00",
+                         "is_scheduled": "0", "is_delayed": "1", "train_id": "101"}]
+    assert cta_stub.count("ttarrivals.aspx") == 3
+    assert len(cta_stub.connections) == 1
+
+def test_empty_result_is_not_an_error(cta_stub, cta_client):
+    cta_stub.respond("ttarrivals.aspx", {"ctatt": {"errCd": "0"}})
+    assert cta_client.arrivals("40380") == []
+
+def test_transient_failures_are_retried(cta_stub, cta_client):
+    cta_stub.respond("alerts.aspx", {}, status=503)
+    cta_stub.respond("alerts.aspx", {"CTAAlerts": {"ErrorCode": "0", "Alert": {"AlertId": "1"}}})
+    assert cta_client.alerts() == [{"AlertId": "1"}]
+    assert cta_stub.count("alerts.aspx") == 2
+
+def test_retries_give_up_with_http_error(cta_stub, cta_client):
+    cta_stub.respond("alerts.aspx", {}, status=500)
+    with pytest.raises(cta_api.CTAHTTPError) as e:
+        cta_client.alerts()
+    assert e.value.status_code == 500
+    assert cta_stub.count("alerts.aspx") == cta_client.retries + 1
+
+def test_client_errors_are_not_retried(cta_stub, cta_client):
+    cta_stub.respond("ttarrivals.aspx", {}, status=400)
+    with pytest.raises(cta_api.CTAHTTPError):
+        cta_client.arrivals("40380")
+    assert cta_stub.count("ttarrivals.aspx") == 1
+
+def test_api_error_code_raises(cta_stub, cta_client):
+    cta_stub.respond("ttarrivals.aspx", {"ctatt": {"errCd": "101", "errNm": "Invalid API key"}})
+    with pytest.raises(cta_api.CTAResponseError, match="Invalid API key"):
+        cta_client.arrivals("40380")
+
+def test_latency_budget_bounds_retries(cta_stub):
+    cta_stub.respond("alerts.aspx", {}, delay=0.3)
+    client = cta_api.CTAClient(base_url=cta_stub.url, timeout=0.1, latency_budget=0.25, backoff=0.01)
+    with pytest.raises(cta_api.CTATimeoutError):
+        client.alerts()
+    client.close()
+
+def test_connection_refused(cta_stub):
+    client = cta_api.CTAClient(base_url="http://127.0.0.1:9/api", retries=1, backoff=0.01)
+    with pytest.raises(cta_api.CTAAPIError):
+        client.alerts()
+
+def test_fetch_arrivals_many_runs_concurrently(cta_stub, cta_client):
+    cta_stub.respond("ttarrivals.aspx", {"ctatt": {"errCd": "0", "eta": [ETA]}}, delay=0.2)
+    cta_stub.respond("alerts.aspx", {"CTAAlerts": {"ErrorCode": "0", "Alert": [{"AlertId": "1"}]}}, delay=0.2)
+    started = time.perf_counter()
+    arrivals, alerts = asyncio.run(cta_api.fetch_arrivals_many(["1", "2", "3", "4", "5", 6, "1"]))
+    assert time.perf_counter() - started < 0.6
+    assert sorted(arrivals) == ["1", "2", "3", "4", "5", "6"]
+    assert all(result[0]["train_id"] == "101" for result in arrivals.values())
+    assert alerts == [{"AlertId": "1"}]
+    assert cta_stub.count("ttarrivals.aspx") == 6
+
+def test_fetch_arrivals_many_keeps_errors_per_station(cta_stub, cta_client):
+    cta_stub.respond("ttarrivals.aspx", {"ctatt": {"errCd": "102", "errNm": "Invalid mapid"}})
+    cta_stub.respond("alerts.aspx", {"CTAAlerts": {"ErrorCode": "0"}})
+    arrivals, alerts = asyncio.run(cta_api.fetch_arrivals_many(["1"], concurrency=1, timeout=5))
+    assert isinstance(arrivals["1"], cta_api.CTAResponseError)
+    assert alerts == []
+
+def test_fetch_arrivals_many_sizes_the_pool_to_the_concurrency(cta_stub, cta_client):
+    cta_stub.respond("ttarrivals.aspx", {"ctatt": {"errCd": "0", "eta": [ETA]}}, delay=0.1)
+    stop_ids = [str(i) for i in range(16)]
+    for _ in range(2):
+        arrivals, _ = asyncio.run(cta_api.fetch_arrivals_many(stop_ids, concurrency=16, alerts=False))
+        assert all(isinstance(result, list) for result in arrivals.values())
+    assert cta_client.pool_size == 16
+    # the second round reuses the first round's connections
+    assert len(cta_stub.connections) == 16
+
+def test_fetch_arrivals_many_timeout_is_the_call_budget(cta_stub, cta_client):
+    cta_stub.respond("ttarrivals.aspx", {"ctatt": {"errCd": "0", "eta": [ETA]}}, delay=0.5)
+    started = time.perf_counter()
+    arrivals, _ = asyncio.run(cta_api.fetch_arrivals_many(["1"], timeout=0.2, alerts=False))
+    assert time.perf_counter() - started < 0.45
+    assert isinstance(arrivals["1"], cta_api.CTATimeoutError)
+
+def test_fetch_arrivals_many_wraps_unexpected_errors(cta_stub, cta_client, monkeypatch):
+    cta_stub.respond("ttarrivals.aspx", {"ctatt": {"errCd": "0", "eta": [ETA]}})
+    fetch = cta_client.arrivals
+
+    def arrivals(stop_id, **kwargs):
+        if stop_id == "2":
+            raise KeyError("eta")
+        return fetch(stop_id, **kwargs)
+
+    monkeypatch.setattr(cta_client, "arrivals", arrivals)
+    arrivals, _ = asyncio.run(cta_api.fetch_arrivals_many(["1", "2"], alerts=False))
+    assert arrivals["1"][0]["train_id"] == "101"
+    assert isinstance(arrivals["2"], cta_api.CTAAPIError)
+    assert isinstance(arrivals["2"].__cause__, KeyError)
@@ -18,28 +18,21 @@ def test_load_and_save_json(tmp_path):
     loaded = cta.load_json(file_path)
     assert loaded == data
 
-@patch("requests.get")
-def test_fetch_next_arrivals_success(mock_get):
-    mock_resp = MagicMock()
-    mock_resp.json.return_value = {
-        "ctatt": {"eta": [{"rt": "Red", "destNm": "Howard", "arrT": "12:00", "isSch": "1", "isDly": "0", "trainId": "123"}]}
-    }
-    mock_resp.raise_for_status.return_value = None
-    mock_get.return_value = mock_resp
+def test_fetch_next_arrivals_success(cta_stub, cta_client):
+    cta_stub.respond("ttarrivals.aspx", {
+        "ctatt": {"errCd": "0", "eta": [{"rt": "Red", "destNm": "Howard", "arrT": "12:00", "isSch": "1", "isDly": "0", "trainId": "123"}]}
+    })
     arrivals = cta.fetch_next_arrivals("40320")
     assert arrivals[0]["route"] == "Red"
     assert arrivals[0]["destination"] == "Howard"
+    assert cta_stub.requests[0][1]["mapid"] == "40320"
 
-@patch("requests.get")
-def test_fetch_cta_alerts_success(mock_get):
-    mock_resp = MagicMock()
-    mock_resp.json.return_value = {"CTAAlerts": {"Alert": [{"alert": "Test"}]}}
-    mock_resp.raise_for_status.return_value = None
-    mock_get.return_value = mock_resp
+def test_fetch_cta_alerts_success(cta_stub, cta_client):
+    cta_stub.respond("alerts.aspx", {"CTAAlerts": {"ErrorCode": "0", "Alert": [{"alert": "Test"}]}})
     alerts = cta.fetch_cta_alerts()
     assert alerts[0]["alert"] == "Test"
 
-@patch("src.cta_pkms.__init__.OpenAI")
+@patch("openai.OpenAI")
 def test_call_openai_route_planner_success(mock_openai):
     mock_client = MagicMock()
     mock_completion = MagicMock()
@@ -65,3 +58,19 @@ def test_select_commute(monkeypatch, tmp_path):
     departure, arrival = cta.select_commute()
     assert departure["stop_name"] == "A"
     assert arrival["stop_name"] == "B"
+
+def test_commute_board(monkeypatch, tmp_path, cta_stub, cta_client):
+    from typer.testing import CliRunner
+    commutes = [
+        {"name": "Work", "departure_station": "A", "departure_stop_id": "1", "arrival_station": "B", "arrival_stop_id": "2"}
+    ]
+    file_path = tmp_path / "commutes.json"
+    file_path.write_text(json.dumps(commutes))
+    monkeypatch.setattr(cta, "COMMUTES_FILE", file_path)
+    cta_stub.respond("ttarrivals.aspx", {"ctatt": {"errCd": "0", "eta": [{"rt": "Red", "destNm": "Howard", "arrT": "12:00", "isDly": "1"}]}})
+    cta_stub.respond("alerts.aspx", {}, status=404)
+    result = CliRunner().invoke(cta.app, ["commute-board"])
+    assert "Work" in result.output
+    assert "Route: Red | Destination: Howard | Arrival Time: 12:00 | Delayed" in result.output
+    assert "Error fetching alerts" in result.output
+    assert "Fetched 2 stations" in result.output
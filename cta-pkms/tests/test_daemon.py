@@ -0,0 +1,182 @@
+import json
+import socket
+import threading
+from unittest.mock import patch
+
+import pytest
+from typer.testing import CliRunner
+
+import src.cta_pkms.__init__ as cta
+import src.cta_pkms.daemon as daemon
+from src.cta_pkms.cta_api import CTAHTTPError
+
+from test_planner import chunk
+
+ETA = {"ctatt": {"errCd": "0", "eta": [{"rt": "Red", "destNm": "Howard", "arrT": "12:00", "isDly": "0"}]}}
+
+
+@pytest.fixture
+def serve():
+    "Start a daemon thread with the given handlers on the default socket path."
+    servers = []
+
+    def start(handlers):
+        server = daemon.make_server(handlers)
+        thread = threading.Thread(target=daemon.serve_forever, args=(server,), daemon=True)
+        thread.start()
+        servers.append((server, thread))
+    yield start
+    daemon.reset_client()
+    for server, thread in servers:
+        server.shutdown()
+        thread.join()
+
+
+@pytest.fixture
+def served(tmp_path, monkeypatch):
+    """
+    Run the daemon in a thread on the default socket path, and yield the
+    methods it is asked for.
+    """
+    monkeypatch.setattr(cta, "TASKS_FILE", tmp_path / "tasks.json")
+    monkeypatch.setattr(cta, "COMMUTES_FILE", tmp_path / "commutes.json")
+    calls = []
+    handlers = {}
+    for method, handler in cta.daemon_handlers().items():
+        def record(params, emit, method=method, handler=handler):
+            calls.append(method)
+            return handler(params, emit)
+        handlers[method] = record
+    server = daemon.make_server(handlers)
+    thread = threading.Thread(target=daemon.serve_forever, args=(server,), daemon=True)
+    thread.start()
+    yield calls
+    daemon.reset_client()
+    server.shutdown()
+    thread.join()
+    assert not daemon.socket_path().exists()
+
+
+def test_arrivals_and_alerts_are_forwarded(served, cta_stub, cta_client):
+    cta_stub.respond("ttarrivals.aspx", ETA)
+    cta_stub.respond("alerts.aspx", {"CTAAlerts": {"ErrorCode": "0", "Alert": [{"alert": "Test"}]}})
+    assert cta.fetch_next_arrivals("40320")[0]["route"] == "Red"
+    assert cta.fetch_cta_alerts()[0]["alert"] == "Test"
+    assert served == ["arrivals", "alerts"]
+
+
+def test_errors_keep_their_type(served, cta_stub, cta_client):
+    cta_stub.respond("ttarrivals.aspx", {}, status=503)
+    with pytest.raises(CTAHTTPError) as raised:
+        cta.fetch_next_arrivals("40320")
+    assert raised.value.status_code == 503
+    with pytest.raises(daemon.DaemonError):
+        daemon.daemon_client().call("no-such-method")
+
+
+def test_unsent_requests_run_locally(served):
+    client = daemon.daemon_client()
+    client._sock.shutdown(socket.SHUT_WR)
+    assert daemon.forward("alerts", lambda: "local") == "local"
+    assert served == []
+    # the broken connection was dropped
+    assert daemon.daemon_client() is not client
+
+
+def test_sent_requests_are_not_run_twice(serve):
+    applied = []
+
+    def add_then_die(params, emit):
+        applied.append(params)
+        raise BrokenPipeError  # the handler drops the connection without answering
+    serve({"add_task": add_then_die})
+    local = []
+    with pytest.raises(daemon.DaemonDisconnected):
+        daemon.forward("add_task", lambda: local.append(1), name="Groceries")
+    assert applied == [{"name": "Groceries"}] and local == []
+
+
+def test_timed_out_requests_are_not_run_twice(serve, monkeypatch):
+    monkeypatch.setattr(daemon, "CALL_TIMEOUT", 0.1)
+    done = threading.Event()
+    serve({"plan": lambda params, emit: done.wait(5)})
+    local = []
+    with pytest.raises(daemon.DaemonDisconnected):
+        daemon.forward("plan", lambda: local.append(1))
+    done.set()
+    assert local == []
+
+
+def test_task_commands_run_in_the_daemon(served):
+    runner = CliRunner()
+    runner.invoke(cta.app, ["add-task", "Groceries", "milk near Belmont"])
+    runner.invoke(cta.app, ["batch"], input='{"op": "add", "name": "Library"}\n')
+    result = runner.invoke(cta.app, ["list-tasks"])
+    assert "1. Groceries" in result.output and "2. Library" in result.output
+    result = runner.invoke(cta.app, ["search-tasks", "belm"])
+    assert "1. Groceries" in result.output
+    assert served == ["store"] * 3  # add, list, search; batch ran locally
+
+
+def test_concurrent_adds_are_not_lost(served):
+    stores = [cta.get_task_store() for _ in range(8)]
+    threads = [threading.Thread(target=store.add_task, args=({"name": f"t{i}", "status": "pending"},))
+               for i, store in enumerate(stores)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cta.get_task_store(forward=False).count_tasks() == 8
+
+
+def test_store_calls_use_the_callers_files(served, tmp_path):
+    client = daemon.daemon_client()
+    elsewhere = tmp_path / "elsewhere"
+    elsewhere.mkdir()
+    config = {"backend": "json", "tasks_file": str(elsewhere / "tasks.json"),
+              "commutes_file": str(elsewhere / "commutes.json"), "db": str(elsewhere / "tasks.sqlite3")}
+    daemon.RemoteTaskStore(client, config).add_task({"name": "theirs", "status": "pending"})
+    daemon.RemoteTaskStore(client, {**config, "backend": "sqlite"}).add_task({"name": "in sqlite", "status": "pending"})
+    assert [task["name"] for task in cta.open_task_store(config).list_tasks()] == ["theirs"]
+    assert cta.SQLiteTaskStore(elsewhere / "tasks.sqlite3").count_tasks() == 1
+    assert cta.get_task_store(forward=False).count_tasks() == 0
+
+
+class FakeIndex:
+    def get(self, stop_id):
+        return {"stop_id": stop_id, "stop_name": "Belmont"}
+
+    def routes_for(self, stop_id):
+        return ["Red"]
+
+
+@patch("openai.OpenAI")
+def test_plan_streams_through_the_daemon(mock_openai, served, cta_stub, cta_client, monkeypatch):
+    mock_openai.return_value.chat.completions.create.return_value = iter([chunk("Red "), chunk("Line")])
+    cta_stub.respond("ttarrivals.aspx", ETA)
+    cta_stub.respond("alerts.aspx", {}, status=404)
+    cta.COMMUTES_FILE.write_text(json.dumps([{"name": "Work", "departure_station": "A", "departure_stop_id": "1",
+                                              "arrival_station": "B", "arrival_stop_id": "2"}]))
+    monkeypatch.setattr(cta, "load_station_index", lambda: FakeIndex())
+    monkeypatch.setattr("typer.prompt", lambda *args, **kwargs: 1)
+    result = CliRunner().invoke(cta.app, ["plan-commute"])
+    assert "Warning: service alerts unavailable" in result.output
+    assert "--- Commute Plan ---\nRed Line\n(first token after" in result.output
+    assert served == ["store", "plan"]
+
+
+def test_without_a_daemon_commands_run_locally(tmp_path, monkeypatch, cta_stub, cta_client):
+    # a socket file left behind by a daemon that was killed
+    path = daemon.socket_path()
+    path.parent.mkdir(parents=True)
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(str(path))
+    stale.close()
+    assert daemon.daemon_client() is None
+    cta_stub.respond("ttarrivals.aspx", ETA)
+    assert cta.fetch_next_arrivals("40320")[0]["route"] == "Red"
+
+    server = daemon.make_server({})  # replaces the stale socket
+    server.server_close()
+    monkeypatch.setenv("CTA_PKMS_DAEMON", "0")
+    assert daemon.daemon_client() is None
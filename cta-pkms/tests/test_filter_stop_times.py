@@ -0,0 +1,85 @@
+import importlib
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+TOOLS_DIR = Path(__file__).parent.parent / "cta-gtfs" / "tools-for-data"
+
+@pytest.fixture
+def filter_module(monkeypatch):
+    # imported by name rather than from its path, so the pool's worker
+    # processes can find scan_chunk too
+    monkeypatch.syspath_prepend(str(TOOLS_DIR))
+    monkeypatch.delitem(sys.modules, "filter_stop_times", raising=False)
+    return importlib.import_module("filter_stop_times")
+
+def single_pass(path, prefixes):
+    "The filter before it was chunked: decode every line and keep the matches."
+    kept = []
+    for line in path.read_text().splitlines():
+        try:
+            trip_id = str(json.loads(line).get("trip_id", ""))
+        except Exception:
+            continue
+        if trip_id.startswith(prefixes):
+            kept.append(line + "\n")
+    return "".join(kept)
+
+def write_stop_times(path, count=200):
+    rows = []
+    for i in range(count):
+        trip_id = f"8927{i:05d}" if i % 3 else f"1{i:05d}"
+        # varying lengths, so the chunk boundaries land in the middle of records
+        rows.append({"trip_id": trip_id, "stop_id": str(30000 + i), "stop_sequence": i,
+                     "stop_headsign": "Howard" * (i % 7)})
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+
+def test_chunks_cover_the_file_on_line_boundaries(filter_module, tmp_path):
+    path = tmp_path / "stop_times.jsonl"
+    write_stop_times(path)
+    data = path.read_bytes()
+    for count in (1, 2, 7, 64, len(data) * 2):
+        chunks = filter_module.split_chunks(path, count)
+        assert chunks[0][0] == 0 and chunks[-1][1] == len(data)
+        assert all(end == next_start for (_, end), (next_start, _) in zip(chunks, chunks[1:]))
+        assert all(data[start - 1:start] == b"\n" for start, _ in chunks[1:])
+        assert len(chunks) <= count
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_chunked_filter_matches_a_single_pass(filter_module, tmp_path, monkeypatch, workers):
+    source, output = tmp_path / "stop_times.jsonl", tmp_path / "filtered.jsonl"
+    write_stop_times(source)
+    # chunks of about 100 bytes, so most records span a boundary
+    monkeypatch.setattr(filter_module, "MAX_CHUNK_BYTES", 100)
+    rows, matched = filter_module.filter_stop_times(source, output, workers=workers)
+    expected = single_pass(source, ("8927",))
+    assert output.read_text() == expected
+    assert (rows, matched) == (200, expected.count("\n"))
+    assert not list(tmp_path.glob("*.part*"))
+
+def test_trip_id_list(filter_module, tmp_path):
+    source, output = tmp_path / "stop_times.jsonl", tmp_path / "filtered.jsonl"
+    write_stop_times(source, count=20)
+    filter_module.filter_stop_times(source, output, trip_ids={"892700001", "100000", "missing"}, workers=1)
+    assert [json.loads(line)["trip_id"] for line in output.read_text().splitlines()] == ["100000", "892700001"]
+
+def test_byte_precheck_keeps_every_layout(filter_module, tmp_path):
+    source, output = tmp_path / "stop_times.jsonl", tmp_path / "filtered.jsonl"
+    source.write_text("\n".join([
+        '{"trip_id":"892701","stop_id":"1"}',     # pandas
+        '{"trip_id": "892702", "stop_id": "2"}',  # json.dumps
+        '{"trip_id" : "892703"}',
+        '{"stop_id": "4",\t"trip_id":\t"892704"}',
+        '{"trip_id": 892705}',
+        '{"trip_id": "8928", "stop_headsign": "\\"trip_id\\": \\"8927"}',
+        '{"trip_id": "18927"}',
+        'not json "trip_id": "8927"',
+        '{"stop_id": "8927"}',
+        '{"trip_id": "892706"}',                  # last line, no newline
+    ]))
+    filter_module.filter_stop_times(source, output, workers=1)
+    assert output.read_text() == single_pass(source, ("8927",))
+    assert [str(json.loads(line)["trip_id"]) for line in output.read_text().splitlines()] == [
+        "892701", "892702", "892703", "892704", "892705", "892706"]
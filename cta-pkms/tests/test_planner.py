@@ -0,0 +1,145 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from typer.testing import CliRunner
+
+import src.cta_pkms.__init__ as cta
+import src.cta_pkms.planner as planner
+
+DEPARTURE = {"stop_name": "A", "stop_id": "1"}
+ARRIVAL = {"stop_name": "B", "stop_id": "2"}
+
+def arrival_at(time_str):
+    return [{"route": "Red", "destination": "Howard", "arrival_time": time_str, "is_delayed": "0"}]
+
+def mock_client(content="Take the Red Line", delay=0):
+    client = MagicMock()
+    completion = MagicMock()
+    completion.choices = [MagicMock()]
+    completion.choices[0].message.content = content
+    def create(**kwargs):
+        time.sleep(delay)
+        return completion
+    client.chat.completions.create.side_effect = create
+    return client
+
+@patch("openai.OpenAI")
+def test_identical_plans_within_a_minute_are_cached(mock_openai):
+    client = mock_openai.return_value = mock_client()
+    first = cta.call_openai_route_planner(DEPARTURE, ARRIVAL, arrival_at("2025-11-19T08:05:10"), [{"AlertId": "7"}])
+    second = cta.call_openai_route_planner(DEPARTURE, ARRIVAL, arrival_at("2025-11-19T08:05:45"), [{"AlertId": "7"}])
+    assert first == second == "Take the Red Line"
+    assert client.chat.completions.create.call_count == 1
+    cta.call_openai_route_planner(DEPARTURE, ARRIVAL, arrival_at("2025-11-19T08:05:45"), [{"AlertId": "8"}])
+    assert client.chat.completions.create.call_count == 2
+    assert mock_openai.call_count == 1
+
+@patch("openai.OpenAI")
+def test_concurrent_identical_requests_share_one_call(mock_openai):
+    client = mock_openai.return_value = mock_client(delay=0.2)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(
+            cta.call_openai_route_planner(DEPARTURE, ARRIVAL, [], [])))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["Take the Red Line"] * 5
+    assert client.chat.completions.create.call_count == 1
+
+@patch("openai.OpenAI")
+def test_failed_calls_are_not_cached(mock_openai):
+    client = mock_openai.return_value = mock_client()
+    client.chat.completions.create.side_effect = RuntimeError("rate limited")
+    assert cta.call_openai_route_planner(DEPARTURE, ARRIVAL, [], []) == "Could not get route recommendation (rate limited)."
+    client.chat.completions.create.side_effect = None
+    client.chat.completions.create.return_value.choices[0].message.content = "Retry worked"
+    assert cta.call_openai_route_planner(DEPARTURE, ARRIVAL, [], []) == "Retry worked"
+
+def test_cache_key_normalisation():
+    key = planner.planner_cache_key(DEPARTURE, ARRIVAL, arrival_at("2025-11-19T08:05:10"), [{"AlertId": "1"}, {"AlertId": "2"}])
+    assert key == planner.planner_cache_key(
+        {"stop_name": "Renamed", "stop_id": 1}, ARRIVAL, arrival_at("2025-11-19T08:05:59"), [{"AlertId": "2"}, {"AlertId": "1"}])
+    assert key != planner.planner_cache_key(DEPARTURE, ARRIVAL, arrival_at("2025-11-19T08:06:00"), [{"AlertId": "1"}, {"AlertId": "2"}])
+
+ALERTS = [
+    {"AlertId": "1", "Headline": "Red Line delays", "ShortDescription": "Slow zone", "FullDescription": {"#cdata-section": "x" * 2000},
+     "ImpactedService": {"Service": [{"ServiceType": "R", "ServiceId": "Red", "ServiceName": "Red Line"}]}},
+    {"AlertId": "2", "Headline": "Bus reroute", "FullDescription": {"#cdata-section": "y" * 2000},
+     "ImpactedService": {"Service": [{"ServiceType": "B", "ServiceId": "22"}]}},
+    {"AlertId": "3", "Headline": "Purple Express", "ImpactedService": {"Service": {"ServiceType": "R", "ServiceId": "Pexp"}}},
+    {"AlertId": "4", "Headline": "Elevator out at B", "ImpactedService": {"Service": [{"ServiceType": "T", "ServiceId": "2"}]}},
+    {"AlertId": "5", "Headline": "Blue Line work", "ImpactedService": {"Service": [{"ServiceType": "R", "ServiceId": "Blue"}]}},
+]
+
+class FakeIndex:
+    def routes_for(self, stop_id):
+        return {"1": ["Red"], "2": ["Red", "P"]}.get(stop_id, [])
+
+def test_reduce_planner_inputs_keeps_relevant_alerts():
+    arrivals = [{"route": "Red", "destination": "Howard", "arrival_time": "2025-11-19T08:05:00",
+                 "is_scheduled": "0", "is_delayed": "1", "train_id": "900"}]
+    kept_arrivals, kept_alerts, report = planner.reduce_planner_inputs(DEPARTURE, ARRIVAL, arrivals, ALERTS, FakeIndex())
+    assert [a["AlertId"] for a in kept_alerts] == ["1", "3", "4"]
+    assert "FullDescription" not in kept_alerts[0]
+    assert kept_arrivals == [{"route": "Red", "to": "Howard", "at": "08:05", "delayed": True}]
+    assert report["alerts_total"] == 5 and report["alerts_kept"] == 3
+    assert report["tokens_after"] < report["tokens_before"] / 4
+
+def test_compact_inputs_share_cache_key_with_full_inputs():
+    full = arrival_at("2025-11-19T08:05:10")
+    compact = [planner.compact_arrival(arr) for arr in full]
+    assert planner.planner_cache_key(DEPARTURE, ARRIVAL, full, []) == planner.planner_cache_key(DEPARTURE, ARRIVAL, compact, [])
+
+def chunk(text):
+    part = MagicMock()
+    part.choices = [MagicMock()]
+    part.choices[0].delta.content = text
+    return part
+
+def test_stream_completion_passes_tokens_through():
+    client = MagicMock()
+    client.chat.completions.create.return_value = iter([chunk("Take "), chunk(None), chunk("the Red Line")])
+    tokens = []
+    text, first_token = planner.stream_completion(client, "m", [], tokens.append)
+    assert text == "Take the Red Line"
+    assert tokens == ["Take ", "the Red Line"]
+    assert first_token is not None and first_token >= 0
+    assert client.chat.completions.create.call_args.kwargs["stream"] is True
+
+def test_stream_completion_degrades_without_streaming():
+    tokens = []
+    text, _ = planner.stream_completion(mock_client("Whole answer"), "m", [], tokens.append)
+    assert text == "Whole answer"
+    assert tokens == ["Whole answer"]
+
+@patch("openai.OpenAI")
+def test_route_planner_streams_and_returns_text(mock_openai):
+    mock_openai.return_value.chat.completions.create.return_value = iter([chunk("Red "), chunk("Line")])
+    tokens = []
+    result = cta.call_openai_route_planner(DEPARTURE, ARRIVAL, [], [], on_token=tokens.append)
+    assert result == "Red Line"
+    assert tokens == ["Red ", "Line"]
+
+@patch("openai.OpenAI")
+def test_plan_commute_reports_a_stream_that_fails_part_way(mock_openai, monkeypatch):
+    def stream():
+        yield chunk("Take the ")
+        raise RuntimeError("connection reset")
+
+    mock_openai.return_value.chat.completions.create.return_value = stream()
+    monkeypatch.setattr(cta, "select_commute", lambda: (DEPARTURE, ARRIVAL))
+    monkeypatch.setattr(cta, "fetch_next_arrivals", lambda stop_id: [])
+    monkeypatch.setattr(cta, "fetch_cta_alerts", lambda: [])
+    monkeypatch.setattr(cta, "scheduled_minutes", lambda pairs: [None])
+    monkeypatch.setattr(cta, "alternative_arrivals", lambda stop_id: [])
+    monkeypatch.setattr(cta, "load_station_index", lambda: type("Index", (), {"routes_for": lambda self, stop_id: ["Red"]})())
+    monkeypatch.setattr(cta.daemon, "daemon_client", lambda: None)
+    result = CliRunner().invoke(cta.app, ["plan-commute"])
+    assert result.exit_code == 0, result.output
+    assert "Take the \nCould not get route recommendation (connection reset).\n" in result.output
+    assert "first token after" not in result.output
@@ -0,0 +1,131 @@
+import json
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from typer.testing import CliRunner
+
+import src.cta_pkms.__init__ as cta
+import src.cta_pkms.recorder as recorder
+
+runner = CliRunner()
+DAY = datetime(2025, 11, 19)
+
+
+def arrival(train, arrives, route="Red", delayed="0"):
+    return {"route": route, "destination": "Howard", "arrival_time": arrives.isoformat(), "is_scheduled": "0",
+            "is_delayed": delayed, "train_id": str(train)}
+
+
+def approach(directory, stop_id, train, first_seen, slip_minutes, route="Red", delayed="0"):
+    "Three samples of a train predicted 10 minutes out, ending `slip_minutes` later than first predicted."
+    predicted = first_seen + timedelta(minutes=10)
+    for step, slip in enumerate((0, slip_minutes / 2, slip_minutes)):
+        recorder.record_sample(directory, stop_id, [arrival(train, predicted + timedelta(minutes=slip), route,
+                                                            delayed if step == 2 else "0")],
+                               first_seen + timedelta(minutes=step * 2))
+
+
+def test_records_are_sixteen_bytes_appended_per_day(tmp_path):
+    assert recorder.RECORD_DTYPE.itemsize == 16
+    recorder.record_sample(tmp_path, "40380", [arrival(412, DAY.replace(hour=8, minute=5)),
+                                               {"arrival_time": "soon", "train_id": "1"}], DAY.replace(hour=8))
+    recorder.record_sample(tmp_path, "40380", [arrival(412, DAY.replace(hour=8, minute=6), delayed="1")],
+                           DAY.replace(hour=8, minute=1))
+    recorder.record_sample(tmp_path, "40380", [arrival(413, DAY + timedelta(days=1, hours=9))],
+                           DAY + timedelta(days=1, hours=8, minutes=55))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["2025-11-19.bin", "2025-11-20.bin"]
+    assert (tmp_path / "2025-11-19.bin").stat().st_size == 32
+
+    records = recorder.load_records(tmp_path, end=date(2025, 11, 19))
+    assert records["train"].tolist() == [412, 412]
+    assert records["station"].tolist() == [40380, 40380]
+    assert records["flags"].tolist() == [0, recorder.DELAYED]
+    assert records["arrival"][1] - records["arrival"][0] == 60
+    assert recorder.ROUTES[records["route"][0]] == "Red"
+    assert len(recorder.load_records(tmp_path)) == 3
+
+
+def test_a_half_written_record_is_ignored(tmp_path):
+    recorder.record_sample(tmp_path, "40380", [arrival(412, DAY.replace(hour=8, minute=5))], DAY.replace(hour=8))
+    with (tmp_path / "2025-11-19.bin").open("ab") as f:
+        f.write(b"\x01\x02\x03\x04\x05")
+    assert len(recorder.load_records(tmp_path)) == 1
+
+    # later samples are appended after the last whole record
+    recorder.record_sample(tmp_path, "40380", [arrival(413, DAY.replace(hour=8, minute=9))], DAY.replace(hour=8, minute=1))
+    recorder.record_sample(tmp_path, "41660", [arrival(414, DAY.replace(hour=8, minute=12))], DAY.replace(hour=8, minute=2))
+    assert (tmp_path / "2025-11-19.bin").stat().st_size == 48
+    records = recorder.load_records(tmp_path)
+    assert records["train"].tolist() == [412, 413, 414]
+    assert records["station"].tolist() == [40380, 40380, 41660]
+    assert (records["arrival"] - records["arrival"][0]).tolist() == [0, 240, 420]
+
+
+def test_delay_stats_per_station_hour_and_route(tmp_path):
+    for train, slip in zip(range(100, 105), (0, 1, 2, 3, 8)):
+        approach(tmp_path, "40380", train, DAY.replace(hour=8, minute=train - 100), slip, delayed="1" if slip > 5 else "0")
+    approach(tmp_path, "40380", 200, DAY.replace(hour=8), 4, route="Blue")
+    approach(tmp_path, "41660", 300, DAY.replace(hour=17), 6)
+    # seen once: no slip to measure
+    recorder.record_sample(tmp_path, "40380", [arrival(400, DAY.replace(hour=8, minute=30))], DAY.replace(hour=8, minute=20))
+
+    rows = recorder.delay_stats(recorder.load_records(tmp_path))
+    assert [(r["station"], r["hour"], r["route"], r["approaches"]) for r in rows] == [
+        ("40380", 8, "Red", 5), ("40380", 8, "Blue", 1), ("41660", 17, "Red", 1)]
+    red = rows[0]
+    slips = np.array([0, 1, 2, 3, 8]) * 60
+    assert [red["p50"], red["p90"], red["p95"]] == [float(np.percentile(slips, q)) for q in (50, 90, 95)]
+    assert red["delayed"] == 0.2
+    assert rows[1]["p50"] == 240
+    assert [r["station"] for r in recorder.delay_stats(recorder.load_records(tmp_path), stop_id="41660")] == ["41660"]
+
+
+def test_a_run_number_seen_again_later_is_a_new_approach(tmp_path):
+    approach(tmp_path, "40380", 100, DAY.replace(hour=8), 2)
+    approach(tmp_path, "40380", 100, DAY.replace(hour=9), 4)
+    rows = recorder.delay_stats(recorder.load_records(tmp_path))
+    assert [(r["hour"], r["p50"]) for r in rows] == [(8, 120), (9, 240)]
+
+
+def test_delay_margin_and_empty_logs(tmp_path):
+    assert recorder.delay_stats(recorder.load_records(tmp_path)) == []
+    assert recorder.delay_margin(recorder.load_records(tmp_path), "40380", 8) is None
+    for train, slip in zip(range(100, 110), range(10)):
+        approach(tmp_path, "40380", train, DAY.replace(hour=8, minute=train - 100), slip)
+    records = recorder.load_records(tmp_path)
+    assert recorder.delay_margin(records, "40380", 8) == float(np.percentile(np.arange(10) * 60, 90))
+    assert recorder.delay_margin(records, "40380", 17) is None
+
+
+def test_record_and_delay_stats_commands(monkeypatch):
+    predictions = iter([[arrival(412, DAY.replace(hour=8, minute=10))], [arrival(412, DAY.replace(hour=8, minute=13))]])
+    clock = iter([DAY.replace(hour=8), DAY.replace(hour=8, minute=1)])
+    monkeypatch.setattr(cta, "fetch_next_arrivals", lambda stop_id, fresh=False: next(predictions))
+    monkeypatch.setattr(recorder, "datetime", type("Clock", (datetime,), {"now": staticmethod(lambda: next(clock))}))
+    monkeypatch.setattr(cta.time, "sleep", lambda seconds: None)
+
+    result = runner.invoke(cta.app, ["record", "--stop-id", "40380", "--samples", "2", "--interval", "0"])
+    assert result.exit_code == 0, result.output
+    assert "Recorded 2 arrivals in 2 samples." in result.output
+
+    monkeypatch.setattr(recorder, "date", type("Today", (date,), {"today": staticmethod(lambda: DAY.date())}))
+    monkeypatch.setattr(cta, "load_station_index", lambda: {"40380": {"stop_name": "Clark/Lake"}})
+    result = runner.invoke(cta.app, ["delay-stats"])
+    assert result.exit_code == 0, result.output
+    assert "Clark/Lake" in result.output and "Red" in result.output and "3.0" in result.output
+    assert "2 samples, 1 trains" in result.output
+
+
+def test_commute_eta_allows_for_recorded_delays(tmp_path, monkeypatch):
+    for train, slip in zip(range(100, 110), range(10)):
+        approach(cta.RECORD_DIR, "40001", train, datetime.now().replace(hour=8, minute=train - 100), slip)
+    monkeypatch.setattr(cta.time, "localtime", lambda: type("Now", (), {"tm_hour": 8})())
+    monkeypatch.setattr(cta, "scheduled_minutes", lambda pairs: [20, None])
+    commutes = tmp_path / "commutes.json"
+    commutes.write_text(json.dumps([
+        {"name": "Work", "departure_station": "A", "departure_stop_id": "40001", "arrival_station": "D", "arrival_stop_id": "40004"},
+        {"name": "Home", "departure_station": "D", "departure_stop_id": "40004", "arrival_station": "A", "arrival_stop_id": "40001"},
+    ]))
+    monkeypatch.setattr(cta, "COMMUTES_FILE", commutes)
+    result = runner.invoke(cta.app, ["commute-eta"])
+    assert result.output == "1. Work: A -> D | 20 min (+8 min for delays)\n2. Home: D -> A | no scheduled route\n"
@@ -0,0 +1,81 @@
+import json
+from datetime import datetime
+
+import src.cta_pkms.routing as routing
+
+WEEKDAY = datetime(2025, 11, 19, 7, 55)  # a Wednesday
+
+def write_jsonl(path, rows):
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+
+def stop_time(trip_id, stop_id, seq, time):
+    return {"trip_id": trip_id, "stop_id": stop_id, "stop_sequence": str(seq),
+            "arrival_time": time, "departure_time": time}
+
+def make_gtfs(tmp_path):
+    stops = []
+    for n, name in enumerate(["A", "B", "C", "D", "E"], 1):
+        stops.append({"stop_id": f"4000{n}", "stop_name": name, "parent_station": None})
+        stops.append({"stop_id": f"3000{n}", "stop_name": f"{name} platform", "parent_station": f"4000{n}"})
+    write_jsonl(tmp_path / "stops.jsonl", stops)
+    write_jsonl(tmp_path / "trips.jsonl", [
+        {"route_id": "Red", "service_id": "WK", "trip_id": "r1"},
+        {"route_id": "Red", "service_id": "WK", "trip_id": "r2"},
+        {"route_id": "Blue", "service_id": "WK", "trip_id": "b1"},
+        {"route_id": "Blue", "service_id": "WK", "trip_id": "b2"},
+        {"route_id": "Blue", "service_id": "WK", "trip_id": "owl"},
+    ])
+    write_jsonl(tmp_path / "stop_times.jsonl", [
+        stop_time("r1", "30001", 1, "08:00:00"), stop_time("r1", "30002", 2, "08:05:00"),
+        stop_time("r1", "30003", 3, "08:10:00"),
+        stop_time("r2", "30001", 1, "08:30:00"), stop_time("r2", "30002", 2, "08:35:00"),
+        stop_time("r2", "30003", 3, "08:40:00"),
+        stop_time("b1", "30003", 1, "08:12:00"), stop_time("b1", "30004", 2, "08:20:00"),
+        stop_time("b2", "30003", 1, "08:42:00"), stop_time("b2", "30004", 2, "08:50:00"),
+        stop_time("owl", "30003", 1, "24:10:00"), stop_time("owl", "30004", 2, "24:18:00"),
+    ])
+    write_jsonl(tmp_path / "transfers.jsonl", [
+        {"from_stop_id": "30002", "to_stop_id": "30005", "transfer_type": "2", "min_transfer_time": "300"},
+    ])
+    write_jsonl(tmp_path / "calendar.jsonl", [
+        {"service_id": "WK", "monday": "1", "tuesday": "1", "wednesday": "1", "thursday": "1",
+         "friday": "1", "saturday": "0", "sunday": "0", "start_date": "20250101", "end_date": "20301231"},
+    ])
+    write_jsonl(tmp_path / "calendar_dates.jsonl", [
+        {"service_id": "WK", "date": "20251127", "exception_type": "2"},
+    ])
+    return routing.Router(routing.load_timetable(tmp_path))
+
+def test_route_with_transfer(tmp_path):
+    journey = make_gtfs(tmp_path).earliest_arrival("40001", "40004", WEEKDAY)
+    assert journey["arrival_time"] == "08:20"
+    assert journey["departure_time"] == "08:00"
+    assert journey["duration_minutes"] == 25
+    assert journey["transfers"] == 1
+    assert [leg["route_id"] for leg in journey["legs"]] == ["Red", "Blue"]
+    assert journey["legs"][1]["from_stop_name"] == "C"
+    text = routing.describe_journey(journey)
+    assert "via Red and Blue" in text and "Transfer at C" in text
+
+def test_route_with_footpath(tmp_path):
+    journey = make_gtfs(tmp_path).earliest_arrival("40001", "40005", WEEKDAY)
+    assert journey["arrival_time"] == "08:10"
+    assert [leg["mode"] for leg in journey["legs"]] == ["train", "walk"]
+
+def test_transfer_slack_misses_connection(tmp_path):
+    router = make_gtfs(tmp_path)
+    router.transfer_slack = 180
+    assert router.earliest_arrival("40001", "40004", WEEKDAY)["arrival_time"] == "08:50"
+
+def test_calendar_exceptions_and_weekends(tmp_path):
+    router = make_gtfs(tmp_path)
+    assert router.earliest_arrival("40001", "40004", datetime(2025, 11, 27, 7, 55)) is None
+    assert router.earliest_arrival("40001", "40004", datetime(2025, 11, 22, 7, 55)) is None
+
+def test_after_midnight_trip_from_previous_service_day(tmp_path):
+    journey = make_gtfs(tmp_path).earliest_arrival("40003", "40004", datetime(2025, 11, 20, 0, 5))
+    assert journey["arrival_time"] == "00:18"
+
+def test_parse_gtfs_time():
+    assert routing.parse_gtfs_time("25:30:00") == 91800
+    assert routing.format_seconds(91800) == "01:30"
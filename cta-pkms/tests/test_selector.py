@@ -0,0 +1,33 @@
+import asyncio
+
+import src.cta_pkms.selector as selector
+from src.cta_pkms.station_index import StationIndex
+
+from test_station_index import SEARCH_STATIONS
+
+
+def run(app, *keys):
+    "Press keys in the app; return its result and how many widgets it ended up with."
+    async def drive():
+        async with app.run_test() as pilot:
+            await pilot.pause()
+            widgets = len(app.screen.children)
+            await pilot.press(*keys)
+            await pilot.pause()
+            assert len(app.screen.children) == widgets  # steps swap contents, never add widgets
+        return app.return_value
+    return asyncio.run(drive())
+
+
+def test_type_ahead_picks_departure_and_arrival(monkeypatch):
+    monkeypatch.setattr(selector, "load_station_index", lambda: StationIndex(SEARCH_STATIONS))
+    app = selector.StationSelector(["Departure", "Arrival"])
+    departure, arrival = run(app, *"cla", "enter", *"lake", "down", "down", "enter", "tab", "enter")
+    assert departure["stop_id"] == "40380"
+    assert arrival["stop_name"] == "Ashland/Lake"
+
+
+def test_escape_goes_back_a_step(monkeypatch):
+    monkeypatch.setattr(selector, "load_station_index", lambda: StationIndex(SEARCH_STATIONS))
+    app = selector.StationSelector(["Departure"])
+    assert run(app, *"lake", "enter", "escape", *"belm", "enter", "enter")["stop_id"] == "41320"
@@ -0,0 +1,109 @@
+import json
+import math
+import random
+
+from typer.testing import CliRunner
+
+import src.cta_pkms.__init__ as cta
+import src.cta_pkms.planner as planner
+import src.cta_pkms.spatial as spatial
+from src.cta_pkms.station_index import StationIndex
+
+STOPS = [
+    {"stop_id": 40380, "stop_name": "Clark/Lake", "stop_lat": 41.885737, "stop_lon": -87.630886},
+    {"stop_id": 30074, "stop_name": "Clark/Lake (Blue)", "stop_lat": 41.885737, "stop_lon": -87.630886, "parent_station": 40380},
+    {"stop_id": 40260, "stop_name": "State/Lake", "stop_lat": 41.88574, "stop_lon": -87.627835},
+    {"stop_id": 41450, "stop_name": "Chicago", "stop_lat": 41.896671, "stop_lon": -87.628176},
+    {"stop_id": 40900, "stop_name": "Howard", "stop_lat": 42.019063, "stop_lon": -87.672892},
+    {"stop_id": 40890, "stop_name": "O'Hare", "stop_lat": 41.97766526, "stop_lon": -87.90422307},
+]
+
+
+def write_stops(path, stops):
+    path.write_text("".join(json.dumps(s) + "\n" for s in stops))
+    return path
+
+
+def miles(index, lat, lon, station):
+    return math.dist(index._project(lat, lon), index._project(station["stop_lat"], station["stop_lon"]))
+
+
+def test_nearest_stations_match_a_linear_scan(tmp_path):
+    random.seed(7)
+    stops = [{"stop_id": i, "stop_name": f"S{i}", "stop_lat": random.uniform(41.6, 42.1),
+              "stop_lon": random.uniform(-87.95, -87.5)} for i in range(300)]
+    index = spatial.load_spatial_index(write_stops(tmp_path / "stops.jsonl", stops))
+    for _ in range(50):
+        lat, lon, k = random.uniform(41.5, 42.2), random.uniform(-88.0, -87.4), random.randint(1, 10)
+        expected = sorted(index.stations, key=lambda s: miles(index, lat, lon, s))[:k]
+        assert [s["stop_id"] for s, _ in index.nearest_stations(lat, lon, k)] == [s["stop_id"] for s in expected]
+    assert (tmp_path / ".compiled" / "spatial-index-stops.pickle").exists()
+
+
+def test_stations_within(tmp_path):
+    index = spatial.load_spatial_index(write_stops(tmp_path / "stops.jsonl", STOPS))
+    assert len(index) == 5  # the platform shares its station's place
+    assert [(s["stop_name"], round(d, 2)) for s, d in index.stations_within(40380)] == [
+        ("State/Lake", 0.16), ("Chicago", 0.77)]
+    assert [s["stop_name"] for s, _ in index.stations_within("40380", 0.5)] == ["State/Lake"]
+    assert [s["stop_name"] for s, _ in index.stations_within("40380", 10)] == ["State/Lake", "Chicago", "Howard"]
+    assert index.stations_within("1") == []
+    assert spatial.load_spatial_index(tmp_path / "missing.jsonl").nearest_stations(41.9, -87.6) == []
+
+
+def test_planner_lists_alternative_arrivals(tmp_path, monkeypatch):
+    index = spatial.load_spatial_index(write_stops(tmp_path / "stops.jsonl", STOPS))
+    monkeypatch.setattr(cta, "load_spatial_index", lambda: index)
+    alternatives = cta.alternative_arrivals("40380")
+    assert alternatives[0] == {"stop_id": "40260", "stop_name": "State/Lake", "miles": 0.157}
+    departure, arrival = {"stop_name": "Howard", "stop_id": "40900"}, {"stop_name": "Clark/Lake", "stop_id": "40380"}
+    prompt = planner.build_planner_prompt(departure, arrival, [], [], alternatives)
+    assert '"stop_name": "Chicago"' in prompt[0]["content"]
+    alert = {"AlertId": "1", "ImpactedService": {"Service": {"ServiceType": "T", "ServiceId": "41450"}}}
+    _, kept, _ = planner.reduce_planner_inputs(departure, arrival, [], [alert], StationIndex([]), alternatives)
+    assert kept == [{"AlertId": "1"}]
+
+
+def test_task_locations_resolve_to_stations(tmp_path, monkeypatch):
+    index = spatial.load_spatial_index(write_stops(tmp_path / "stops.jsonl", STOPS))
+    monkeypatch.setattr(cta, "load_spatial_index", lambda: index)
+    monkeypatch.setattr(cta, "load_station_index", lambda: StationIndex(STOPS))
+    monkeypatch.setattr(cta, "TASKS_FILE", tmp_path / "tasks.json")
+    runner = CliRunner()
+    result = runner.invoke(cta.app, ["nearest-station", "41.8857,-87.6290", "--count", "2"])
+    assert result.output == "1. State/Lake (40260) 0.06 mi\n2. Clark/Lake (40380) 0.10 mi\n"
+    assert cta.resolve_location("Pick up near clark lake")[0][0]["stop_id"] == 40380
+    assert cta.resolve_location("nowhere") == []
+
+    runner.invoke(cta.app, ["add-task", "Errand", "stamps", "--location", "42.0191,-87.6729"])
+    monkeypatch.setattr(cta, "fetch_next_arrivals", lambda stop_id: [
+        {"route": "Red", "destination": "95th", "arrival_time": "12:00", "is_delayed": "0", "stop_id": stop_id}])
+    result = runner.invoke(cta.app, ["next-arrivals", "--task", "1"])
+    assert "Fetching next arrivals for Howard (stop_id: 40900)" in result.output
+
+
+def test_points_outside_the_network(tmp_path, monkeypatch):
+    index = spatial.load_spatial_index(write_stops(tmp_path / "stops.jsonl", STOPS))
+    # west of O'Hare and north of Howard: nearest by a scan of every station
+    assert [s["stop_name"] for s, _ in index.nearest_stations(41.98, -88.05, 2)] == ["O'Hare", "Howard"]
+    assert index.nearest_stations(42.2, -87.68)[0][0]["stop_name"] == "Howard"
+    # a dropped minus sign puts the point in China
+    assert index.nearest_stations(41.88, 87.63) == []
+    assert index.nearest_stations(90, 180) == []
+
+    monkeypatch.setattr(cta, "load_spatial_index", lambda: index)
+    monkeypatch.setattr(cta, "TASKS_FILE", tmp_path / "tasks.json")
+    runner = CliRunner()
+    assert runner.invoke(cta.app, ["nearest-station", "41.88,87.63"]).output == "No station found for: 41.88,87.63\n"
+    runner.invoke(cta.app, ["add-task", "Errand", "stamps", "--location", "41.88,87.63"])
+    assert "No station found for: 41.88,87.63" in runner.invoke(cta.app, ["next-arrivals", "--task", "1"]).output
+
+
+def test_rings_visit_only_their_perimeter(tmp_path):
+    index = spatial.load_spatial_index(write_stops(tmp_path / "stops.jsonl", STOPS))
+    index._cells = {(x, y): [(x, y)] for x in range(-5, 6) for y in range(-5, 6)}
+    assert list(index._ring((0, 0), 0)) == [(0, 0)]
+    for radius in (1, 3):
+        ring = list(index._ring((0, 0), radius))
+        assert len(ring) == len(set(ring)) == 8 * radius
+        assert all(max(abs(x), abs(y)) == radius for x, y in ring)
@@ -0,0 +1,34 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Generous enough for a slow CI machine; importing openai or textual alone
+# takes longer than this.
+IMPORT_BUDGET_SECONDS = 0.4
+HEAVY_MODULES = ["openai", "textual", "requests", "asyncio", "numpy"]
+
+SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import cta_pkms
+elapsed = time.perf_counter() - started
+print(json.dumps({"elapsed": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % HEAVY_MODULES
+
+
+def import_in_fresh_interpreter():
+    env = dict(os.environ, PYTHONPATH=str(Path(__file__).resolve().parent.parent / "src"))
+    result = subprocess.run([sys.executable, "-c", SCRIPT], env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def test_cli_import_skips_heavy_dependencies():
+    assert import_in_fresh_interpreter()["loaded"] == []
+
+
+def test_cli_import_time():
+    # best of three, to ride out a busy machine
+    elapsed = min(import_in_fresh_interpreter()["elapsed"] for _ in range(3))
+    assert elapsed < IMPORT_BUDGET_SECONDS
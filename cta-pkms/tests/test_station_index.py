@@ -0,0 +1,70 @@
+import json
+import os
+
+import src.cta_pkms.gtfs as gtfs
+import src.cta_pkms.station_index as station_index
+
+STATIONS = [
+    {"route_id": "Red", "stop_id": "40380", "stop_name": "Clark/Lake"},
+    {"route_id": "Blue", "stop_id": "40380", "stop_name": "Clark/Lake"},
+    {"route_id": "Red", "stop_id": "41450", "stop_name": "Chicago"},
+]
+
+def write_stations(path, stations):
+    path.write_text("".join(json.dumps(s) + "\n" for s in stations) + "not json\n")
+
+def test_station_index_groups_by_line_and_stop_id(tmp_path):
+    path = tmp_path / "route-stations.jsonl"
+    write_stations(path, STATIONS)
+    index = station_index.load_station_index(path)
+    assert list(index.lines) == ["Red", "Blue"]
+    assert [s["stop_name"] for s in index.lines["Red"]] == ["Clark/Lake", "Chicago"]
+    assert index.get(40380)["stop_name"] == "Clark/Lake"
+    assert index.routes_for("40380") == ["Red", "Blue"]
+    assert (tmp_path / ".compiled" / "station-index-route-stations.pickle").exists()
+
+def test_station_index_rebuilds_when_source_changes(tmp_path):
+    path = tmp_path / "route-stations.jsonl"
+    write_stations(path, STATIONS)
+    assert len(station_index.load_station_index(path)) == 3
+    write_stations(path, STATIONS[:1])
+    os.utime(path, ns=(1, 1))
+    assert len(station_index.load_station_index(path)) == 1
+
+def test_load_compiled_reuses_cache_when_only_mtime_changes(tmp_path):
+    source = tmp_path / "source.jsonl"
+    source.write_text("{}\n")
+    calls = []
+    build = lambda: calls.append(1) or "payload"
+    assert gtfs.load_compiled("x", [source], build, cache_dir=tmp_path) == "payload"
+    os.utime(source, ns=(1, 1))
+    assert gtfs.load_compiled("x", [source], build, cache_dir=tmp_path) == "payload"
+    assert gtfs.load_compiled("x", [source], build, cache_dir=tmp_path) == "payload"
+    assert len(calls) == 1
+
+def test_station_index_missing_file(tmp_path):
+    index = station_index.load_station_index(tmp_path / "missing.jsonl")
+    assert len(index) == 0
+    assert index.get("40380") is None
+
+SEARCH_STATIONS = [
+    {"route_id": "Red", "stop_id": "41320", "stop_name": "Belmont"},
+    {"route_id": "Brown", "stop_id": "41320", "stop_name": "Belmont"},
+    {"route_id": "Blue", "stop_id": "40060", "stop_name": "Belmont"},
+    {"route_id": "Red", "stop_id": "40380", "stop_name": "Clark/Lake"},
+    {"route_id": "Green", "stop_id": "40170", "stop_name": "Ashland/Lake"},
+    {"route_id": "Red", "stop_id": "40540", "stop_name": "Lake"},
+]
+
+def test_station_search_ranks_words_prefixes_and_typos():
+    index = station_index.StationIndex(SEARCH_STATIONS)
+    names = lambda query: [s["stop_name"] for s in index.search(query)]
+    assert [s["stop_id"] for s in index.search("belmont")] == ["41320", "40060"]  # one result per stop_id
+    assert names("lake") == ["Lake", "Clark/Lake", "Ashland/Lake"]  # whole word, shorter names first
+    assert names("cla") == ["Clark/Lake"]
+    assert names("ark") == ["Clark/Lake"]  # substring
+    assert names("belmnt") == ["Belmont", "Belmont"]  # typo
+    assert names("lake ash") == ["Ashland/Lake"]
+    assert names("lake zzz") == []
+    assert names("") == ["Ashland/Lake", "Belmont", "Belmont", "Clark/Lake", "Lake"]
+    assert len(index.search("", limit=2)) == 2
@@ -0,0 +1,150 @@
+import json
+
+from src.cta_pkms import storage
+
+
+def read_log(path):
+    return [json.loads(line) for line in storage.log_path(path).read_text().splitlines()]
+
+
+def test_diff_ops():
+    a, b, c = {"n": "a"}, {"n": "b"}, {"n": "c"}
+    assert storage.diff_ops([a], [a]) == []
+    assert storage.diff_ops([a], [a, b, c]) == [{"op": "append", "value": b}, {"op": "append", "value": c}]
+    assert storage.diff_ops([a, b], [a, c]) == [{"op": "set", "index": 1, "value": c}]
+    assert storage.diff_ops([a, b, c], [a, c]) == [{"op": "delete", "index": 1}]
+    assert storage.diff_ops([a, c], [a, b, c]) == [{"op": "insert", "index": 1, "value": b}]
+    assert storage.diff_ops([a, b, c], [c, a]) == [{"op": "replace", "value": [c, a]}]
+
+
+def test_save_appends_operations(tmp_path):
+    path = tmp_path / "tasks.json"
+    storage.save_json(path, [{"name": "a"}])
+    snapshot = path.read_text()
+
+    tasks = storage.load_json(path)
+    tasks.append({"name": "b"})
+    storage.save_json(path, tasks)
+    tasks = storage.load_json(path)
+    tasks[0]["status"] = "completed"
+    storage.save_json(path, tasks)
+
+    # the snapshot is untouched; changes are in the log
+    assert path.read_text() == snapshot
+    assert [record.get("op") for record in read_log(path)] == [None, "append", "set"]
+    assert storage.load_json(path) == [{"name": "a", "status": "completed"}, {"name": "b"}]
+
+
+def test_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "COMPACT_THRESHOLD", 5)
+    path = tmp_path / "tasks.json"
+    tasks = storage.load_json(path)
+    for i in range(6):
+        tasks.append({"name": str(i)})
+        storage.save_json(path, tasks)
+    storage.compact_log(path)
+
+    assert json.loads(path.read_text()) == tasks
+    assert len(read_log(path)) <= 2
+    assert storage.load_json(path) == tasks
+
+
+def test_torn_record_and_stale_log_are_ignored(tmp_path):
+    path = tmp_path / "tasks.json"
+    tasks = storage.load_json(path)
+    tasks.append({"name": "a"})
+    storage.save_json(path, tasks)
+    with storage.log_path(path).open("a") as f:
+        f.write('{"op": "append", "val')
+    assert storage.load_json(path) == [{"name": "a"}]
+
+    # a snapshot rewritten behind the log's back wins over the log
+    path.write_text('[{"name": "edited"}]')
+    assert storage.load_json(path) == [{"name": "edited"}]
+
+
+def test_save_after_a_torn_record(tmp_path):
+    path = tmp_path / "tasks.json"
+    tasks = storage.load_json(path)
+    tasks.append({"name": "a"})
+    storage.save_json(path, tasks)
+    with storage.log_path(path).open("a") as f:
+        f.write('{"op": "append", "val')
+
+    tasks = storage.load_json(path)
+    tasks.append({"name": "b"})
+    storage.save_json(path, tasks)
+    assert [record.get("op") for record in read_log(path)] == [None, "append", "append"]
+    storage._states.clear()
+    assert storage.load_json(path) == [{"name": "a"}, {"name": "b"}]
+
+
+def test_records_that_do_not_apply_are_dropped(tmp_path):
+    path = tmp_path / "tasks.json"
+    tasks = storage.load_json(path)
+    tasks.append({"name": "a"})
+    storage.save_json(path, tasks)
+    with storage.log_path(path).open("a") as f:
+        f.write('{"op": "delete", "index": 5}\n{"op": "append", "value": {"name": "lost"}}\n')
+    assert storage.load_json(path) == [{"name": "a"}]
+
+    tasks = storage.load_json(path)
+    tasks.append({"name": "b"})
+    storage.save_json(path, tasks)
+    storage._states.clear()
+    assert storage.load_json(path) == [{"name": "a"}, {"name": "b"}]
+
+
+def as_process(states):
+    "Switch to another process's view of the files it has loaded."
+    storage._states = states
+    return states
+
+
+def test_two_writers_keep_each_others_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "_states", {})
+    path = tmp_path / "tasks.json"
+    storage.save_json(path, [{"name": n} for n in "abcd"])
+    storage._states.clear()
+
+    first = as_process({})
+    mine = storage.load_json(path)
+    second = as_process({})
+    theirs = storage.load_json(path)
+
+    del theirs[2]  # c
+    storage.save_json(path, theirs)
+    as_process(first)
+    del mine[1]  # b: index 1 is still b in this process's copy
+    mine[-1]["status"] = "completed"
+    storage.save_json(path, mine)
+
+    as_process({})
+    assert storage.load_json(path) == [{"name": "a"}, {"name": "d", "status": "completed"}]
+    as_process(second)
+    theirs = storage.load_json(path)
+    theirs.append({"name": "e"})
+    storage.save_json(path, theirs)
+    as_process({})
+    assert [task["name"] for task in storage.load_json(path)] == ["a", "d", "e"]
+
+
+def test_save_after_another_process_compacts(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "_states", {})
+    path = tmp_path / "tasks.json"
+    storage.save_json(path, [{"name": "a"}])
+    storage._states.clear()
+    first = as_process({})
+    mine = storage.load_json(path)
+
+    as_process({})
+    theirs = storage.load_json(path)
+    theirs.append({"name": "b"})
+    storage.save_json(path, theirs)
+    storage.compact_log(path)
+
+    as_process(first)
+    mine.append({"name": "c"})
+    storage.save_json(path, mine)
+    as_process({})
+    assert [task["name"] for task in storage.load_json(path)] == ["a", "b", "c"]
@@ -0,0 +1,78 @@
+import importlib.util
+import json
+from pathlib import Path
+
+import pytest
+
+STOPS = [
+    {"stop_id": "30001", "stop_name": "Howard (Red)", "parent_station": "40900"},
+    {"stop_id": "40900", "stop_name": "Howard"},
+    # its parent station is not in stops.jsonl
+    {"stop_id": "30002", "stop_name": "Loyola (Red)", "parent_station": "41300"},
+]
+
+def load_stream_join():
+    path = Path(__file__).parent.parent / "cta-gtfs" / "tools-for-data" / "stream_join.py"
+    spec = importlib.util.spec_from_file_location("stream_join", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def write_jsonl(path, rows):
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+
+def read_jsonl(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+@pytest.fixture
+def gtfs_dir(tmp_path, monkeypatch):
+    "The presets read and write files in the current directory, like the cta-gtfs one."
+    monkeypatch.chdir(tmp_path)
+    write_jsonl(tmp_path / "stops.jsonl", STOPS)
+    write_jsonl(tmp_path / "trips.jsonl", [{"trip_id": "T1", "route_id": "Red"}, {"trip_id": "T2", "route_id": "Red"}])
+    return tmp_path
+
+def test_enrich_placeholder_preset(gtfs_dir, capsys):
+    write_jsonl(gtfs_dir / "placeholder.jsonl", [
+        {"trip_id": "T1", "stop_id": "30001"},
+        {"trip_id": "T1", "stop_id": "30001"},
+        {"trip_id": "T2", "stop_id": "30001"},
+        {"trip_id": "T2", "stop_id": "30002"},
+        {"trip_id": "T9", "stop_id": "30001"},
+        {"stop_id": "30001"},
+    ])
+    # small batches, so the rows sharing a key are written across several of them
+    load_stream_join().main(["--preset", "enrich-placeholder", "--batch-size", "2"])
+    howard = {"route_id": "Red", "parent_station": "40900", "stop_name": "Howard"}
+    assert read_jsonl(gtfs_dir / "placeholder_enriched.jsonl") == [
+        howard, howard, howard,
+        {"route_id": "Red", "parent_station": "41300", "stop_name": None},
+        {"route_id": None, "parent_station": "40900", "stop_name": "Howard"},
+    ]
+    out, err = capsys.readouterr()
+    assert "Joined 6 rows from placeholder.jsonl, wrote 5" in out
+    assert err == 'Warning: Missing trip_id or stop_id in line: {"stop_id": "30001"}\n'
+
+def test_parent_station_lookup_preset(gtfs_dir, capsys):
+    write_jsonl(gtfs_dir / "route-stations.jsonl", [
+        {"stop_id": "30001"},
+        {"stop_id": "30001"},
+        {"stop_id": "30002"},
+        {"stop_id": "39999"},
+        {"route": "Red"},
+    ])
+    load_stream_join().main(["--preset", "parent-station-lookup", "--batch-size", "2"])
+    howard = {"stop_id": "30001", "parent_station": "40900", "parent_station_name": "Howard", "stop_name": "Howard (Red)"}
+    assert read_jsonl(gtfs_dir / "parent_stations.jsonl") == [
+        howard, howard,
+        {"stop_id": "30002", "parent_station": "41300", "parent_station_name": None, "stop_name": "Loyola (Red)"},
+        {"stop_id": "39999", "parent_station": None, "parent_station_name": None, "stop_name": None},
+    ]
+    out, err = capsys.readouterr()
+    assert "Joined 5 rows from route-stations.jsonl, wrote 4" in out
+    assert err == 'Warning: Missing stop_id in line: {"route": "Red"}\n'
+
+def test_distinct_drops_repeated_rows(gtfs_dir):
+    write_jsonl(gtfs_dir / "route-stations.jsonl", [{"stop_id": "30001"}, {"stop_id": "30002"}, {"stop_id": "30001"}])
+    load_stream_join().main(["--preset", "parent-station-lookup", "--distinct"])
+    assert [row["stop_id"] for row in read_jsonl(gtfs_dir / "parent_stations.jsonl")] == ["30001", "30002"]
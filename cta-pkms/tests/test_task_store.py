@@ -0,0 +1,139 @@
+import json
+import sqlite3
+
+import pytest
+from typer.testing import CliRunner
+
+import src.cta_pkms.__init__ as cta
+from src.cta_pkms.task_store import JSONTaskStore, SQLiteTaskStore
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "json":
+        yield JSONTaskStore(tmp_path / "tasks.json", tmp_path / "commutes.json")
+    else:
+        store = SQLiteTaskStore(tmp_path / "tasks.sqlite3")
+        yield store
+        store.close()
+
+
+def test_task_numbering(store):
+    for name, status in [("a", "pending"), ("b", "completed"), ("c", "pending")]:
+        store.add_task({"name": name, "description": f"{name} task", "status": status})
+
+    assert [t["name"] for t in store.list_tasks("pending")] == ["a", "c"]
+    assert store.count_tasks() == 3
+
+    assert store.amend_task(3, {"location": "Clark/Lake", "status": "completed"})
+    assert store.list_tasks()[2] == {"name": "c", "description": "c task", "status": "completed", "location": "Clark/Lake"}
+    assert store.amend_task(3, {"location": None})
+    assert "location" not in store.list_tasks()[2]
+    assert not store.amend_task(4, {"name": "x"})
+
+    assert store.delete_task(2, "completed")["name"] == "c"
+    assert store.delete_task(2, "completed") is None
+    assert [t["name"] for t in store.list_tasks()] == ["a", "b"]
+
+
+def test_search_tasks(store):
+    store.add_task({"name": "Groceries", "description": "milk and bread near Belmont", "status": "pending"})
+    store.add_task({"name": "Library", "description": "return books", "status": "pending"})
+
+    assert [t["name"] for t in store.search_tasks("belm milk")] == ["Groceries"]
+    assert [t["name"] for t in store.search_tasks("book")] == ["Library"]
+    assert store.search_tasks("milk books") == []
+
+
+def test_commutes(store):
+    store.add_commute({"name": "Work", "departure_station": "A", "departure_stop_id": "1",
+                       "arrival_station": "B", "arrival_stop_id": "2"})
+    assert store.list_commutes()[0]["arrival_stop_id"] == "2"
+    assert store.delete_commute(2) is None
+    assert store.delete_commute(1)["name"] == "Work"
+    assert store.list_commutes() == []
+
+
+def test_migrate_and_sqlite_commands(tmp_path, monkeypatch):
+    tasks_file = tmp_path / "tasks.json"
+    tasks_file.write_text(json.dumps([
+        {"name": "a", "description": "first", "status": "pending"},
+        {"name": "b", "description": "second", "status": "completed", "location": "Howard"},
+    ]))
+    monkeypatch.setattr(cta, "TASKS_FILE", tasks_file)
+    monkeypatch.setattr(cta, "COMMUTES_FILE", tmp_path / "commutes.json")
+    monkeypatch.setattr(cta, "TASKS_DB", tmp_path / "tasks.sqlite3")
+    runner = CliRunner()
+
+    result = runner.invoke(cta.app, ["migrate"])
+    assert "Copied 2 tasks and 0 commutes" in result.output
+
+    monkeypatch.setattr(cta, "STORAGE_BACKEND", "sqlite")
+    runner.invoke(cta.app, ["add-task", "c", "third"])
+    result = runner.invoke(cta.app, ["list-tasks"])
+    assert "1. a" in result.output and "2. c" in result.output and "Location: Howard" in result.output
+    result = runner.invoke(cta.app, ["delete-task", "1", "--status", "completed"])
+    assert "Deleted completed task: b" in result.output
+    result = runner.invoke(cta.app, ["search-tasks", "thi"])
+    assert "1. c" in result.output
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_import_export_and_batch(tmp_path, monkeypatch, backend):
+    monkeypatch.setattr(cta, "TASKS_FILE", tmp_path / "tasks.json")
+    monkeypatch.setattr(cta, "COMMUTES_FILE", tmp_path / "commutes.json")
+    monkeypatch.setattr(cta, "TASKS_DB", tmp_path / "tasks.sqlite3")
+    monkeypatch.setattr(cta, "STORAGE_BACKEND", backend)
+    runner = CliRunner()
+
+    csv_file = tmp_path / "in.csv"
+    csv_file.write_text("name,description,location,status\na,first,,pending\nb,second,Howard,completed\n")
+    result = runner.invoke(cta.app, ["import-tasks", str(csv_file)])
+    assert "Imported 2 tasks." in result.output
+
+    changes = "\n".join(json.dumps(r) for r in [
+        {"op": "add", "name": "c", "description": "third"},
+        {"op": "amend", "index": 1, "status": "completed", "location": "Belmont"},
+        {"op": "delete", "index": 1, "status": "completed"},
+    ])
+    result = runner.invoke(cta.app, ["batch"], input=changes)
+    assert result.exit_code == 0
+    assert "3 records in" in result.output
+
+    result = runner.invoke(cta.app, ["batch"], input='{"op": "add", "name": "d"}\n{"op": "delete", "index": 9}\n')
+    assert result.exit_code == 1
+    assert "Record 2: no pending task number 9" in result.output
+
+    out = tmp_path / "out.jsonl"
+    runner.invoke(cta.app, ["export-tasks", str(out)])
+    assert [json.loads(line) for line in out.read_text().splitlines()] == [
+        {"name": "b", "description": "second", "location": "Howard", "status": "completed"},
+        {"name": "c", "description": "third", "status": "pending"},
+    ]
+    result = runner.invoke(cta.app, ["export-tasks", "--format", "csv"])
+    assert result.stdout.splitlines()[:2] == ["name,description,location,status", "b,second,Howard,completed"]
+
+
+def test_sqlite_numbering_across_blocks(tmp_path):
+    store = SQLiteTaskStore(tmp_path / "tasks.sqlite3")
+    store.import_json([{"name": str(i), "description": None, "status": "completed" if i % 3 else "pending"}
+                       for i in range(1000)], [])
+    assert store.list_tasks()[0]["description"] == ""
+    assert store.count_tasks() == 1000 and store.count_tasks("pending") == 334
+    assert store.delete_task(300, "pending")["name"] == "897"
+    assert store.delete_task(300, "pending")["name"] == "900"
+    assert store.amend_task(600, {"status": "pending", "description": None})
+    assert store.list_tasks()[599] == {"name": "599", "description": "", "status": "pending"}
+    assert store.count_tasks("pending") == 333
+    assert store.delete_task(999, "completed") is None
+    store.close()
+
+    # a database made before the block counts were kept
+    db = sqlite3.connect(tmp_path / "tasks.sqlite3")
+    with db:
+        db.execute("DROP TABLE task_blocks")
+    db.close()
+    store = SQLiteTaskStore(tmp_path / "tasks.sqlite3")
+    assert store.count_tasks() == 998 and store.count_tasks("pending") == 333
+    assert store.delete_task(333, "pending")["name"] == "999"
+    store.close()
@@ -0,0 +1,82 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from typer.testing import CliRunner
+
+import src.cta_pkms.__init__ as cta
+import src.cta_pkms.travel_matrix as travel_matrix
+
+from test_routing import make_gtfs
+
+
+def test_travel_times_rides_transfers_and_walks(tmp_path):
+    make_gtfs(tmp_path)
+    matrix = travel_matrix.load_travel_matrix(tmp_path)
+    assert matrix.station_ids == ["40001", "40002", "40003", "40004", "40005"]
+    assert matrix.minutes("40001", "40003") == 10
+    assert matrix.minutes("40001", "40004") == 20  # 10 + 2 to change trains + 8
+    assert matrix.minutes("40002", "40005") == 5  # the footpath alone
+    assert matrix.minutes("40001", "40005") == 10  # ride then walk, no change of train
+    assert matrix.minutes("40001", "40001") == 0
+    assert matrix.minutes("40004", "40001") is None
+    assert matrix.seconds("40001", "99999") is None
+    assert not isinstance(matrix.times, np.memmap)  # just built: in memory
+
+
+def test_matrix_is_memory_mapped_and_rebuilt_when_the_feed_changes(tmp_path):
+    make_gtfs(tmp_path)
+    travel_matrix.build_travel_matrix(tmp_path)
+    assert (tmp_path / ".compiled" / "travel-times.npy").exists()
+    assert json.loads((tmp_path / ".compiled" / "travel-times.json").read_text())["stations"][0] == "40001"
+    travel_matrix._loaded.clear()
+    matrix = travel_matrix.load_travel_matrix(tmp_path)
+    assert isinstance(matrix.times, np.memmap)
+    assert matrix.times.dtype == np.uint16
+
+    os.utime(tmp_path / "transfers.jsonl", ns=(1, 1))
+    (tmp_path / "transfers.jsonl").write_text("")
+    assert travel_matrix.load_travel_matrix(tmp_path).minutes("40002", "40005") is None
+
+
+def test_commute_eta(tmp_path, monkeypatch):
+    make_gtfs(tmp_path)
+    matrix = travel_matrix.load_travel_matrix(tmp_path)
+    monkeypatch.setattr(travel_matrix, "load_travel_matrix", lambda build=True: matrix)
+    commutes = tmp_path / "commutes.json"
+    commutes.write_text(json.dumps([
+        {"name": "Work", "departure_station": "A", "departure_stop_id": "40001", "arrival_station": "D", "arrival_stop_id": "40004"},
+        {"name": "Home", "departure_station": "D", "departure_stop_id": "40004", "arrival_station": "A", "arrival_stop_id": "40001"},
+    ]))
+    monkeypatch.setattr(cta, "COMMUTES_FILE", commutes)
+    result = CliRunner().invoke(cta.app, ["commute-eta"])
+    assert result.output == "1. Work: A -> D | 20 min\n2. Home: D -> A | no scheduled route\n"
+
+
+def test_eta_without_a_built_matrix(tmp_path, monkeypatch):
+    load = travel_matrix.load_travel_matrix
+    monkeypatch.setattr(travel_matrix, "load_travel_matrix", lambda build=True: load(tmp_path, build=build))
+    monkeypatch.setattr(travel_matrix, "build_travel_matrix", lambda *args: pytest.fail("built the matrix"))
+    monkeypatch.setattr(cta.daemon, "daemon_client", lambda: None)
+    # no stops.jsonl at all, then a feed that hasn't been built
+    assert cta.scheduled_minutes([("40001", "40004"), ("40004", "40001")]) == [None, None]
+    make_gtfs(tmp_path)
+    assert cta.scheduled_minutes([("40001", "40004")]) == [None]
+
+    commutes = tmp_path / "commutes.json"
+    commutes.write_text(json.dumps([{"name": "Work", "departure_station": "A", "departure_stop_id": "40001",
+                                     "arrival_station": "D", "arrival_stop_id": "40004"}]))
+    monkeypatch.setattr(cta, "COMMUTES_FILE", commutes)
+    result = CliRunner().invoke(cta.app, ["commute-eta"])
+    assert result.exit_code == 0, result.output
+    assert result.output == ("No scheduled times; run build-travel-matrix to compute them.\n"
+                             "1. Work: A -> D | no scheduled route\n")
+
+
+def test_build_command_without_a_timetable(tmp_path, monkeypatch):
+    build = travel_matrix.build_travel_matrix
+    monkeypatch.setattr(travel_matrix, "build_travel_matrix", lambda: build(tmp_path))
+    result = CliRunner().invoke(cta.app, ["build-travel-matrix"])
+    assert result.exit_code == 1
+    assert result.output.startswith("GTFS timetable not found: ")
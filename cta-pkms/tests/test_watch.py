@@ -0,0 +1,87 @@
+import io
+from datetime import datetime, timedelta
+
+import src.cta_pkms.__init__ as cta
+import src.cta_pkms.watch as watch
+from src.cta_pkms.cta_api import CTAAPIError
+
+NOW = datetime(2025, 11, 19, 8, 0, 0)
+
+
+def due_in(seconds, route="Red"):
+    return {"route": route, "destination": "Howard", "arrival_time": (NOW + timedelta(seconds=seconds)).isoformat(),
+            "is_delayed": "0"}
+
+
+def test_poll_interval_follows_the_next_train_and_backs_off():
+    assert watch.poll_interval([due_in(40), due_in(600)], NOW) == 20
+    assert watch.poll_interval([due_in(10)], NOW) == watch.MIN_POLL
+    assert watch.poll_interval([due_in(900)], NOW) == watch.MAX_POLL
+    assert watch.poll_interval([], NOW) == watch.MAX_POLL
+    assert [watch.poll_interval([], NOW, errors) for errors in (1, 2, 3, 10)] == [30, 60, 120, watch.MAX_BACKOFF]
+
+
+def test_screen_rewrites_only_changed_lines():
+    out = io.StringIO()
+    screen = watch.Screen(out)
+    screen.draw(["header", "1. a", "2. b"])
+    out.truncate(0), out.seek(0)
+    screen.draw(["header", "1. a", "2. c"])
+    assert out.getvalue() == "\x1b[3;1H2. c\x1b[K\x1b[4;1H"
+    out.truncate(0), out.seek(0)
+    screen.draw(["header", "1. a", "2. c"])
+    assert out.getvalue() == ""
+    screen.draw(["header"])
+    assert "\x1b[2;1H\x1b[K\x1b[3;1H\x1b[K" in out.getvalue()
+    assert screen.lines_written == 4
+
+
+class FakeClock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+    def sleep(self, seconds):
+        self.t += seconds
+
+
+def test_watcher_polls_adaptively_and_redraws_little():
+    clock = FakeClock()
+    responses = [[due_in(100), due_in(500, "Brown")], CTAAPIError("HTTP 503"), CTAAPIError("HTTP 503"),
+                 [due_in(30)]]
+    polled_at = []
+
+    def fetch():
+        polled_at.append(clock.t)
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    now = lambda: NOW + timedelta(seconds=clock.t)
+    screen = watch.Screen(io.StringIO())
+    watcher = watch.Watcher(fetch, "Belmont", cta.format_arrival, screen, clock=clock, now=now, sleep=clock.sleep)
+    watcher.run(max_polls=4)
+    assert polled_at == [0, 50, 80, 140]  # next train in 100s, then backoff 30s and 60s
+    assert watcher.requests == 4 and watcher.failures == 2
+    assert screen.lines[0] == "Next 1 arrivals at Belmont:"
+    assert screen.lines[1].endswith("| Due")
+    # ~160 one-second ticks, but only rows whose text changed were rewritten
+    assert screen.lines_written < 20
+    assert "4 requests (2 failed)" in watcher.summary()
+
+
+def test_watch_reuses_the_client_and_skips_the_cache(cta_stub, cta_client, monkeypatch, capsys):
+    cta_stub.respond("ttarrivals.aspx", {"ctatt": {"errCd": "0", "eta": [
+        {"rt": "Red", "destNm": "Howard", "arrT": "2025-11-19T08:05:00", "isDly": "0"}]}})
+    monkeypatch.setattr(watch, "MIN_POLL", 0.01)
+    monkeypatch.setattr(watch, "MAX_POLL", 0.01)
+    watcher = cta.watch_arrivals({"stop_id": "40320", "stop_name": "Belmont"}, max_polls=3)
+    assert cta_stub.count("ttarrivals.aspx") == 3
+    assert len(cta_stub.connections) == 1
+    captured = capsys.readouterr()
+    assert "1. Route: Red | Destination: Howard" in captured.out
+    assert "3 requests (0 failed)" in captured.err
+    assert watcher.stats()["cpu_seconds"] >= 0
@@ -1,32 +1,97 @@
+import sys
+import time
+
 from openai import OpenAI
-client = OpenAI()
 
-# message history, starts w/ system prompt
-messages=[
-    {"role": "developer", "content": "You are a commute planner for the Chicago Transit Authority. Provide optimal routes based on user queries. Be concise and informative. Do not use bus routes, only use 'L' train lines."}
-  ]
+from chat_memory import ConversationMemory
 
-# user query
-print("Hello, I am your CTA assistant. How can I help you today?")
+MODEL = "gpt-5-mini"
+SYSTEM_PROMPT = "You are a commute planner for the Chicago Transit Authority. Provide optimal routes based on user queries. Be concise and informative. Do not use bus routes, only use 'L' train lines."
 
-while True:
-    # user query
-    user_input = input("\n")
-
-    if user_input.lower() in ['exit', 'quit']:
-        break
-    
-    # append user message to history
-    messages.append({"role": "user", "content": user_input})
-
-    # get response from model
-    completion = client.chat.completions.create(
-      model="gpt-5-mini",
-      messages=messages
+def stream_reply(client, messages):
+    """
+    Print the model's reply as it is generated and return (text, seconds to
+    first token). Falls back to a regular completion if the client can't stream.
+    Errors, including ones part way through the stream, propagate.
+    """
+    started = time.perf_counter()
+    try:
+        try:
+            response = client.chat.completions.create(model=MODEL, messages=messages, stream=True)
+        except TypeError:
+            response = client.chat.completions.create(model=MODEL, messages=messages)
+
+        # non-streaming response: print it all at once
+        if isinstance(getattr(response, "choices", None), list):
+            text = response.choices[0].message.content
+            print(text, end="")
+            return text, time.perf_counter() - started
+
+        parts = []
+        first_token = None
+        for chunk in response:
+            if not getattr(chunk, "choices", None):
+                continue
+            delta = getattr(chunk.choices[0].delta, "content", None)
+            if not isinstance(delta, str) or not delta:
+                continue
+            if first_token is None:
+                first_token = time.perf_counter() - started
+            parts.append(delta)
+            print(delta, end="", flush=True)
+        return "".join(parts), first_token
+    finally:
+        print()
+
+def summarise_turns(client, summary, messages):
+    """
+    Fold older messages into the running summary of the conversation.
+    """
+    transcript = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+    response = client.chat.completions.create(model=MODEL, messages=[
+        {"role": "developer", "content": "Update the summary of a conversation with a CTA commute planner. Keep stations, lines, times and user preferences. Reply with the summary only, in a few sentences."},
+        {"role": "user", "content": f"Summary so far: {summary or '(none)'}\n\nNew messages:\n{transcript}"},
+    ])
+    return response.choices[0].message.content
+
+def main():
+    client = OpenAI()
+    show_metrics = "--metrics" in sys.argv[1:]
+
+    # system prompt + recent turns, older turns are summarised
+    memory = ConversationMemory(
+        {"role": "developer", "content": SYSTEM_PROMPT},
+        summarise=lambda summary, messages: summarise_turns(client, summary, messages),
     )
 
-    # append model response to history
-    messages.append({"role": "assistant", "content": completion.choices[0].message.content})
+    # user query
+    print("Hello, I am your CTA assistant. How can I help you today?")
+
+    while True:
+        # user query
+        user_input = input("\n")
+
+        if user_input.lower() in ['exit', 'quit']:
+            break
+
+        memory.add_user(user_input)
+
+        # get response from model, printing it as it streams in
+        started = time.perf_counter()
+        try:
+            reply, first_token = stream_reply(client, memory.messages())
+        except Exception as e:
+            print(f"Error: {e}")
+            # forget the question, so the history doesn't hold a turn without an answer
+            memory.drop_unanswered()
+            continue
+
+        memory.add_assistant(reply)
+        if memory.summary_error is not None and show_metrics:
+            print(f"(could not summarise older messages, keeping them: {memory.summary_error})")
+
+        if show_metrics and first_token is not None:
+            print(f"(first token after {first_token:.2f}s, done after {time.perf_counter() - started:.2f}s, prompt ~{memory.prompt_tokens[-1]} tokens)")
 
-    # print model response
-    print(completion.choices[0].message.content)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
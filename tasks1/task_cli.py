@@ -1,6 +1,10 @@
 import json
 import argparse
 import os
+import sys
+
+from task_index import load_index, save_index
+from task_io import FORMATS, Timer, guess_format, open_input, open_output, read_records, write_records
 
 DATA_FILE = 'tasks.json'
 
@@ -16,10 +20,13 @@ def save_tasks(tasks):
 
 def add_task(title, description):
     tasks = load_tasks()
+    index = load_index(DATA_FILE, tasks)
     task_id = max([t['id'] for t in tasks], default=0) + 1
     task = {'id': task_id, 'title': title, 'description': description, 'status': 'pending'}
     tasks.append(task)
     save_tasks(tasks)
+    index.add(task)
+    save_index(index, DATA_FILE)
     print(f"Task added: {task}")
 
 def list_tasks():
@@ -31,14 +38,74 @@ def list_tasks():
         print(f"[{task['id']}] {task['title']} - {task['description']} (Status: {task['status']})")
 
 def search_tasks(query):
-    tasks = load_tasks()
-    found = [t for t in tasks if query.lower() in t['title'].lower() or query.lower() in t['description'].lower()]
+    # every word of the query must start a word in the title or description;
+    # results come from the index, so tasks.json is only read to rebuild it
+    index = load_index(DATA_FILE, load_tasks)
+    found = index.tasks(index.search(query))
     if not found:
         print("No matching tasks found.")
         return
     for task in found:
         print(f"[{task['id']}] {task['title']} - {task['description']} (Status: {task['status']})")
 
+TASK_FIELDS = ['id', 'title', 'description', 'status']
+
+def check_record(record):
+    "Reject a batch record that isn't an object, or whose title or status isn't a non-empty string."
+    if not isinstance(record, dict):
+        raise ValueError(f"expected an object, got {type(record).__name__}")
+    for field in ('title', 'status'):
+        if field in record and (not isinstance(record[field], str) or not record[field].strip()):
+            raise ValueError(f"{field} must be a non-empty string")
+    if 'description' in record and not isinstance(record['description'], str):
+        raise ValueError('description must be a string')
+
+def run_records(records):
+    """
+    Add tasks from {"op": "add", "title": ..., "description": ...} records
+    with a single load and save. Stops at the first bad record and saves
+    nothing; returns the number added, or None on error.
+    """
+    timer = Timer()
+    tasks = load_tasks()
+    index = load_index(DATA_FILE, tasks)
+    next_id = max([t['id'] for t in tasks], default=0) + 1
+    count = 0
+    try:
+        # the index changes are committed only once tasks.json is saved
+        with index.batch():
+            for count, record in enumerate(records, start=1):
+                check_record(record)
+                if record.get('op', 'add') != 'add':
+                    raise ValueError("only 'add' records are supported")
+                if not record.get('title'):
+                    raise ValueError('a task needs a title')
+                task = {'id': next_id, 'title': record['title'], 'description': record.get('description', ''), 'status': record.get('status', 'pending')}
+                next_id += 1
+                tasks.append(task)
+                index.add(task)
+            save_tasks(tasks)
+    except (ValueError, TypeError, KeyError) as e:
+        print(f"Record {count}: {e}. No changes were saved.", file=sys.stderr)
+        return None
+    save_index(index, DATA_FILE)
+    print(timer.report(count), file=sys.stderr)
+    return count
+
+def import_tasks(path, fmt=None):
+    with open_input(path) as f:
+        # imported tasks get new IDs
+        count = run_records({**record, 'op': 'add'} for record in read_records(f, guess_format(path, fmt)))
+    if count is not None:
+        print(f"Imported {count} tasks.")
+    return count
+
+def export_tasks(path='-', fmt=None):
+    timer = Timer()
+    with open_output(path) as f:
+        count = write_records(load_tasks(), f, TASK_FIELDS, guess_format(path, fmt))
+    print(f"Exported {timer.report(count, 'tasks')}", file=sys.stderr)
+
 def main():
     parser = argparse.ArgumentParser(description='Task CLI App')
     subparsers = parser.add_subparsers(dest='command')
@@ -52,6 +119,17 @@ def main():
     search_parser = subparsers.add_parser('search', help='Search tasks')
     search_parser.add_argument('query', help='Search query')
 
+    import_parser = subparsers.add_parser('import', help='Add tasks from a JSONL or CSV file')
+    import_parser.add_argument('path', help='File to read, or - for stdin')
+    import_parser.add_argument('--format', choices=FORMATS, help='Default: from the file extension')
+
+    export_parser = subparsers.add_parser('export', help='Write all tasks as JSONL or CSV')
+    export_parser.add_argument('path', nargs='?', default='-', help='File to write (default: stdout)')
+    export_parser.add_argument('--format', choices=FORMATS, help='Default: from the file extension')
+
+    batch_parser = subparsers.add_parser('batch', help='Apply JSONL change records from stdin in one save')
+    batch_parser.add_argument('--file', default='-', help='Read the records from a file instead')
+
     args = parser.parse_args()
 
     if args.command == 'add':
@@ -60,6 +138,15 @@ def main():
         list_tasks()
     elif args.command == 'search':
         search_tasks(args.query)
+    elif args.command == 'import':
+        if import_tasks(args.path, args.format) is None:
+            sys.exit(1)
+    elif args.command == 'export':
+        export_tasks(args.path, args.format)
+    elif args.command == 'batch':
+        with open_input(args.file) as f:
+            if run_records(read_records(f)) is None:
+                sys.exit(1)
     else:
         parser.print_help()
 
@@ -0,0 +1,72 @@
+import contextlib
+import csv
+import json
+import sys
+import time
+
+FORMATS = ('jsonl', 'csv')
+
+def guess_format(path, fmt=None):
+    "Use fmt if given, otherwise go by the file extension (JSONL unless it ends in .csv)."
+    if fmt:
+        return fmt
+    return 'csv' if str(path or '').lower().endswith('.csv') else 'jsonl'
+
+def open_input(path):
+    "Open path for reading records; - means stdin (which is left open afterwards)."
+    if path == '-':
+        return contextlib.nullcontext(sys.stdin)
+    return open(path, newline='', encoding='utf-8')
+
+def open_output(path):
+    "Open path for writing records; - means stdout."
+    if path == '-':
+        return contextlib.nullcontext(sys.stdout)
+    return open(path, 'w', newline='', encoding='utf-8')
+
+def read_records(stream, fmt='jsonl'):
+    """
+    Yield one dict per JSONL line or CSV row. Empty CSV cells are left out.
+    A JSONL line that isn't a JSON object raises ValueError.
+    """
+    if fmt == 'csv':
+        for row in csv.DictReader(stream):
+            yield {key: value for key, value in row.items() if key and value not in (None, '')}
+        return
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"line {line_number}: {e}") from e
+        if not isinstance(record, dict):
+            raise ValueError(f"line {line_number}: expected a JSON object, got {type(record).__name__}")
+        yield record
+
+def write_records(records, stream, fields, fmt='jsonl'):
+    "Write records as JSONL or CSV (with a header of fields). Returns how many were written."
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            count += 1
+        return count
+    for record in records:
+        stream.write(json.dumps({field: record[field] for field in fields if field in record}) + '\n')
+        count += 1
+    return count
+
+class Timer:
+    "Measures a bulk operation and describes its throughput."
+
+    def __init__(self):
+        self.started = time.perf_counter()
+
+    def report(self, count, what='records'):
+        elapsed = time.perf_counter() - self.started
+        rate = count / elapsed if elapsed > 0 else float('inf')
+        return f"{count} {what} in {elapsed:.2f}s ({rate:,.0f} {what}/sec)"
@@ -0,0 +1,41 @@
+import io
+import json
+from unittest.mock import patch
+
+import task_cli
+
+def test_import_batch_export(tmp_path, monkeypatch):
+    monkeypatch.setattr(task_cli, 'DATA_FILE', str(tmp_path / 'tasks.json'))
+    csv_file = tmp_path / 'in.csv'
+    csv_file.write_text('title,description\nBuy milk,From the store\nCall Bob,\n')
+    assert task_cli.import_tasks(str(csv_file)) == 2
+    assert task_cli.run_records([{'op': 'add', 'title': 'Pay rent', 'status': 'done'}]) == 1
+    # a bad record rolls back the whole batch
+    assert task_cli.run_records([{'title': 'x'}, [1]]) is None
+    assert task_cli.run_records([{'title': 'x', 'status': ''}]) is None
+    assert task_cli.run_records([{'op': 'delete', 'id': 1}]) is None
+    batch = tmp_path / 'batch.jsonl'
+    batch.write_text('{"title": "x"}\n"x"\n')
+    assert task_cli.import_tasks(str(batch)) is None
+
+    out = io.StringIO()
+    with patch('sys.stdout', out):
+        task_cli.export_tasks()
+    assert [json.loads(line) for line in out.getvalue().splitlines()] == [
+        {'id': 1, 'title': 'Buy milk', 'description': 'From the store', 'status': 'pending'},
+        {'id': 2, 'title': 'Call Bob', 'description': '', 'status': 'pending'},
+        {'id': 3, 'title': 'Pay rent', 'description': '', 'status': 'done'},
+    ]
+    with patch('builtins.print') as mock_print:
+        task_cli.search_tasks('rent')
+    mock_print.assert_called_once_with("[3] Pay rent -  (Status: done)")
+
+def test_failed_batch_leaves_the_index_alone(tmp_path, monkeypatch):
+    monkeypatch.setattr(task_cli, 'DATA_FILE', str(tmp_path / 'tasks.json'))
+    with patch('builtins.print'):
+        task_cli.add_task('Buy milk', 'From the store')
+    assert task_cli.run_records([{'title': 'Phantom task', 'description': 'ghost'}, {'op': 'delete', 'id': 1}]) is None
+    with patch('builtins.print') as mock_print:
+        task_cli.search_tasks('phantom')
+        task_cli.search_tasks('milk')
+    assert [c.args[0] for c in mock_print.call_args_list] == ["No matching tasks found.", "[1] Buy milk - From the store (Status: pending)"]
@@ -1,6 +1,11 @@
 import json
 import argparse
 import os
+import sys
+
+from task_index import load_index, save_index
+from task_io import FORMATS, Timer, guess_format, open_input, open_output, read_records, write_records
+from task_store import TaskStore
 
 DATA_FILE = 'tasks.json'
 
@@ -14,52 +19,176 @@ def save_tasks(tasks):
     with open(DATA_FILE, 'w') as f:
         json.dump(tasks, f, indent=2)
 
+def meta_path():
+    "The ID counter lives next to the tasks file: tasks.json -> tasks.meta.json"
+    return os.path.splitext(DATA_FILE)[0] + '.meta.json'
+
+def load_store():
+    try:
+        with open(meta_path(), 'r') as f:
+            next_id = json.load(f).get('next_id')
+    except (OSError, ValueError):
+        next_id = None
+    return TaskStore(load_tasks(), next_id)
+
+def save_store(store):
+    if store.needs_compaction():
+        store.compact()
+    # counter first: if we stop before the tasks are written, an ID is skipped, never reused
+    with open(meta_path(), 'w') as f:
+        json.dump({'next_id': store.next_id}, f)
+    save_tasks(store.records)
+
+def format_task(task, ordinal=None):
+    line = f"[{task['id']}] {task['title']} - {task['description']} (Status: {task['status']})"
+    return line if ordinal is None else f"{ordinal}. {line}"
+
+def resolve_id(store, number, ordinal):
+    "With ordinal=True, number is a position in the list (1, 2, 3...) rather than a task ID."
+    return store.id_for_ordinal(number) if ordinal else number
+
 def add_task(title, description):
-    tasks = load_tasks()
-    task_id = max([t['id'] for t in tasks], default=0) + 1
-    task = {'id': task_id, 'title': title, 'description': description, 'status': 'pending'}
-    tasks.append(task)
-    save_tasks(tasks)
+    store = load_store()
+    index = load_index(DATA_FILE, store)
+    task = store.add(title, description)
+    save_store(store)
+    index.add(task)
+    save_index(index, DATA_FILE)
     print(f"Task added: {task}")
 
-def list_tasks():
-    tasks = load_tasks()
-    if not tasks:
+def list_tasks(ordinal=False):
+    store = TaskStore(load_tasks())
+    if not len(store):
         print("No tasks found.")
         return
-    for task in tasks:
-        print(f"[{task['id']}] {task['title']} - {task['description']} (Status: {task['status']})")
+    for n, task in enumerate(store, start=1):
+        print(format_task(task, n if ordinal else None))
 
 def search_tasks(query):
-    tasks = load_tasks()
-    found = [t for t in tasks if query.lower() in t['title'].lower() or query.lower() in t['description'].lower()]
+    # every word of the query must start a word in the title or description;
+    # results come from the index, so tasks.json is only read to rebuild it
+    index = load_index(DATA_FILE, load_store)
+    found = index.tasks(index.search(query))
     if not found:
         print("No matching tasks found.")
         return
     for task in found:
-        print(f"[{task['id']}] {task['title']} - {task['description']} (Status: {task['status']})")
-
-def update_task_status(task_id, new_status):
-    tasks = load_tasks()
-    for task in tasks:
-        if task['id'] == task_id:
-            task['status'] = new_status
-            save_tasks(tasks)
-            print(f"Task [{task_id}] status updated to '{new_status}'.")
-            return
-    print(f"No task found with ID {task_id}.")
-
-def delete_task(task_id):
-    tasks = load_tasks()
-    new_tasks = [task for task in tasks if task['id'] != task_id]
-    if len(new_tasks) == len(tasks):
-        print(f"No task found with ID {task_id}.")
+        print(format_task(task))
+
+def update_task_status(task_id, new_status, ordinal=False):
+    if not new_status.strip():
+        print("The status can't be empty.")
+        return
+    store = load_store()
+    task = store.get(resolve_id(store, task_id, ordinal))
+    if task is None:
+        print(f"No task found with {'number' if ordinal else 'ID'} {task_id}.")
         return
-    # Reassign IDs in chronological order
-    for idx, task in enumerate(new_tasks, start=1):
-        task['id'] = idx
-    save_tasks(new_tasks)
-    print(f"Task [{task_id}] deleted and IDs reordered.")
+    task['status'] = new_status
+    index = load_index(DATA_FILE, store)
+    save_store(store)
+    index.add(task)
+    save_index(index, DATA_FILE)
+    print(f"Task [{task['id']}] status updated to '{new_status}'.")
+
+def delete_task(task_id, ordinal=False):
+    store = load_store()
+    removed = store.delete(resolve_id(store, task_id, ordinal))
+    if removed is None:
+        print(f"No task found with {'number' if ordinal else 'ID'} {task_id}.")
+        return
+    index = load_index(DATA_FILE, store)
+    save_store(store)
+    index.remove(removed['id'])
+    save_index(index, DATA_FILE)
+    print(f"Task [{removed['id']}] deleted.")
+
+def compact_tasks():
+    store = load_store()
+    tombstones = store.tombstones
+    index = load_index(DATA_FILE, store)
+    store.compact()
+    save_store(store)
+    save_index(index, DATA_FILE)
+    print(f"Removed {tombstones} deleted task(s).")
+
+TASK_FIELDS = ['id', 'title', 'description', 'status']
+
+def check_record(record):
+    "Reject a batch record that isn't an object, or whose title or status isn't a non-empty string."
+    if not isinstance(record, dict):
+        raise ValueError(f"expected an object, got {type(record).__name__}")
+    for field in ('title', 'status'):
+        if field in record and (not isinstance(record[field], str) or not record[field].strip()):
+            raise ValueError(f"{field} must be a non-empty string")
+    if 'description' in record and not isinstance(record['description'], str):
+        raise ValueError('description must be a string')
+
+def apply_record(store, index, record):
+    """
+    Apply one batch record to the store and search index:
+      {"op": "add", "title": ..., "description": ..., "status": ...}
+      {"op": "update", "id": N, "status": ...}
+      {"op": "delete", "id": N}
+    """
+    check_record(record)
+    op = record.get('op', 'add')
+    if op == 'add':
+        if not record.get('title'):
+            raise ValueError('a task needs a title')
+        task = store.add(record['title'], record.get('description', ''), record.get('status', 'pending'))
+        index.add(task)
+    elif op == 'update':
+        if 'status' not in record:
+            raise ValueError('an update needs a status')
+        task = store.get(int(record['id']))
+        if task is None:
+            raise ValueError(f"no task with ID {record['id']}")
+        task['status'] = record['status']
+        index.add(task)
+    elif op == 'delete':
+        removed = store.delete(int(record['id']))
+        if removed is None:
+            raise ValueError(f"no task with ID {record['id']}")
+        index.remove(removed['id'])
+    else:
+        raise ValueError(f"unknown op {op!r}")
+
+def run_records(records):
+    """
+    Apply records with a single load and save. Stops at the first bad
+    record and saves nothing; returns the number applied, or None on error.
+    """
+    timer = Timer()
+    store = load_store()
+    index = load_index(DATA_FILE, store)
+    count = 0
+    try:
+        # the index changes are committed only once tasks.json is saved
+        with index.batch():
+            for count, record in enumerate(records, start=1):
+                apply_record(store, index, record)
+            save_store(store)
+    except (ValueError, TypeError, KeyError) as e:
+        print(f"Record {count}: {e}. No changes were saved.", file=sys.stderr)
+        return None
+    save_index(index, DATA_FILE)
+    print(timer.report(count), file=sys.stderr)
+    return count
+
+def import_tasks(path, fmt=None):
+    with open_input(path) as f:
+        # imported tasks get new IDs
+        count = run_records({**record, 'op': 'add'} for record in read_records(f, guess_format(path, fmt)))
+    if count is not None:
+        print(f"Imported {count} tasks.")
+    return count
+
+def export_tasks(path='-', fmt=None):
+    timer = Timer()
+    with open_output(path) as f:
+        count = write_records(load_store(), f, TASK_FIELDS, guess_format(path, fmt))
+    print(f"Exported {timer.report(count, 'tasks')}", file=sys.stderr)
 
 def main():
     parser = argparse.ArgumentParser(description='Task CLI App')
@@ -70,6 +199,7 @@ def main():
     add_parser.add_argument('description', help='Task description')
 
     list_parser = subparsers.add_parser('list', help='List all tasks')
+    list_parser.add_argument('--ordinal', action='store_true', help='Number the tasks 1, 2, 3... as well as showing their IDs')
 
     search_parser = subparsers.add_parser('search', help='Search tasks')
     search_parser.add_argument('query', help='Search query')
@@ -77,22 +207,48 @@ def main():
     update_parser = subparsers.add_parser('update', help='Update task status')
     update_parser.add_argument('id', type=int, help='Task ID')
     update_parser.add_argument('status', help='New status')
+    update_parser.add_argument('--ordinal', action='store_true', help='ID is the task\'s number in `list --ordinal`')
 
     delete_parser = subparsers.add_parser('delete', help='Delete a task')
     delete_parser.add_argument('id', type=int, help='Task ID')
+    delete_parser.add_argument('--ordinal', action='store_true', help='ID is the task\'s number in `list --ordinal`')
+
+    subparsers.add_parser('compact', help='Drop deleted tasks from tasks.json (IDs are kept)')
+
+    import_parser = subparsers.add_parser('import', help='Add tasks from a JSONL or CSV file')
+    import_parser.add_argument('path', help='File to read, or - for stdin')
+    import_parser.add_argument('--format', choices=FORMATS, help='Default: from the file extension')
+
+    export_parser = subparsers.add_parser('export', help='Write all tasks as JSONL or CSV')
+    export_parser.add_argument('path', nargs='?', default='-', help='File to write (default: stdout)')
+    export_parser.add_argument('--format', choices=FORMATS, help='Default: from the file extension')
+
+    batch_parser = subparsers.add_parser('batch', help='Apply JSONL change records from stdin in one save')
+    batch_parser.add_argument('--file', default='-', help='Read the records from a file instead')
 
     args = parser.parse_args()
 
     if args.command == 'add':
         add_task(args.title, args.description)
     elif args.command == 'list':
-        list_tasks()
+        list_tasks(args.ordinal)
     elif args.command == 'search':
         search_tasks(args.query)
     elif args.command == 'update':
-        update_task_status(args.id, args.status)
+        update_task_status(args.id, args.status, args.ordinal)
     elif args.command == 'delete':
-        delete_task(args.id)
+        delete_task(args.id, args.ordinal)
+    elif args.command == 'compact':
+        compact_tasks()
+    elif args.command == 'import':
+        if import_tasks(args.path, args.format) is None:
+            sys.exit(1)
+    elif args.command == 'export':
+        export_tasks(args.path, args.format)
+    elif args.command == 'batch':
+        with open_input(args.file) as f:
+            if run_records(read_records(f)) is None:
+                sys.exit(1)
     else:
         parser.print_help()
 
@@ -0,0 +1,220 @@
+import math
+import os
+import re
+import sqlite3
+from contextlib import contextmanager, nullcontext
+
+INDEX_VERSION = 2
+TITLE_WEIGHT = 2
+PREFIX_WEIGHT = 0.5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    token TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    weight INTEGER NOT NULL,
+    PRIMARY KEY (token, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_id ON postings(id);
+"""
+
+def tokenize(text):
+    return re.findall(r"\w+", text.lower())
+
+def index_path(data_file):
+    "The index lives next to the tasks file: tasks.json -> tasks.index"
+    return os.path.splitext(data_file)[0] + '.index'
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+def _prefix_end(term):
+    "The smallest string after every string starting with term."
+    return term[:-1] + chr(ord(term[-1]) + 1)
+
+def _weights(task):
+    weights = {}
+    for token in tokenize(task['title']):
+        weights[token] = weights.get(token, 0) + TITLE_WEIGHT
+    for token in tokenize(task['description']):
+        weights[token] = weights.get(token, 0) + 1
+    return weights
+
+class TaskIndex:
+    """
+    Inverted index over task titles and descriptions, kept in SQLite.
+
+    postings holds (token, task id, weight) rows, where a title occurrence
+    counts TITLE_WEIGHT times a description occurrence. They are keyed by
+    token, so all tokens starting with a prefix are one range scan away, and
+    a search reads only the rows for its terms. docs keeps a copy of each
+    indexed task, so search results can be shown without reading tasks.json.
+    Adding or removing a task writes only that task's rows, committed at
+    once unless it happens inside batch().
+    """
+
+    def __init__(self, path=':memory:'):
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self._batching = False
+
+    @classmethod
+    def build(cls, tasks, path=':memory:'):
+        index = cls(path)
+        index.rebuild(tasks)
+        return index
+
+    def rebuild(self, tasks):
+        tasks = list(tasks)
+        with self.db:
+            self.db.execute('DELETE FROM postings')
+            self.db.execute('DELETE FROM docs')
+            self._insert(tasks)
+            self._set('version', INDEX_VERSION)
+
+    def close(self):
+        self.db.close()
+
+    @contextmanager
+    def batch(self):
+        """
+        Group changes in one transaction: committed when the block finishes,
+        rolled back if it raises.
+        """
+        with self.db:
+            self._batching = True
+            try:
+                yield self
+            finally:
+                self._batching = False
+
+    def _write(self):
+        return nullcontext() if self._batching else self.db
+
+    def _get(self, key):
+        row = self.db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row and row[0]
+
+    def _set(self, key, value):
+        self.db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', (key, value))
+
+    def _insert(self, tasks):
+        self.db.executemany('INSERT INTO docs VALUES (?, ?, ?, ?)', ((task['id'], task['title'], task['description'], task['status']) for task in tasks))
+        self.db.executemany('INSERT INTO postings VALUES (?, ?, ?)', ((token, task['id'], weight) for task in tasks for token, weight in _weights(task).items()))
+
+    def _remove(self, task_id):
+        self.db.execute('DELETE FROM postings WHERE id = ?', (task_id,))
+        self.db.execute('DELETE FROM docs WHERE id = ?', (task_id,))
+
+    def add(self, task):
+        "Index task, replacing what was indexed under its ID."
+        with self._write():
+            self._remove(task['id'])
+            self._insert([task])
+
+    def remove(self, task_id):
+        with self._write():
+            self._remove(task_id)
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM docs').fetchone()[0]
+
+    def postings(self):
+        "{token: {task id: weight}} for everything indexed."
+        result = {}
+        for token, task_id, weight in self.db.execute('SELECT token, id, weight FROM postings ORDER BY token, id'):
+            result.setdefault(token, {})[task_id] = weight
+        return result
+
+    def _matches(self, term, doc_count):
+        "Scores for every task with a token equal to, or starting with, term."
+        rows = self.db.execute('SELECT token, id, weight FROM postings WHERE token >= ? AND token < ? ORDER BY token', (term, _prefix_end(term)))
+        postings = {}
+        for token, task_id, weight in rows:
+            postings.setdefault(token, []).append((task_id, weight))
+        scores = {}
+        for token, found in postings.items():
+            idf = math.log(1 + doc_count / len(found))
+            factor = idf if token == term else idf * PREFIX_WEIGHT
+            for task_id, weight in found:
+                scores[task_id] = max(scores.get(task_id, 0), weight * factor)
+        return scores
+
+    def search(self, query, limit=None):
+        """
+        Return the IDs of tasks matching every term of query (each as a word
+        or word prefix), best matches first.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        doc_count = len(self)
+        matches = sorted((self._matches(term, doc_count) for term in terms), key=len)
+        scores = matches[0]
+        for other in matches[1:]:
+            scores = {i: s + other[i] for i, s in scores.items() if i in other}
+            if not scores:
+                return []
+        ranked = sorted(scores, key=lambda i: (-scores[i], i))
+        return ranked[:limit] if limit else ranked
+
+    def tasks(self, task_ids):
+        "The indexed copies of the given tasks, in the same order; IDs no longer indexed are skipped."
+        found = []
+        for task_id in task_ids:
+            row = self.db.execute('SELECT id, title, description, status FROM docs WHERE id = ?', (task_id,)).fetchone()
+            if row is not None:
+                found.append(dict(zip(('id', 'title', 'description', 'status'), row)))
+        return found
+
+    @property
+    def source(self):
+        return self._get('source')
+
+    def mark_source(self, signature):
+        "Record that the index matches the tasks file with this signature."
+        with self._write():
+            self._set('source', signature)
+
+def open_index(path):
+    "Open the index at path, starting a new one if it isn't a usable index."
+    db = sqlite3.connect(path)
+    try:
+        version = db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+    except sqlite3.DatabaseError:
+        # an older pickled index, a damaged file, or one without tables yet
+        version = None
+    finally:
+        db.close()
+    if version != (INDEX_VERSION,):
+        os.remove(path)
+    return TaskIndex(path)
+
+def load_index(data_file, tasks):
+    """
+    Return the index for data_file, rebuilding it from tasks when it is
+    missing or the tasks file changed since it was last in sync. tasks may be
+    a function returning them, so they are only read when a rebuild is needed.
+    """
+    path = index_path(data_file)
+    signature = file_signature(data_file)
+    index = open_index(path)
+    if index._get('version') != INDEX_VERSION or index.source != signature:
+        index.rebuild(tasks() if callable(tasks) else tasks)
+        index.mark_source(signature)
+    return index
+
+def save_index(index, data_file):
+    "Mark index as up to date with the current tasks file."
+    index.mark_source(file_signature(data_file))
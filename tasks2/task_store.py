@@ -0,0 +1,70 @@
+COMPACT_MIN_TOMBSTONES = 64
+COMPACT_RATIO = 0.25
+
+class TaskStore:
+    """
+    Tasks keyed by an ID that never changes or gets reused.
+
+    records is the list saved to tasks.json. A deleted task stays in it as a
+    tombstone ({'id': ..., 'deleted': True}) so deleting doesn't shift the
+    other tasks or change their IDs. The whole list is still written out on
+    every save. Tombstones are dropped by compact(), which save time
+    triggers once they make up COMPACT_RATIO of the records. next_id is the
+    persisted counter new IDs come from.
+    """
+
+    def __init__(self, records, next_id=None):
+        self.records = records
+        self.by_id = {record['id']: record for record in records}
+        self.tombstones = sum(1 for record in records if record.get('deleted'))
+        if next_id is None:
+            # no saved counter (older tasks.json): start after the highest ID
+            next_id = max(self.by_id, default=0) + 1
+        self.next_id = next_id
+
+    def __iter__(self):
+        return (record for record in self.records if not record.get('deleted'))
+
+    def __len__(self):
+        return len(self.records) - self.tombstones
+
+    def get(self, task_id):
+        record = self.by_id.get(task_id)
+        return None if record is None or record.get('deleted') else record
+
+    def add(self, title, description, status='pending'):
+        task = {'id': self.next_id, 'title': title, 'description': description, 'status': status}
+        self.next_id += 1
+        self.records.append(task)
+        self.by_id[task['id']] = task
+        return task
+
+    def delete(self, task_id):
+        "Replace the task with a tombstone; returns the removed task or None."
+        record = self.get(task_id)
+        if record is None:
+            return None
+        removed = dict(record)
+        record.clear()
+        record.update({'id': task_id, 'deleted': True})
+        self.tombstones += 1
+        return removed
+
+    def needs_compaction(self):
+        return self.tombstones >= COMPACT_MIN_TOMBSTONES and self.tombstones >= COMPACT_RATIO * len(self.records)
+
+    def compact(self):
+        "Drop tombstones. IDs are unchanged."
+        self.records[:] = [record for record in self.records if not record.get('deleted')]
+        self.by_id = {record['id']: record for record in self.records}
+        self.tombstones = 0
+
+    def ordinals(self):
+        "Contiguous display numbers: {task id: 1, 2, 3...} in creation order."
+        return {task['id']: n for n, task in enumerate(self, start=1)}
+
+    def id_for_ordinal(self, ordinal):
+        for n, task in enumerate(self, start=1):
+            if n == ordinal:
+                return task['id']
+        return None
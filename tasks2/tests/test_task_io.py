@@ -0,0 +1,52 @@
+import io
+import json
+from unittest.mock import patch
+
+import pytest
+
+import task_cli
+
+def test_import_batch_export(tmp_path, monkeypatch):
+    monkeypatch.setattr(task_cli, 'DATA_FILE', str(tmp_path / 'tasks.json'))
+    csv_file = tmp_path / 'in.csv'
+    csv_file.write_text('title,description\nBuy milk,From the store\nCall Bob,\n')
+    assert task_cli.import_tasks(str(csv_file)) == 2
+
+    records = [
+        {'op': 'add', 'title': 'Pay rent', 'description': 'Before the 1st'},
+        {'op': 'update', 'id': 2, 'status': 'done'},
+        {'op': 'delete', 'id': 1},
+    ]
+    assert task_cli.run_records(records) == 3
+    # a bad record rolls back the whole batch
+    assert task_cli.run_records([{'op': 'delete', 'id': 2}, [1]]) is None
+    assert task_cli.run_records([{'op': 'update', 'id': 2, 'status': ''}]) is None
+    assert task_cli.run_records([{'op': 'update', 'id': 2, 'status': None}]) is None
+    batch = tmp_path / 'batch.jsonl'
+    batch.write_text('{"op": "delete", "id": 2}\n[1]\n')
+    with batch.open() as f, patch('sys.stdin', f), patch('sys.argv', ['task_cli.py', 'batch']), pytest.raises(SystemExit) as exited:
+        task_cli.main()
+    assert exited.value.code == 1
+
+    out = io.StringIO()
+    with patch('sys.stdout', out):
+        task_cli.export_tasks()
+    assert [json.loads(line) for line in out.getvalue().splitlines()] == [
+        {'id': 2, 'title': 'Call Bob', 'description': '', 'status': 'done'},
+        {'id': 3, 'title': 'Pay rent', 'description': 'Before the 1st', 'status': 'pending'},
+    ]
+    with patch('builtins.print') as mock_print:
+        task_cli.update_task_status(2, '')
+    mock_print.assert_called_once_with("The status can't be empty.")
+
+def test_failed_batch_leaves_the_index_alone(tmp_path, monkeypatch):
+    monkeypatch.setattr(task_cli, 'DATA_FILE', str(tmp_path / 'tasks.json'))
+    with patch('builtins.print'):
+        task_cli.add_task('Buy milk', 'From the store')
+        task_cli.add_task('Call Bob', 'About the trip')
+    records = [{'op': 'add', 'title': 'Phantom task', 'description': 'ghost'}, {'op': 'delete', 'id': 1}, {'op': 'delete', 'id': 99}]
+    assert task_cli.run_records(records) is None
+    with patch('builtins.print') as mock_print:
+        task_cli.search_tasks('phantom')
+        task_cli.search_tasks('milk')
+    assert [c.args[0] for c in mock_print.call_args_list] == ["No matching tasks found.", "[1] Buy milk - From the store (Status: pending)"]
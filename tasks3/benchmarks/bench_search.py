@@ -0,0 +1,102 @@
+"""
+Time task searches with the index against the old linear scan.
+
+    uv run python benchmarks/bench_search.py [--tasks 1000000] [--queries 200]
+
+Tasks are synthetic: titles and descriptions drawn from a vocabulary of
+made-up words with a Zipf-like distribution, like real text. They are saved
+to a temporary tasks.json. Each kind of query is timed twice:
+
+- lookup: TaskIndex.search alone, on an index opened once, which is the
+  cost the index itself adds per query;
+- search: task_cli.search_tasks, i.e. what one `task_cli search` run does
+  besides Python start-up: opening the index, checking it against
+  tasks.json, the lookup, reading the matching tasks and printing them (to
+  a buffer).
+
+Opening the index is also timed on its own, so the rest of the CLI's
+overhead is search minus lookup minus open.
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from tasks3 import task_cli
+from tasks3.task_index import TaskIndex, index_path, load_index
+
+def make_tasks(count, vocab_size=50000, seed=1):
+    rng = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    vocab = [''.join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(vocab_size)]
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(vocab_size)))
+    tasks = []
+    for task_id in range(1, count + 1):
+        words = rng.choices(vocab, cum_weights=cum_weights, k=12)
+        tasks.append({'id': task_id, 'title': ' '.join(words[:3]), 'description': ' '.join(words[3:]), 'status': 'pending'})
+    return tasks, vocab
+
+def linear_search(query):
+    "The search command before the index: load tasks.json and scan it."
+    tasks = task_cli.load_tasks()
+    for task in tasks:
+        if query.lower() in task['title'].lower() or query.lower() in task['description'].lower():
+            print(task_cli.format_task(task))
+
+def timed(func, args):
+    times = []
+    for arg in args:
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func(arg)
+        times.append(time.perf_counter() - started)
+    return times
+
+def report(label, times):
+    times = sorted(times)
+    print(f"{label:<28} median {statistics.median(times) * 1000:8.3f} ms   p95 {times[int(len(times) * 0.95)] * 1000:8.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tasks', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--slow-runs', type=int, default=5, help='commands that read all of tasks.json are slow; time only a few')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    tasks, vocab = make_tasks(args.tasks)
+    print(f"Generated {len(tasks)} tasks in {time.perf_counter() - started:.1f}s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        task_cli.DATA_FILE = os.path.join(tmp, 'tasks.json')
+        task_cli.save_tasks(tasks)
+        started = time.perf_counter()
+        load_index(task_cli.DATA_FILE, tasks).close()
+        print(f"Built index in {time.perf_counter() - started:.1f}s")
+
+        rng = random.Random(2)
+        # two-word queries over the less common words, as someone looking for a specific task would type
+        single = [rng.choice(vocab[1000:]) for _ in range(args.queries)]
+        pairs = [' '.join(rng.sample(vocab[100:], 2)) for _ in range(args.queries)]
+        prefixes = [word[:4] for word in single if len(word) > 4]
+
+        index = TaskIndex(index_path(task_cli.DATA_FILE))
+        report('lookup: one word', timed(index.search, single))
+        report('lookup: two words (AND)', timed(index.search, pairs))
+        report('lookup: prefix', timed(index.search, prefixes))
+        index.close()
+        report('open index', timed(lambda _: load_index(task_cli.DATA_FILE, task_cli.load_store).close(), single))
+        report('search: one word', timed(task_cli.search_tasks, single))
+        report('search: two words (AND)', timed(task_cli.search_tasks, pairs))
+        report('search: prefix', timed(task_cli.search_tasks, prefixes))
+        report('linear scan: one word', timed(linear_search, single[:args.slow_runs]))
+        # add still loads and saves all of tasks.json; the index only writes the new task's rows
+        report('add', timed(lambda n: task_cli.add_task(f"task {n}", 'added by the benchmark'), range(args.slow_runs)))
+
+if __name__ == '__main__':
+    main()
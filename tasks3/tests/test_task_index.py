@@ -0,0 +1,64 @@
+import os
+from unittest.mock import patch
+
+from tasks3 import task_cli
+from tasks3.task_index import TaskIndex, index_path, load_index
+
+TASKS = [
+    {'id': 1, 'title': 'Buy milk', 'description': 'From the store on Belmont', 'status': 'pending'},
+    {'id': 2, 'title': 'Store receipts', 'description': 'File the milk receipts', 'status': 'pending'},
+    {'id': 3, 'title': 'Call Bob', 'description': 'About the trip', 'status': 'complete'},
+]
+
+def test_search_and_terms_prefixes_ranking():
+    index = TaskIndex.build(TASKS)
+    assert index.search('milk') == [1, 2]           # title matches rank first
+    assert index.search('stor') == [2, 1]
+    assert index.search('milk belm') == [1]
+    assert index.search('milk bob') == []
+    assert index.search('  ') == []
+    assert [task['title'] for task in index.tasks([3, 9, 1])] == ['Call Bob', 'Buy milk']
+
+def test_incremental_updates_match_rebuild():
+    index = TaskIndex.build(TASKS[:1])
+    for task in TASKS[1:]:
+        index.add(task)
+    index.remove(2)
+    rebuilt = TaskIndex.build([TASKS[0], TASKS[2]])
+    assert index.postings() == rebuilt.postings()
+    assert len(index) == 2
+
+def test_cli_keeps_index_in_sync(tmp_path, monkeypatch):
+    data_file = str(tmp_path / 'tasks.json')
+    monkeypatch.setattr(task_cli, 'DATA_FILE', data_file)
+    with patch('builtins.print') as mock_print:
+        task_cli.add_task('Buy milk', 'From the store')
+        task_cli.add_task('Call Bob', 'About the trip')
+        task_cli.delete_task(1)
+        task_cli.update_task_status(2, 'done')
+        task_cli.search_tasks('bo')
+    mock_print.assert_any_call("[2] Call Bob - About the trip (Status: done)")
+    assert os.path.exists(index_path(data_file))
+    assert load_index(data_file, []).search('call') == [2]
+
+def test_search_reads_tasks_only_to_rebuild(tmp_path, monkeypatch):
+    data_file = str(tmp_path / 'tasks.json')
+    monkeypatch.setattr(task_cli, 'DATA_FILE', data_file)
+    with patch('builtins.print'):
+        task_cli.add_task('Buy milk', 'From the store')
+    with patch.object(task_cli, 'load_tasks', side_effect=AssertionError('read tasks.json')), patch('builtins.print') as mock_print:
+        task_cli.search_tasks('milk')
+    mock_print.assert_called_once_with("[1] Buy milk - From the store (Status: pending)")
+
+    # edited by hand: the index is rebuilt
+    with open(data_file, 'w') as f:
+        f.write('[{"id": 7, "title": "Edited", "description": "", "status": "pending"}]')
+    with patch('builtins.print') as mock_print:
+        task_cli.search_tasks('edit')
+    mock_print.assert_called_once_with("[7] Edited -  (Status: pending)")
+
+def test_old_pickled_index_is_replaced(tmp_path):
+    data_file = str(tmp_path / 'tasks.json')
+    with open(index_path(data_file), 'wb') as f:
+        f.write(b'\x80\x05not an index')
+    assert load_index(data_file, TASKS).search('bob') == [3]
@@ -0,0 +1,63 @@
+import io
+import json
+from unittest.mock import patch
+
+import pytest
+
+from tasks3 import task_cli
+from tasks3.task_io import read_records
+
+def test_import_batch_export(tmp_path, monkeypatch):
+    monkeypatch.setattr(task_cli, 'DATA_FILE', str(tmp_path / 'tasks.json'))
+    csv_file = tmp_path / 'in.csv'
+    csv_file.write_text('title,description\nBuy milk,From the store\nCall Bob,\n')
+    assert task_cli.import_tasks(str(csv_file)) == 2
+
+    records = [
+        {'op': 'add', 'title': 'Pay rent', 'description': 'Before the 1st'},
+        {'op': 'update', 'id': 2, 'status': 'done'},
+        {'op': 'delete', 'id': 1},
+    ]
+    assert task_cli.run_records(records) == 3
+    # a bad record rolls back the whole batch
+    assert task_cli.run_records([{'op': 'delete', 'id': 2}, {'op': 'delete', 'id': 1}]) is None
+
+    out = io.StringIO()
+    with patch('sys.stdout', out):
+        task_cli.export_tasks()
+    assert [json.loads(line) for line in out.getvalue().splitlines()] == [
+        {'id': 2, 'title': 'Call Bob', 'description': '', 'status': 'done'},
+        {'id': 3, 'title': 'Pay rent', 'description': 'Before the 1st', 'status': 'pending'},
+    ]
+    with patch('builtins.print') as mock_print:
+        task_cli.search_tasks('rent')
+    mock_print.assert_called_once_with("[3] Pay rent - Before the 1st (Status: pending)")
+
+def test_bad_records_are_rejected(tmp_path, monkeypatch):
+    monkeypatch.setattr(task_cli, 'DATA_FILE', str(tmp_path / 'tasks.json'))
+    assert task_cli.run_records([{'title': 'a'}]) == 1
+    assert task_cli.run_records([[1]]) is None
+    assert task_cli.run_records([{'op': 'update', 'id': 1, 'status': ''}]) is None
+    assert task_cli.run_records([{'op': 'update', 'id': 1, 'status': 3}]) is None
+    assert task_cli.run_records([{'op': 'update', 'id': 1}]) is None
+    with pytest.raises(ValueError, match='line 2: expected a JSON object'):
+        list(read_records(io.StringIO('{"title": "a"}\n[1]\n')))
+    batch = tmp_path / 'batch.jsonl'
+    batch.write_text('{"title": "b"}\n[1]\n')
+    assert task_cli.import_tasks(str(batch)) is None
+    with patch('builtins.print') as mock_print:
+        task_cli.update_task_status(1, ' ')
+    mock_print.assert_called_once_with("The status can't be empty.")
+    assert [task['status'] for task in task_cli.load_tasks()] == ['pending']
+
+def test_failed_batch_leaves_the_index_alone(tmp_path, monkeypatch):
+    monkeypatch.setattr(task_cli, 'DATA_FILE', str(tmp_path / 'tasks.json'))
+    with patch('builtins.print'):
+        task_cli.add_task('Buy milk', 'From the store')
+        task_cli.add_task('Call Bob', 'About the trip')
+    records = [{'op': 'add', 'title': 'Phantom task', 'description': 'ghost'}, {'op': 'delete', 'id': 1}, {'op': 'delete', 'id': 99}]
+    assert task_cli.run_records(records) is None
+    with patch('builtins.print') as mock_print:
+        task_cli.search_tasks('phantom')
+        task_cli.search_tasks('milk')
+    assert [c.args[0] for c in mock_print.call_args_list] == ["No matching tasks found.", "[1] Buy milk - From the store (Status: pending)"]
@@ -0,0 +1,63 @@
+import json
+from unittest.mock import patch
+
+from tasks3 import task_cli, task_store
+from tasks3.task_store import TaskStore
+
+def test_ids_are_never_reused():
+    store = TaskStore([])
+    a = store.add('a', '')
+    b = store.add('b', '')
+    assert store.delete(b['id'])['title'] == 'b'
+    assert store.delete(b['id']) is None
+    assert store.add('c', '')['id'] == 3
+    assert [t['title'] for t in store] == ['a', 'c']
+    assert store.get(a['id']) is a
+
+def test_compaction_keeps_ids(monkeypatch):
+    monkeypatch.setattr(task_store, 'COMPACT_MIN_TOMBSTONES', 2)
+    store = TaskStore([])
+    for n in range(6):
+        store.add(str(n), '')
+    store.delete(1)
+    assert not store.needs_compaction()
+    store.delete(4)
+    assert store.needs_compaction()
+    store.compact()
+    assert [t['id'] for t in store.records] == [2, 3, 5, 6]
+    assert store.get(5)['title'] == '4'
+    assert store.next_id == 7
+
+def test_ordinals():
+    store = TaskStore([{'id': 2, 'title': 'a', 'description': '', 'status': 'pending'},
+                       {'id': 5, 'deleted': True},
+                       {'id': 9, 'title': 'b', 'description': '', 'status': 'pending'}])
+    assert store.next_id == 10
+    assert store.ordinals() == {2: 1, 9: 2}
+    assert store.id_for_ordinal(2) == 9
+    assert store.id_for_ordinal(3) is None
+
+def test_cli_delete_keeps_ids(tmp_path, monkeypatch):
+    data_file = tmp_path / 'tasks.json'
+    monkeypatch.setattr(task_cli, 'DATA_FILE', str(data_file))
+    with patch('builtins.print') as mock_print:
+        for title in ['a', 'b', 'c']:
+            task_cli.add_task(title, 'x')
+        task_cli.delete_task(1)
+        task_cli.delete_task(3)
+        task_cli.add_task('d', 'x')
+        task_cli.update_task_status(2, 'done', ordinal=True)
+        task_cli.list_tasks(ordinal=True)
+    mock_print.assert_any_call("1. [2] b - x (Status: pending)")
+    mock_print.assert_any_call("2. [4] d - x (Status: done)")
+    assert json.loads((tmp_path / 'tasks.meta.json').read_text()) == {'next_id': 5}
+
+def test_cli_search_skips_deleted_tasks(tmp_path, monkeypatch):
+    monkeypatch.setattr(task_cli, 'DATA_FILE', str(tmp_path / 'tasks.json'))
+    with patch('builtins.print') as mock_print:
+        task_cli.add_task('milk', 'x')
+        task_cli.add_task('more milk', 'x')
+        task_cli.delete_task(1)
+        mock_print.reset_mock()
+        task_cli.search_tasks('milk')
+    mock_print.assert_called_once_with("[2] more milk - x (Status: pending)")
@@ -1,28 +1,31 @@
+import argparse
+import sys
+from contextlib import nullcontext
+
 from openai import OpenAI
 
-def main() -> None:
+from .batch import MODEL, iter_paragraphs, summarise_batch
+
+# example paragraphs, used when no input is given
+EXAMPLE_PARAGRAPHS = [
+    "The gas giant was a swirling marble of impossible colors, a colossal sentinel silently orbiting a distant, dying star. Its atmosphere was a chaotic tapestry woven from hydrogen and helium, striated with bands of ruby-red storms that had been raging for millennia and faint, emerald-green aurorae flickering at the poles. High above the churning clouds, strange, bioluminescent plankton-like organisms, no larger than a human thumbnail, drifted in immense, slow-moving shoals, catching the weak, scattered light and turning the deep violet of space into a shimmering, living haze. The planet's gravity was a crushing, relentless force, yet it was this very force that sculpted the sublime, terrifying beauty of its surface, eternally pulling the cosmic dust and light into its grand, silent, and endless dance.",
+    "The air in the back aisle was thick and heavy, a complex, comforting perfume unique to aging paper and forgotten leather. It was a smell that transcended mere dust; it carried notes of dry vanilla, a ghost of pipe tobacco from a long-retired proprietor, and the subtle, earthy sweetness of decaying glue binding spines that hadn't been opened in decades. Sunlight, fragmented and hazy, slanted through a high, dusty window, illuminating millions of motes suspended in the stillness, turning the space into a luminous, golden cavern. This particular nook, dedicated to forgotten maritime histories and obscure Latin translations, felt less like a retail space and more like a carefully preserved time capsule, promising a quiet, uninterrupted journey into worlds that existed only between the brittle, sepia-toned pages.",
+]
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Summarize paragraphs (separated by blank lines) into one sentence each.")
+    parser.add_argument("input", nargs="?", help="text file of paragraphs, or - for stdin (default: built-in examples)")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent requests (default: 4)")
+    parser.add_argument("--checkpoint", help="JSONL file of finished summaries; rerun with the same file to resume")
+    parser.add_argument("--model", default=MODEL)
+    args = parser.parse_args(argv)
+
     client = OpenAI()
 
-    # system prompt
-    system_prompt = {"role": "system", "content": "You are a helpful assistant, which will summarize paragraph-length descriptions into a single concisesentence."}
-
-    # initial queries provided up front (processed one-by-one)
-    initial_queries = [
-        {"role": "user", "content": "The gas giant was a swirling marble of impossible colors, a colossal sentinel silently orbiting a distant, dying star. Its atmosphere was a chaotic tapestry woven from hydrogen and helium, striated with bands of ruby-red storms that had been raging for millennia and faint, emerald-green aurorae flickering at the poles. High above the churning clouds, strange, bioluminescent plankton-like organisms, no larger than a human thumbnail, drifted in immense, slow-moving shoals, catching the weak, scattered light and turning the deep violet of space into a shimmering, living haze. The planet's gravity was a crushing, relentless force, yet it was this very force that sculpted the sublime, terrifying beauty of its surface, eternally pulling the cosmic dust and light into its grand, silent, and endless dance."},
-        {"role": "user", "content": "The air in the back aisle was thick and heavy, a complex, comforting perfume unique to aging paper and forgotten leather. It was a smell that transcended mere dust; it carried notes of dry vanilla, a ghost of pipe tobacco from a long-retired proprietor, and the subtle, earthy sweetness of decaying glue binding spines that hadn't been opened in decades. Sunlight, fragmented and hazy, slanted through a high, dusty window, illuminating millions of motes suspended in the stillness, turning the space into a luminous, golden cavern. This particular nook, dedicated to forgotten maritime histories and obscure Latin translations, felt less like a retail space and more like a carefully preserved time capsule, promising a quiet, uninterrupted journey into worlds that existed only between the brittle, sepia-toned pages."}
-    ]
-
-    # user query
-    print("Processing queries...")
-
-    for q in initial_queries:
-        queryNumber = initial_queries.index(q) + 1
-        messages = [system_prompt, q]
-        # get response from model
-        completion = client.chat.completions.create(
-        model="gpt-5-mini",
-        messages=[system_prompt, q]
-        )
-
-        # print model response
-        print(f"\nQuery {queryNumber}: {completion.choices[0].message.content}")
+    with open(args.input, encoding="utf-8") if args.input not in (None, "-") else nullcontext(sys.stdin) as lines:
+        paragraphs = iter(EXAMPLE_PARAGRAPHS) if args.input is None else iter_paragraphs(lines)
+
+        print("Processing queries...")
+
+        for index, summary in summarise_batch(paragraphs, client, workers=args.workers, checkpoint=args.checkpoint, model=args.model):
+            print(f"\nQuery {index + 1}: {summary}", flush=True)
@@ -0,0 +1,164 @@
+"""
+Summarise many paragraphs concurrently.
+
+Paragraphs are read lazily (separated by blank lines) and at most `workers`
+requests are in flight at once. Rate-limit and transient errors are retried
+with exponential backoff; a Retry-After from the server pauses every worker,
+not just the one that was told. Results come out in input order, and each
+finished summary is appended to a JSONL checkpoint so a restarted job skips
+the paragraphs that are already done.
+"""
+import json
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from pathlib import Path
+
+import openai
+
+MODEL = "gpt-5-mini"
+SYSTEM_PROMPT = {"role": "system", "content": "You are a helpful assistant, which will summarize paragraph-length descriptions into a single concise sentence."}
+RETRY_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+
+
+def iter_paragraphs(lines):
+    "Yield blank-line separated paragraphs from an iterable of lines."
+    paragraph = []
+    for line in lines:
+        if line.strip():
+            paragraph.append(line.strip())
+        elif paragraph:
+            yield " ".join(paragraph)
+            paragraph = []
+    if paragraph:
+        yield " ".join(paragraph)
+
+
+def _retry_after(error):
+    "Seconds the API asked us to wait, if it said."
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class Pause:
+    """
+    A deadline shared by the workers of a batch: when the server says to
+    wait, nobody sends another request until it has passed.
+    """
+
+    def __init__(self, clock=time.monotonic, sleep=time.sleep):
+        self.clock = clock
+        self.sleep = sleep
+        self.until = 0.0
+        self._lock = threading.Lock()
+
+    def extend(self, seconds):
+        with self._lock:
+            self.until = max(self.until, self.clock() + seconds)
+
+    def wait(self):
+        while (remaining := self.until - self.clock()) > 0:
+            self.sleep(remaining)
+
+
+def summarise(client, text, model=MODEL, retries=5, backoff=1.0, pause=None):
+    """
+    Summarise one paragraph, retrying rate limits and transient errors with
+    exponential backoff (or the server's Retry-After, when given). A
+    Retry-After extends `pause`, which is waited for before every request.
+    """
+    pause = pause or Pause()
+    for attempt in range(retries + 1):
+        pause.wait()
+        try:
+            completion = client.chat.completions.create(
+                model=model,
+                messages=[SYSTEM_PROMPT, {"role": "user", "content": text}],
+            )
+            return completion.choices[0].message.content
+        except RETRY_ERRORS as e:
+            if attempt == retries:
+                raise
+            retry_after = _retry_after(e)
+            if retry_after is not None:
+                pause.extend(retry_after)
+            else:
+                pause.sleep(backoff * (2 ** attempt) * (0.5 + random.random() / 2))
+
+
+def load_checkpoint(path):
+    "Return {index: summary} for the paragraphs already done in a checkpoint file."
+    done = {}
+    if path is None or not Path(path).exists():
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # a line cut short by a crash
+                continue
+            done[record["index"]] = record["summary"]
+    return done
+
+
+def _drop_partial_line(path):
+    "Cut a line left unfinished by a crash off the end of a checkpoint, so the next record starts on its own line."
+    if path is None or not Path(path).exists():
+        return
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def summarise_batch(paragraphs, client, workers=4, checkpoint=None, model=MODEL, pause=None):
+    """
+    Summarise `paragraphs` with up to `workers` concurrent requests, yielding
+    (index, summary) in input order. Finished summaries are appended to the
+    `checkpoint` JSONL file, and ones already in it are not requested again.
+    """
+    done = load_checkpoint(checkpoint)
+    _drop_partial_line(checkpoint)
+    pause = pause or Pause()
+    pending = {}   # future -> index
+    results = {}   # index -> summary, waiting for earlier paragraphs
+    next_index = 0
+
+    def collect(block):
+        finished, _ = wait(pending, return_when=FIRST_COMPLETED) if block else (
+            [future for future in pending if future.done()], None)
+        for future in finished:
+            index = pending.pop(future)
+            results[index] = future.result()
+            if log:
+                log.write(json.dumps({"index": index, "summary": results[index]}) + "\n")
+                log.flush()
+
+    def ready():
+        nonlocal next_index
+        while next_index in results:
+            yield next_index, results.pop(next_index)
+            next_index += 1
+
+    with open(checkpoint, "a", encoding="utf-8") if checkpoint else nullcontext() as log, \
+            ThreadPoolExecutor(max_workers=workers) as executor:
+        for index, text in enumerate(paragraphs):
+            if index in done:
+                results[index] = done.pop(index)
+            else:
+                # keep the read-ahead bounded so a huge input isn't held in memory
+                while pending and index - next_index >= workers * 4:
+                    collect(block=True)
+                    yield from ready()
+                pending[executor.submit(summarise, client, text, model, pause=pause)] = index
+            collect(block=False)
+            yield from ready()
+        while pending:
+            collect(block=True)
+            yield from ready()
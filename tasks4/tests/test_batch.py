@@ -0,0 +1,97 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import openai
+
+import tasks4
+from tasks4 import batch
+
+
+def completion(text):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+def rate_limited(retry_after):
+    # only the parts of an HTTP response the error and _retry_after look at
+    response = SimpleNamespace(status_code=429, headers={"retry-after": str(retry_after)}, request=None)
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+class FakeClient:
+    """
+    Summarises a paragraph as "summary of <paragraph>", after `delays[paragraph]`
+    seconds. `errors[paragraph]` is raised (once) instead.
+    """
+
+    def __init__(self, delays=None, errors=None):
+        self.delays = delays or {}
+        self.errors = dict(errors or {})
+        self.calls = []
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages):
+        text = messages[-1]["content"]
+        with self._lock:
+            self.calls.append((time.monotonic(), text))
+            error = self.errors.pop(text, None)
+        if error is not None:
+            raise error
+        time.sleep(self.delays.get(text, 0))
+        return completion(f"summary of {text}")
+
+
+def test_iter_paragraphs():
+    lines = ["first line\n", "  continues\n", "\n", "\n", "second\n"]
+    assert list(batch.iter_paragraphs(lines)) == ["first line continues", "second"]
+
+
+def test_results_come_out_in_input_order():
+    paragraphs = [f"p{i}" for i in range(10)]
+    # later paragraphs finish first
+    client = FakeClient(delays={text: 0.01 * (10 - i) for i, text in enumerate(paragraphs)})
+    results = list(batch.summarise_batch(iter(paragraphs), client, workers=4))
+    assert results == [(i, f"summary of p{i}") for i in range(10)]
+
+
+def test_resume_skips_checkpointed_paragraphs(tmp_path):
+    checkpoint = tmp_path / "done.jsonl"
+    checkpoint.write_text(
+        json.dumps({"index": 0, "summary": "earlier 0"}) + "\n"
+        + json.dumps({"index": 2, "summary": "earlier 2"}) + "\n"
+        + '{"index": 3, "summ'  # cut short by a crash
+    )
+    client = FakeClient()
+    results = list(batch.summarise_batch(iter(["p0", "p1", "p2", "p3"]), client, workers=2, checkpoint=checkpoint))
+    assert results == [(0, "earlier 0"), (1, "summary of p1"), (2, "earlier 2"), (3, "summary of p3")]
+    assert sorted(text for _, text in client.calls) == ["p1", "p3"]
+    assert batch.load_checkpoint(checkpoint) == dict(results)
+
+
+def test_rate_limits_are_retried():
+    client = FakeClient(errors={"p0": rate_limited(0.01)})
+    assert batch.summarise(client, "p0") == "summary of p0"
+    assert [text for _, text in client.calls] == ["p0", "p0"]
+
+
+def test_retry_after_pauses_every_worker():
+    paragraphs = [f"p{i}" for i in range(6)]
+    client = FakeClient(delays={text: 0.02 for text in paragraphs}, errors={"p0": rate_limited(0.3)})
+    started = time.monotonic()
+    results = list(batch.summarise_batch(iter(paragraphs), client, workers=3))
+    assert [index for index, _ in results] == list(range(6))
+    told_at = client.calls[0][0]
+    # requests already sent may finish, but none start until the pause is over
+    later = [at for at, _ in client.calls[3:]]
+    assert later and all(at >= told_at + 0.29 for at in later)
+    assert time.monotonic() - started < 2
+
+
+def test_main_reads_a_file(tmp_path, monkeypatch, capsys):
+    source = tmp_path / "paragraphs.txt"
+    source.write_text("one\n\ntwo\n")
+    monkeypatch.setattr(tasks4, "OpenAI", FakeClient)
+    tasks4.main([str(source)])
+    assert capsys.readouterr().out.split("\n\n")[1:] == ["Query 1: summary of one", "Query 2: summary of two\n"]
@@ -1,7 +1,10 @@
 import json
 import argparse
+import sys
 from pathlib import Path
 
+from task_io import FORMATS, Timer, guess_format, open_input, open_output, read_records, write_records
+
 # Define the path to the JSON file
 tasks_file = Path("tasks.json")
 
@@ -43,7 +46,8 @@ def amend_task(index, name=None, description=None, status=None):
     if 0 <= index < len(tasks):
         if name:
             tasks[index]["name"] = name
-        if description:
+        # an empty description clears it
+        if description is not None:
             tasks[index]["description"] = description
         if status:
             tasks[index]["status"] = status
@@ -62,6 +66,72 @@ def delete_task(index):
     else:
         print("Invalid task index.")
 
+TASK_FIELDS = ["name", "description", "status"]
+STATUSES = ["completed", "pending"]
+
+# Apply one batch record to the task list
+def apply_record(tasks, record):
+    """
+    {"op": "add", "name": ..., "description": ..., "status": ...}
+    {"op": "amend", "index": N, "name": ..., "description": ..., "status": ...}  (1-based)
+    {"op": "delete", "index": N}
+    """
+    if not isinstance(record, dict):
+        raise ValueError(f"expected an object, got {type(record).__name__}")
+    op = record.get("op", "add")
+    if "status" in record and record["status"] not in STATUSES:
+        raise ValueError("status must be 'completed' or 'pending'")
+    if "name" in record and (not isinstance(record["name"], str) or not record["name"].strip()):
+        raise ValueError("name must be a non-empty string")
+    if "description" in record and not isinstance(record["description"], str):
+        raise ValueError("description must be a string")
+    if op == "add":
+        if not record.get("name"):
+            raise ValueError("a task needs a name")
+        tasks.append({"name": record["name"], "description": record.get("description", ""), "status": record.get("status", "pending")})
+        return
+    index = int(record["index"]) - 1
+    if not 0 <= index < len(tasks):
+        raise ValueError(f"no task number {record['index']}")
+    if op == "amend":
+        for field in TASK_FIELDS:
+            if field in record:
+                tasks[index][field] = record[field]
+    elif op == "delete":
+        tasks.pop(index)
+    else:
+        raise ValueError(f"unknown op {op!r}")
+
+# Apply many records with a single load and save (nothing is saved if one is bad)
+def run_records(records):
+    timer = Timer()
+    tasks = load_tasks()
+    count = 0
+    try:
+        for count, record in enumerate(records, start=1):
+            apply_record(tasks, record)
+    except (ValueError, TypeError, KeyError) as e:
+        print(f"Record {count}: {e}. No changes were saved.", file=sys.stderr)
+        return None
+    save_tasks(tasks)
+    print(timer.report(count), file=sys.stderr)
+    return count
+
+# Add tasks from a JSONL or CSV file
+def import_tasks(path, fmt=None):
+    with open_input(path) as f:
+        count = run_records({**record, "op": "add"} for record in read_records(f, guess_format(path, fmt)))
+    if count is not None:
+        print(f"Imported {count} tasks.")
+    return count
+
+# Write all tasks as JSONL or CSV
+def export_tasks(path="-", fmt=None):
+    timer = Timer()
+    with open_output(path) as f:
+        count = write_records(load_tasks(), f, TASK_FIELDS, guess_format(path, fmt))
+    print(f"Exported {timer.report(count, 'tasks')}", file=sys.stderr)
+
 # Main function to handle CLI arguments
 def main():
     parser = argparse.ArgumentParser(description="Task Manager CLI")
@@ -87,6 +157,18 @@ def main():
     delete_parser = subparsers.add_parser("delete", help="Delete a task")
     delete_parser.add_argument("index", type=int, help="Index of the task to delete (1-based)")
 
+    # Import / export / batch commands
+    import_parser = subparsers.add_parser("import", help="Add tasks from a JSONL or CSV file")
+    import_parser.add_argument("path", help="File to read, or - for stdin")
+    import_parser.add_argument("--format", choices=FORMATS, help="Default: from the file extension")
+
+    export_parser = subparsers.add_parser("export", help="Write all tasks as JSONL or CSV")
+    export_parser.add_argument("path", nargs="?", default="-", help="File to write (default: stdout)")
+    export_parser.add_argument("--format", choices=FORMATS, help="Default: from the file extension")
+
+    batch_parser = subparsers.add_parser("batch", help="Apply JSONL change records from stdin in one save")
+    batch_parser.add_argument("--file", default="-", help="Read the records from a file instead")
+
     args = parser.parse_args()
 
     initialize_tasks_file()
@@ -99,6 +181,15 @@ def main():
         amend_task(args.index - 1, args.name, args.description, args.status)
     elif args.command == "delete":
         delete_task(args.index - 1)
+    elif args.command == "import":
+        if import_tasks(args.path, args.format) is None:
+            sys.exit(1)
+    elif args.command == "export":
+        export_tasks(args.path, args.format)
+    elif args.command == "batch":
+        with open_input(args.file) as f:
+            if run_records(read_records(f)) is None:
+                sys.exit(1)
     else:
         parser.print_help()
 
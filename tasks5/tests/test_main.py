@@ -0,0 +1,42 @@
+import io
+import json
+from unittest.mock import patch
+
+import main
+
+def test_import_batch_export(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "tasks_file", tmp_path / "tasks.json")
+    main.initialize_tasks_file()
+    csv_file = tmp_path / "in.csv"
+    csv_file.write_text("name,description,status\nBuy milk,From the store,pending\nCall Bob,About the trip,completed\n")
+    assert main.import_tasks(str(csv_file)) == 2
+
+    records = [
+        {"op": "add", "name": "Pay rent"},
+        {"op": "amend", "index": 1, "description": ""},
+        {"op": "delete", "index": 2},
+    ]
+    assert main.run_records(records) == 3
+    # a bad record rolls back the whole batch
+    assert main.run_records([{"op": "delete", "index": 1}, [1]]) is None
+    assert main.run_records([{"op": "amend", "index": 1, "status": "done"}]) is None
+    assert main.run_records([{"op": "amend", "index": 1, "name": ""}]) is None
+    batch = tmp_path / "batch.jsonl"
+    batch.write_text('{"name": "x"}\n[1]\n')
+    assert main.import_tasks(str(batch)) is None
+
+    out = io.StringIO()
+    with patch("sys.stdout", out):
+        main.export_tasks()
+    assert [json.loads(line) for line in out.getvalue().splitlines()] == [
+        {"name": "Buy milk", "description": "", "status": "pending"},
+        {"name": "Pay rent", "description": "", "status": "pending"},
+    ]
+
+def test_amend_can_clear_the_description(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "tasks_file", tmp_path / "tasks.json")
+    main.initialize_tasks_file()
+    with patch("builtins.print"):
+        main.add_task("Buy milk", "From the store", "pending")
+        main.amend_task(0, description="")
+    assert main.load_tasks() == [{"name": "Buy milk", "description": "", "status": "pending"}]
@@ -0,0 +1,80 @@
+import pytest
+
+from chat_memory import ConversationMemory
+
+SYSTEM = {"role": "developer", "content": "system"}
+
+class Summariser:
+    "Records what it was asked to fold; fails while `error` is set."
+
+    def __init__(self):
+        self.calls = []
+        self.error = None
+
+    def __call__(self, summary, messages):
+        if self.error is not None:
+            raise self.error
+        self.calls.append((summary, [message["content"] for message in messages]))
+        return f"summary {len(self.calls)}"
+
+def chat(memory, *turns):
+    for question, answer in turns:
+        memory.add_user(question)
+        memory.messages()
+        memory.add_assistant(answer)
+
+def test_turns_are_kept_until_the_turn_limit():
+    summarise = Summariser()
+    memory = ConversationMemory(SYSTEM, summarise, max_turns=4, count_tokens=len)
+    chat(memory, *[(f"q{i}", f"a{i}") for i in range(4)])
+    assert summarise.calls == []
+    assert memory.messages()[0] == SYSTEM
+    assert [m["content"] for m in memory.messages()[1:]] == ["q0", "a0", "q1", "a1", "q2", "a2", "q3", "a3"]
+
+def test_oldest_turns_fold_down_to_half_the_limit():
+    summarise = Summariser()
+    memory = ConversationMemory(SYSTEM, summarise, max_turns=4, count_tokens=len)
+    chat(memory, *[(f"q{i}", f"a{i}") for i in range(5)])
+    assert summarise.calls == [("", ["q0", "a0", "q1", "a1", "q2", "a2"])]
+    messages = memory.messages()
+    assert messages[1] == {"role": "developer", "content": "Summary of the conversation so far: summary 1"}
+    assert [m["content"] for m in messages[2:]] == ["q3", "a3", "q4", "a4"]
+    # the next fold builds on the previous summary
+    chat(memory, *[(f"q{i}", f"a{i}") for i in range(5, 8)])
+    assert summarise.calls[1] == ("summary 1", ["q3", "a3", "q4", "a4", "q5", "a5"])
+    assert memory.summary == "summary 2"
+
+def test_token_budget_folds_before_the_turn_limit():
+    summarise = Summariser()
+    # the system prompt is 6 characters and each turn 20
+    memory = ConversationMemory(SYSTEM, summarise, max_turns=10, token_budget=50, count_tokens=len)
+    chat(memory, ("q" * 10, "a" * 10), ("r" * 10, "b" * 10))
+    assert summarise.calls == []
+    chat(memory, ("s" * 10, "c" * 10))
+    # 3 turns are 66 characters with the system prompt; the newest 2 fit
+    assert summarise.calls == [("", ["q" * 10, "a" * 10])]
+    assert len(memory.turns) == 2
+    assert memory.prompt_tokens == [16, 36, 56]
+
+def test_a_failed_summary_keeps_the_turns():
+    summarise = Summariser()
+    summarise.error = RuntimeError("rate limited")
+    memory = ConversationMemory(SYSTEM, summarise, max_turns=2, count_tokens=len)
+    chat(memory, ("q0", "a0"), ("q1", "a1"), ("q2", "a2"))
+    assert str(memory.summary_error) == "rate limited"
+    assert memory.summary == ""
+    assert len(memory.turns) == 3
+    # tried again after the next turn
+    summarise.error = None
+    chat(memory, ("q3", "a3"))
+    assert memory.summary_error is None
+    assert summarise.calls == [("", ["q0", "a0", "q1", "a1", "q2", "a2"])]
+    assert [m["content"] for m in memory.messages()[2:]] == ["q3", "a3"]
+
+def test_drop_unanswered():
+    memory = ConversationMemory(SYSTEM, Summariser(), count_tokens=len)
+    chat(memory, ("q0", "a0"))
+    memory.add_user("q1")
+    memory.drop_unanswered()
+    memory.drop_unanswered()
+    assert [m["content"] for m in memory.messages()[1:]] == ["q0", "a0"]
@@ -0,0 +1,37 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+import main
+
+def chunk(text):
+    part = MagicMock()
+    part.choices = [MagicMock()]
+    part.choices[0].delta.content = text
+    return part
+
+def test_stream_reply_prints_tokens_as_they_arrive(capsys):
+    client = MagicMock()
+    client.chat.completions.create.return_value = iter([chunk("Take "), chunk(None), chunk("the Red Line")])
+    text, first_token = main.stream_reply(client, [])
+    assert text == "Take the Red Line"
+    assert first_token is not None
+    assert capsys.readouterr().out == "Take the Red Line\n"
+
+def test_stream_reply_without_streaming(capsys):
+    completion = MagicMock(choices=[MagicMock()])
+    completion.choices[0].message.content = "Red Line"
+    client = MagicMock()
+    client.chat.completions.create.side_effect = [TypeError("stream"), completion]
+    assert main.stream_reply(client, [])[0] == "Red Line"
+    assert capsys.readouterr().out == "Red Line\n"
+
+def test_stream_reply_raises_when_the_stream_breaks(capsys):
+    def broken():
+        yield chunk("Take ")
+        raise ConnectionError("reset")
+    client = MagicMock()
+    client.chat.completions.create.return_value = broken()
+    with pytest.raises(ConnectionError):
+        main.stream_reply(client, [])
+    assert capsys.readouterr().out == "Take \n"